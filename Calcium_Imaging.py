@@ -1,41 +1,100 @@
+import time
+STARTUP_T0 = time.perf_counter()   # module import start, for the startup timings
 from posixpath import basename
-import sys, os, time, json
+import sys, os, io, json, csv
 from datetime import datetime
 import numpy as np
-import tifffile
-import cv2
-import serial
 from queue import Queue, Empty
 import threading
 from threading import Lock
-
-from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, QLineEdit, QDoubleSpinBox, QSpinBox,QSlider, QComboBox, QVBoxLayout, QGridLayout, QGroupBox, QProgressBar, QCheckBox,QFileDialog, QSizePolicy, QTextEdit, QFrame,)
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap
-from tifffile import imwrite, imread
-
-from pymmcore_plus import CMMCorePlus
+from collections import deque
+
+from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, QLineEdit, QDoubleSpinBox, QSpinBox,QSlider, QComboBox, QVBoxLayout, QGridLayout, QGroupBox, QProgressBar, QCheckBox,QFileDialog, QSizePolicy, QListView, QFrame,)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QPointF
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor, QPolygonF
+
+# tifffile, pymmcore_plus and the dry-run module are imported where first used so the window appears sooner
+from bleach_correction import BleachCorrector
+from frame_bus import FrameBus
+from capacity import plan_capacity, apply_to_core
+from preflight import run_preflight, existing_parent, cached_write_bandwidth, measure_write_bandwidth
+from trigger_protocol import burst_trigger_plan, pulse_command, ABORT_COMMAND
+from serial_manager import SerialManager
+from stim_protocol import load_protocol, compile_protocol, uniform_schedule, schedule_duration_s, save_schedule
+from session_log import LogModel, JsonlLogWriter
+from event_journal import EventJournal
+from metrics import METRICS, MetricsServer
+from profiling import PROFILER, SamplingProfiler
+from pretrigger import PreTriggerRing
+from reduction import ReductionStage
+from background_recording import BackgroundRecorder
+from shm_ring import AcquisitionProcess, ProcessCore
 
 import logging
-import os
 
-log_path = os.path.expanduser("~\\AppData\\Local\\pymmcore-plus\\pymmcore-plus\\logs\\pymmcore-plus.log")
-logger = logging.getLogger("pymmcore-plus")
-logger.handlers = []  # remove default handlers
-logging.basicConfig(level=logging.DEBUG, filename=log_path, filemode="a")
+STARTUP_BENCH = os.environ.get("CALCIUM_STARTUP_BENCH") == "1"   # set by startup_bench.py
+
+def configure_core_logging():
+    # pymmcore-plus logs to a file rather than the console; runs on the core loading thread
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    log_dir = os.path.join(base, "pymmcore-plus", "pymmcore-plus", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    logger = logging.getLogger("pymmcore-plus")
+    logger.handlers = []  # remove default handlers
+    logging.basicConfig(level=logging.DEBUG, filename=os.path.join(log_dir, "pymmcore-plus.log"), filemode="a")
+
+# -------------------- Metrics --------------------
+FRAMES_POPPED = METRICS.counter("frames_popped_total", "frames popped from the camera circular buffer")
+POP_MS = METRICS.histogram("pop_ms", "camera lock + popNextImage time")
+CAMERA_BACKLOG = METRICS.gauge("camera_buffer_frames", "frames waiting in the camera circular buffer")
+PREVIEW_FRAMES = METRICS.counter("preview_frames_total", "frames drawn by the live preview")
+BURST_FRAMES = METRICS.counter("burst_frames_total", "frames collected by burst threads")
+BURST_DROPPED = METRICS.counter("burst_dropped_total", "frames overwritten on the bus before a burst read them")
+BURST_LAG = METRICS.gauge("burst_lag_frames", "frames published but not yet read by the running burst")
+WRITER_QUEUE = METRICS.gauge("writer_queue_depth", "bursts waiting for the writer")
+WRITER_MS = METRICS.histogram("writer_write_ms", "time to write one burst", buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+WRITER_BYTES = METRICS.counter("writer_bytes_total", "bytes written to disk")
+WRITER_MB_S = METRICS.gauge("writer_mb_s", "writer throughput of the last burst")
+TTL_COMMANDS = METRICS.counter("ttl_commands_total", "TTL pulses/trains requested")
+TTL_DISPATCH_MS = METRICS.histogram("ttl_dispatch_ms", "time to queue a TTL request with the serial manager")
+TTL_ACK_MS = METRICS.histogram("ttl_ack_latency_ms", "serial command to acknowledgement latency")
+
+# serial manager event kinds that go into the session journal
+SERIAL_JOURNAL_KINDS = {"tx": "ttl_command", "pulse_ended": "ttl_ack", "armed": "arm", "stim": "stim", "done": "trigger_done",
+                        "missed": "error", "timeout": "error"}
 
 # -------------------- Load Core Thread --------------------
 
 class LoadCoreThread(QThread):
     core_loaded = pyqtSignal(bool, object)  # success flag, core object or None
 
-    def __init__(self, cfg_path):
+    def __init__(self, cfg_path, synthetic=False):
         super().__init__()
         self.cfg_path = cfg_path
+        self.synthetic = synthetic          # startup benchmark without a camera
+        self.acquisition = None             # AcquisitionProcess arguments when the camera runs in its own process
         self.core = None
 
     def run(self):
         try:
+            configure_core_logging()
+            if self.acquisition is not None:
+                # the child owns the camera; the GUI gets a proxy that reads the shared ring
+                acq = AcquisitionProcess(None if self.synthetic else self.cfg_path, **self.acquisition)
+                try:
+                    acq.start()
+                except Exception:
+                    acq.stop()
+                    raise
+                self.core = ProcessCore(acq)
+                self.core_loaded.emit(True, self.core)
+                return
+            if self.synthetic:
+                from dry_run import SyntheticCore
+                self.core = SyntheticCore()
+                self.core_loaded.emit(True, self.core)
+                return
+            from pymmcore_plus import CMMCorePlus
             # Reset any existing instance
             core = CMMCorePlus.instance()
             self.core = core
@@ -52,7 +111,10 @@ class LoadCoreThread(QThread):
     
     def stop(self):
         # safe stop/reset of any instance held by this thread
+        if self.synthetic or self.acquisition is not None:
+            return
         try:
+            from pymmcore_plus import CMMCorePlus
             core = CMMCorePlus.instance()
             if core is not None:
                 try:
@@ -67,26 +129,72 @@ class LoadCoreThread(QThread):
         except Exception:
             pass
 
+# -------------------- Write Benchmark Thread --------------------
+class BandwidthProbeThread(QThread):
+    measured = pyqtSignal(str, float, str)   # target, MB/s, error ("" on success)
+
+    def __init__(self, target, total_mb=64):
+        super().__init__()
+        self.target = target
+        self.total_mb = total_mb
+
+    def run(self):
+        # writes and fsyncs total_mb on the target drive, so never on the GUI thread
+        try:
+            self.measured.emit(self.target, measure_write_bandwidth(self.target, total_mb=self.total_mb), "")
+        except Exception as e:
+            self.measured.emit(self.target, 0.0, str(e))
+
 # -------------------- Frame Writer Thread --------------------
+def write_frame_index(path, index):
+    """Per-frame sidecar CSV (frame number, bus sequence, timestamp, trigger index...)."""
+    names = list(index.keys())
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(index[n] for n in names)))
+
 class FrameWriterThread(QThread):
     log_event_signal = pyqtSignal(str, str)
 
-    def __init__(self, queue):
+    def __init__(self, queue, journal=None, reducer=None):
         super().__init__()
         self.queue = queue
+        self.journal = journal
+        self.reducer = reducer            # optional ReductionStage applied before encoding
         self.running = True
+        self.bytes_written = 0
+        self.write_time_s = 0.0
+        self.bytes_in = 0                 # burst bytes before reduction, over job_time_s
+        self.job_time_s = 0.0
 
     def run(self):
+        import tifffile   # first use is on this thread, not at GUI start
         while self.running:
             try:
-                path, arr = self.queue.get(timeout=0.1)
-                
-                if not isinstance(arr, np.ndarray):
-                    arr = np.array(arr, dtype=np.uint16)
+                job = self.queue.get(timeout=0.1)
+                path, arr = job[0], job[1]
+                index = job[2] if len(job) > 2 else None
+                burst = job[3] if len(job) > 3 else -1
+
+                with PROFILER.span("convert"):
+                    if not isinstance(arr, np.ndarray):
+                        arr = np.array(arr, dtype=np.uint16)
+                    else:
+                        arr = arr.astype(np.uint16)
+
+                t_job = time.perf_counter()
+                if self.reducer is not None:
+                    with PROFILER.span("reduce"):
+                        outputs = self.reducer.apply(arr, index)
                 else:
-                    arr = arr.astype(np.uint16)
+                    outputs = [("", arr, index)]
 
-                tifffile.imwrite(path, arr, photometric='minisblack')
+                for suffix, out, out_index in outputs:
+                    out_path = f"{os.path.splitext(path)[0]}{suffix}.tif" if suffix else path
+                    self.write_stack(tifffile, out_path, out, out_index, burst)
+                self.job_time_s += time.perf_counter() - t_job
+                self.bytes_in += arr.nbytes
                 self.queue.task_done()
                 # self.log_event_signal.emit(f"Saved {path} ({len(arr)} frames)", "green")
 
@@ -95,71 +203,198 @@ class FrameWriterThread(QThread):
             except Exception as e:
                 self.log_event_signal.emit(f"Error saving {path}: {e}", "red")
 
+    def write_stack(self, tifffile, path, arr, index, burst):
+        t0 = time.perf_counter()
+        if PROFILER.enabled:
+            # encode and disk write timed apart; costs one extra in-memory copy of the burst
+            buf = io.BytesIO()
+            with PROFILER.span("encode"):
+                tifffile.imwrite(buf, arr, photometric='minisblack')
+            with PROFILER.span("write"):
+                with open(path, "wb") as f:
+                    f.write(buf.getbuffer())
+            del buf
+        else:
+            tifffile.imwrite(path, arr, photometric='minisblack')
+        if index:
+            with PROFILER.span("index"):
+                write_frame_index(os.path.splitext(path)[0] + "_frames.csv", index)
+        dt = time.perf_counter() - t0
+        self.write_time_s += dt
+        self.bytes_written += arr.nbytes
+        WRITER_MS.observe(dt * 1000.0)
+        WRITER_BYTES.inc(arr.nbytes)
+        WRITER_MB_S.set(arr.nbytes / dt / 1e6 if dt > 0 else 0.0)
+        WRITER_QUEUE.set(self.queue.qsize())
+        if self.journal is not None:
+            self.journal.record("write_done", burst, arr.nbytes, os.path.basename(path))
+
+    def throughput_mb_s(self):
+        # measured rate of raw burst data through reduction + encode + write, used by the capacity planner
+        return self.bytes_in / self.job_time_s / 1e6 if self.job_time_s > 0 else None
+
     def stop(self):
         self.running = False
         self.wait()
 
 # -------------------- Live Preview Thread --------------------
 class LivePreviewThread(QThread):
-    image_ready = pyqtSignal(np.ndarray)  # throttled preview
-    new_frame = pyqtSignal(np.ndarray)    # all frames for burst
     log_event_signal = pyqtSignal(str, str)
 
-    def __init__(self, core, lock=None, preview_fps=30):
+    def __init__(self, core, lock=None, bus=None):
         super().__init__()
         self.core = core
         self.lock = lock
         self.running = False
-        self.preview_fps = preview_fps
+        self.bus = bus if bus is not None else FrameBus()  # preview, bursts and writers read from here
+
+    def pop_frame(self):
+        """(image, ts) of the next camera frame or None; ts is None when the bus should stamp it."""
+        if isinstance(self.core, ProcessCore):
+            # acquisition process: frames come from the shared ring, no camera lock needed
+            item = self.core.pop_frame()
+            if item is None:
+                return None
+            FRAMES_POPPED.inc()
+            CAMERA_BACKLOG.set(self.core.getRemainingImageCount())
+            return item[0], item[1] / 1e9
+        # the core lock only covers the pop itself
+        with self.lock:
+            t0 = time.perf_counter()
+            remaining = self.core.getRemainingImageCount()
+            if remaining > 0:
+                img = self.core.popNextImage()
+                POP_MS.observe((time.perf_counter() - t0) * 1000.0)
+                CAMERA_BACKLOG.set(remaining - 1)
+                FRAMES_POPPED.inc()
+                return img, None
+        return None
+
+    def check_process(self):
+        # a dead or stalled acquisition process otherwise just looks like a camera with no frames
+        if isinstance(self.core, ProcessCore) and self.core.acq.crashed():
+            self.log_event_signal.emit(f"Acquisition process stopped: {self.core.acq.error() or 'no heartbeat'}", "red")
+            self.running = False
 
     def run(self):
         self.running = True
-        last_emit_time = time.time()
-
+        last_check = time.monotonic()
         while self.running:
-            with self.lock:
-                while self.core.getRemainingImageCount() > 0:
-                    img = self.core.popNextImage()
-                    frame = np.array(img, dtype=np.uint16)
-
-                    # Emit to burst thread (all frames)
-                    self.new_frame.emit(frame)
-
-                    # Emit to GUI at throttled FPS
-                    now = time.time()
-                    if now - last_emit_time >= 1.0 / self.preview_fps:
-                        self.image_ready.emit(frame)
-                        last_emit_time = now
-
-            time.sleep(0.001)  # slight throttle to avoid busy loop
+            t0 = PROFILER.start()
+            item = self.pop_frame()
+            if item is None:
+                if time.monotonic() - last_check > 1.0:
+                    last_check = time.monotonic()
+                    self.check_process()
+                time.sleep(0.001)  # slight throttle to avoid busy loop
+                continue
+            img, ts = item
+            PROFILER.stop("pop", t0)
+            with PROFILER.span("convert"):
+                frame = np.asarray(img, dtype=np.uint16)
+            with PROFILER.span("emit"):
+                self.bus.publish(frame, ts=ts)
 
     def stop(self):
         self.running = False
 
 # -------------------- Burst Thread --------------------
 class BurstThread(QThread):
-    burst_done = pyqtSignal(int, object)      # burst_index, frames
+    burst_done = pyqtSignal(int, object, object)      # burst_index, frames, per-frame index
     burst_started = pyqtSignal(int)
     log_event_signal = pyqtSignal(str, str)
 
-    def __init__(self, burst_index, duration_s):
+    def __init__(self, burst_index, duration_s, cursor=None, corrector=None, session_start=None, fps=30,
+                 max_frames=None, stim_frame=None, pretrigger=None):
         super().__init__()
         self.burst_index = burst_index
         self.duration_s = duration_s
+        self.cursor = cursor                  # lossless FrameCursor on the GUI frame bus
         self.frames = []
+        self.frame_seqs = []
+        self.frame_times = []
+        # external trigger mode: the first frame after arming is trigger 0
+        self.start_seq = cursor.next_seq if cursor is not None else 0
+        self.max_frames = max_frames
+        self.stim_frame = stim_frame
         self._stop_event = threading.Event()
-
-    def collect_frame(self, frame):
-        """Connect this to LivePreviewThread.new_frame"""
+        self.corrector = corrector            # optional BleachCorrector fed with each finished burst
+        self.session_start = session_start
+        self.fps = fps
+        # (ring, window_s, ttl perf_counter): baseline frames are copied out of the pre-trigger
+        # ring at the start of run(), the burst itself starts at the TTL
+        self.pretrigger = pretrigger
+        self.n_prefix = 0
+
+    def collect_prefix(self):
+        ring, window_s, t_ttl = self.pretrigger
+        with PROFILER.span("pretrigger_copy"):
+            prefix = ring.snapshot(self.start_seq, window_s, now=t_ttl)
+        if prefix is not None:
+            for frame, seq, ts in zip(*prefix):
+                self.collect_frame(frame, int(seq), float(ts))
+            self.n_prefix = len(self.frames)
+        expected = int(window_s * self.fps)
+        if self.n_prefix < expected - 1:
+            self.log_event_signal.emit(f"Burst {self.burst_index}: only {self.n_prefix}/{expected} baseline frames "
+                                       f"in the pre-trigger ring", "orange")
+
+    def collect_frame(self, frame, seq=0, ts=0.0):
         self.frames.append(frame)
+        self.frame_seqs.append(seq)
+        self.frame_times.append(ts)
+
+    def frame_index(self):
+        index = {
+            "frame": list(range(len(self.frames))),
+            "bus_seq": self.frame_seqs,
+            "timestamp_s": [f"{t:.6f}" for t in self.frame_times],
+        }
+        if self.max_frames is not None:
+            triggers = [seq - self.start_seq for seq in self.frame_seqs]
+            index["trigger_index"] = triggers
+            index["stim"] = [int(t == self.stim_frame) for t in triggers]
+        if self.n_prefix:
+            index["pretrigger"] = [int(i < self.n_prefix) for i in range(len(self.frames))]
+        return index
 
     def run(self):
         self.burst_started.emit(self.burst_index)
         start_time = time.time()
+        start_perf = time.perf_counter()
+        if self.pretrigger is not None:
+            self.collect_prefix()
         while (time.time() - start_time) < self.duration_s and not self._stop_event.is_set():
-            time.sleep(0.001)  # just wait; frames are collected via signal
+            if self.max_frames is not None and len(self.frames) >= self.max_frames:
+                break
+            if self.cursor is None:
+                time.sleep(0.001)
+                continue
+            item = self.cursor.get(timeout=0.01)
+            if item is not None:
+                with PROFILER.span("collect"):
+                    self.collect_frame(item[2], item[0], item[1])
+                BURST_FRAMES.inc()
+                BURST_LAG.set(self.cursor.bus.seq - self.cursor.next_seq + 1)
+        if self.max_frames is not None and len(self.frames) < self.max_frames:
+            self.log_event_signal.emit(f"Burst {self.burst_index}: {len(self.frames)}/{self.max_frames} triggered frames received", "red")
+        if self.cursor is not None:
+            if self.cursor.dropped:
+                BURST_DROPPED.inc(self.cursor.dropped)
+                self.log_event_signal.emit(f"Burst {self.burst_index}: {self.cursor.dropped} frames dropped (bus overrun)", "red")
+            self.cursor.close()
+
+        if self.corrector is not None and self.frames:
+            try:
+                t_start = start_time - (self.session_start or start_time)
+                if self.n_prefix:
+                    t_start -= start_perf - self.frame_times[0]   # stack starts at the first baseline frame
+                self.corrector.update_burst(self.burst_index, t_start, np.stack(self.frames), self.fps)
+            except Exception as e:
+                self.log_event_signal.emit(f"Bleach correction update failed: {e}", "orange")
 
-        self.burst_done.emit(self.burst_index, self.frames)
+        with PROFILER.span("burst_emit"):
+            self.burst_done.emit(self.burst_index, self.frames, self.frame_index())
 
     def stop(self):
         self._stop_event.set()
@@ -250,8 +485,80 @@ class CollapsibleGroupBox(QWidget):
     # Force layout recalculation
         self.content_frame.updateGeometry()
 
+# -------------------- Metrics Panel --------------------
+class MetricsPanel(QWidget):
+    """Current value and a sparkline per metric, refreshed once a second from the shared registry."""
+    ROWS = [
+        ("Pop rate (fps)", "frames_popped_total", "rate"),
+        ("Preview fps", "preview_frames_total", "rate"),
+        ("Camera backlog (frames)", "camera_buffer_frames", "value"),
+        ("Burst lag (frames)", "burst_lag_frames", "value"),
+        ("Dropped frames", "burst_dropped_total", "value"),
+        ("Writer queue (bursts)", "writer_queue_depth", "value"),
+        ("Writer MB/s", "writer_mb_s", "value"),
+        ("TTL ack p95 (ms)", "ttl_ack_latency_ms", "p95"),
+    ]
+
+    def __init__(self, registry=METRICS, history=120, interval_ms=1000):
+        super().__init__()
+        self.registry = registry
+        self.history = {name: deque(maxlen=history) for _, name, _ in self.ROWS}
+        self.last = {}
+        self.last_t = time.perf_counter()
+        layout = QGridLayout()
+        layout.setContentsMargins(2, 2, 2, 2)
+        self.value_labels, self.spark_labels = {}, {}
+        for row, (title, name, _) in enumerate(self.ROWS):
+            layout.addWidget(QLabel(title), row, 0)
+            self.value_labels[name] = QLabel("-")
+            layout.addWidget(self.value_labels[name], row, 1)
+            self.spark_labels[name] = QLabel()
+            self.spark_labels[name].setFixedSize(160, 18)
+            layout.addWidget(self.spark_labels[name], row, 2)
+        self.setLayout(layout)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval_ms)
+
+    def refresh(self):
+        snap = self.registry.snapshot()
+        now = time.perf_counter()
+        dt = max(now - self.last_t, 1e-6)
+        for _, name, mode in self.ROWS:
+            raw = snap.get(name, 0)
+            if mode == "rate":
+                value = (raw - self.last.get(name, raw)) / dt
+                self.last[name] = raw
+            elif mode == "p95":
+                value = raw["p95"] if isinstance(raw, dict) else 0.0
+            else:
+                value = raw
+            self.history[name].append(value)
+            self.value_labels[name].setText(f"{value:.1f}")
+            if self.isVisible():
+                self.draw_sparkline(self.spark_labels[name], self.history[name])
+        self.last_t = now
+
+    def draw_sparkline(self, label, values):
+        w, h = label.width(), label.height()
+        pixmap = QPixmap(w, h)
+        pixmap.fill(QColor("#2e2e2e"))
+        if len(values) > 1:
+            lo, hi = min(values), max(values)
+            span = (hi - lo) or 1.0
+            step = w / (values.maxlen - 1)
+            x0 = w - step * (len(values) - 1)
+            points = [QPointF(x0 + i * step, h - 2 - (v - lo) / span * (h - 4)) for i, v in enumerate(values)]
+            painter = QPainter(pixmap)
+            painter.setPen(QPen(QColor("#4fc3f7"), 1))
+            painter.drawPolyline(QPolygonF(points))
+            painter.end()
+        label.setPixmap(pixmap)
+
 # -------------------- Main GUI --------------------
 class LiveImagingGUI(QWidget):
+    arduino_connected = pyqtSignal()   # emitted from the serial thread, handled on the GUI thread
+
     def __init__(self, cfg_path):
             super().__init__()
             self.cfg_path = cfg_path
@@ -269,6 +576,9 @@ class LiveImagingGUI(QWidget):
             self.default_clear_cycles = 2
 
             self.log_queue = Queue()
+            self.log_model = LogModel(max_lines=2000)
+            self.session_log = JsonlLogWriter()
+            self.session_log.start()
             self.log_timer = QTimer(self)
             self.log_timer.timeout.connect(self.flush_log_queue)
             self.log_timer.start(50)
@@ -286,11 +596,87 @@ class LiveImagingGUI(QWidget):
             self.frames_taken = 0
             self.burst_queue = None
             self.writer_thread = None
+            self.bleach_corrector = None
+            self.external_trigger = False
+            self.protocol = None
+            self.schedule = None
+            self.experiment_running = False
+            self.dry_run = None              # DryRun while a simulated session is installed
+            self.dry_run_summary = None
+            self.journal = None              # EventJournal of the current session
+            self.sampler = None              # SamplingProfiler while profiling a session
+            self.pretrigger_ring = None      # PreTriggerRing while bursts take their baseline from it
+            self.background_recorder = None  # BackgroundRecorder while "Record" is on during a session
+            self.reducer = None              # ReductionStage used by the writer this session
+            self.bandwidth_probe = None      # BandwidthProbeThread measuring the save drive
+            self.start_after_probe = False   # start_experiment again once the probe reports
+            self.start_after_connect = False # start_experiment again once the Arduino port is open
+            self.connect_wait_id = 0
+            self.arduino_connected.connect(self.on_arduino_connected)
+
+            self.live_thread = None
+            self.frame_bus = FrameBus(capacity=512)
+            self.preview_cursor = self.frame_bus.subscribe("preview", policy="latest")
+            self.preview_timer = QTimer(self)
+            self.preview_timer.timeout.connect(self.poll_preview)
+            self.preview_timer.start(33)   # ~30 fps preview
 
             self.build_ui()
             self.load_settings()
+            self.metrics_server = None
+            self.start_metrics_server()
             self.show()
 
+            self.startup_times = {}
+            self.first_frame_seen = False
+            QTimer.singleShot(0, lambda: self.mark_startup("window"))
+            if self.cfg_path and self.settings.get("auto_load_core", True):
+                QTimer.singleShot(0, self.load_core_async)   # camera loads while the user looks at the window
+
+    def mark_startup(self, name):
+        # seconds since this module started importing; startup_bench.py reads the printed wall times
+        self.startup_times[name] = time.perf_counter() - STARTUP_T0
+        if STARTUP_BENCH:
+            print(f"STARTUP {name} {time.time():.6f}", flush=True)
+        self.log_event(f"Startup: {name} after {self.startup_times[name]:.2f} s", "white")
+
+    def load_core_async(self):
+        if self.core is not None or self.core_thread.isRunning():
+            return
+        self.log_event("Loading camera configuration in the background...", "yellow")
+        self.core_thread.acquisition = self.acquisition_process_args()
+        self.core_thread.start()
+
+    def acquisition_process_args(self):
+        """AcquisitionProcess arguments when "acquisition_process" is on, else None (camera in the GUI process)."""
+        if not self.settings.get("acquisition_process", False):
+            return None
+        x, y, w, h = self.settings.get("camera_roi", [0, 0, 600, 600])
+        properties = {"CircularBufferEnabled": "ON", "CircularBufferFrameCount": 2000,
+                      "ClearMode": "Pre-Sequence", "ClearCycles": 2}
+        shape = (h, w)
+        if self.settings.get("camera_binning"):
+            properties["Binning"] = self.settings["camera_binning"]
+            b = int(str(self.settings["camera_binning"]).split("x")[0])
+            shape = (h // b, w // b)
+        return {"shape": shape,
+                "n_slots": int(self.settings.get("acquisition_ring_slots", 512)),
+                "setup": {"roi": [x, y, w, h], "exposure": self.exp_spin.value(), "properties": properties,
+                          "fps": 1000.0 / max(self.exp_spin.value(), 1.0)},
+                "heartbeat_timeout_s": float(self.settings.get("acquisition_heartbeat_s", 2.0))}
+
+    def start_metrics_server(self):
+        # local scrape endpoint for long runs: http://127.0.0.1:<metrics_port>/metrics
+        port = int(self.settings.get("metrics_port", 9108))
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(port=port)
+            self.metrics_server.start()
+            self.log_event(f"Metrics at http://127.0.0.1:{self.metrics_server.port}/metrics", "white")
+        except OSError as e:
+            self.log_event(f"Metrics endpoint not started on port {port}: {e}", "orange")
+
     def on_core_loaded(self, success, core):
         if not success:
             self.log_event("Core failed to load!", "red")
@@ -299,19 +685,25 @@ class LiveImagingGUI(QWidget):
             return
 
         self.core = core
-        cam = self.core.getCameraDevice()
-        self.core.setCameraDevice(cam)
-        self.core.setROI(0, 0, 600, 600)
-        self.core.setExposure(self.exp_spin.value())
-        try:
-            self.core.setProperty(cam, "CircularBufferEnabled", "ON")
-            self.core.setProperty(cam, "CircularBufferFrameCount", 2000)
-            self.core.setProperty(cam,"ClearMode", "Pre-Sequence")
-            self.core.setProperty(cam,"ClearCycles", 2)
-            # self.core.setProperty(cam, "Binning", "2x2")
-            self.core.startContinuousSequenceAcquisition(0)      # buffer size
-        except Exception as e:
-            self.log_event(f"Warning setting camera properties: [e]", "orange")
+        if isinstance(self.core, ProcessCore):
+            # ROI, exposure and properties were applied by the acquisition process before its sequence started
+            self.log_event(f"Camera runs in acquisition process {self.core.acq.process.pid}", "white")
+        else:
+            cam = self.core.getCameraDevice()
+            self.core.setCameraDevice(cam)
+            x, y, w, h = self.settings.get("camera_roi", [0, 0, 600, 600])
+            self.core.setROI(x, y, w, h)
+            self.core.setExposure(self.exp_spin.value())
+            try:
+                self.core.setProperty(cam, "CircularBufferEnabled", "ON")
+                self.core.setProperty(cam, "CircularBufferFrameCount", 2000)
+                self.core.setProperty(cam,"ClearMode", "Pre-Sequence")
+                self.core.setProperty(cam,"ClearCycles", 2)
+                if self.settings.get("camera_binning"):
+                    self.core.setProperty(cam, "Binning", self.settings["camera_binning"])   # hardware binning, e.g. "2x2"
+                self.core.startContinuousSequenceAcquisition(0)      # buffer size
+            except Exception as e:
+                self.log_event(f"Warning setting camera properties: [e]", "orange")
         try:
             if hasattr(self.core, "isSequenceRunning") and self.core.isSequenceRunning():
                 pass
@@ -321,15 +713,13 @@ class LiveImagingGUI(QWidget):
         except Exception as e:
             self.log_event(f"Could not start continuous sequence acquisition: {e}", "red")
 
-        self.live_thread = LivePreviewThread(core=self.core, lock=self.camera_lock)
-        self.live_thread.image_ready.connect(self.update_live_frame)
-        # self.live_thread.burst_started_signal.connect(self.on_burst_started)
+        self.live_thread = LivePreviewThread(core=self.core, lock=self.camera_lock, bus=self.frame_bus)
         self.live_thread.log_event_signal.connect(self.log_event)
-        # self.live_thread.burst_done_signal.connect(self.on_burst_done)
         self.live_thread.start()
 
 
         self.log_event("Core loaded successfully", "green")
+        self.mark_startup("core_loaded")
         self.log_event("Continuous sequence acquisition started", "green")
 
         self.live_btn.setEnabled(True)
@@ -438,6 +828,26 @@ class LiveImagingGUI(QWidget):
         self.fps_combo.setCurrentText("30")
         acq_layout.addWidget(self.fps_combo, 2, 3)
 
+        lbl = QLabel("Trigger Mode")
+        lbl.setProperty("noBorder", True)
+        lbl.setStyleSheet("QLabel[noBorder='true'] { border:none }")
+        acq_layout.addWidget(lbl, 3, 0)
+        self.trigger_mode_combo = QComboBox()
+        self.trigger_mode_combo.addItems(["Internal (free-run)", "External (Arduino)"])
+        acq_layout.addWidget(self.trigger_mode_combo, 3, 1)
+
+        self.protocol_btn = QPushButton("Load Protocol")
+        self.protocol_btn.clicked.connect(self.browse_protocol)
+        acq_layout.addWidget(self.protocol_btn, 3, 2)
+        self.protocol_label = QLabel("Manual (spin boxes)")
+        self.protocol_label.setProperty("noBorder", True)
+        self.protocol_label.setStyleSheet("QLabel[noBorder='true'] { border:none }")
+        acq_layout.addWidget(self.protocol_label, 3, 3)
+
+        self.pretrigger_cb = QCheckBox("Pre-trigger buffer")
+        self.pretrigger_cb.setToolTip("Keep the last seconds of frames in memory and start bursts at the TTL")
+        acq_layout.addWidget(self.pretrigger_cb, 4, 0, 1, 2)
+
         self.acq_group.set_layout(acq_layout)
 # Camera Controls
         self.camera_group = CollapsibleGroupBox("Camera Controls")
@@ -465,6 +875,7 @@ class LiveImagingGUI(QWidget):
         cam_layout.addWidget(self.stop_btn, 3, 2)
         self.record_cb = QCheckBox("Record")
         self.record_cb.setChecked(False)
+        self.record_cb.setToolTip("Record a binned, low frame rate copy of the stream for the whole session")
         cam_layout.addWidget(self.record_cb, 4, 2)
         self.camera_group.set_layout(cam_layout)
         lbl = QLabel("Brightness")
@@ -480,14 +891,21 @@ class LiveImagingGUI(QWidget):
         lbl.setStyleSheet("QLabel[noBorder='true'] { border:none }")
         cam_layout.addWidget(lbl, 2, 0)
 
-        self.core_thread = LoadCoreThread(self.cfg_path)
+        self.core_thread = LoadCoreThread(self.cfg_path, synthetic=os.environ.get("CALCIUM_SYNTHETIC_CORE") == "1")
         self.core_thread.core_loaded.connect(self.on_core_loaded)
         self.load_core = QPushButton("Load Camera Config")
         cam_layout.addWidget(self.load_core, 4, 0)
-        self.load_core.clicked.connect(self.core_thread.start)
+        self.load_core.clicked.connect(self.load_core_async)
         self.stop_core = QPushButton("Refresh Camera Config")
         cam_layout.addWidget(self.stop_core, 4,1)
         self.stop_core.clicked.connect(self.core_reset)
+        self.dry_run_btn = QPushButton("Dry Run")
+        self.dry_run_btn.clicked.connect(lambda: self.start_dry_run())
+        cam_layout.addWidget(self.dry_run_btn, 5, 0)
+        self.dry_run_realtime_cb = QCheckBox("Real-time")
+        cam_layout.addWidget(self.dry_run_realtime_cb, 5, 1)
+        self.profile_cb = QCheckBox("Profile")
+        cam_layout.addWidget(self.profile_cb, 5, 2)
 
     # Arduino Controls
         self.arduino_group = CollapsibleGroupBox("Arduino Controls")
@@ -561,15 +979,23 @@ class LiveImagingGUI(QWidget):
             }
         """)
         self.log_group.content_frame.setStyleSheet("""QFrame {border: none;background-color: #444;}""")
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        #self.log_text.setStyleSheet("background-color:#444; color:#f0f0f0; font-family: monospace;")
+        # model-view list: fixed row height and a capped row count keep appends cheap all session
+        self.log_text = QListView()
+        self.log_text.setModel(self.log_model)
+        self.log_text.setUniformItemSizes(True)
         self.log_text.setMaximumHeight(150)
         self.log_text.setProperty("noBorder", True)
-        self.log_text.setStyleSheet("""QTextEdit[noBorder='true'] {border: none;background-color: #444;color: #f0f0f0;font-family: monospace;}""")
+        self.log_text.setStyleSheet("""QListView[noBorder='true'] {border: none;background-color: #444;color: #f0f0f0;font-family: monospace;}""")
         log_layout.addWidget(self.log_text)
         self.log_group.set_layout(log_layout)
 
+    # Performance metrics
+        self.metrics_group = CollapsibleGroupBox("Performance")
+        self.metrics_panel = MetricsPanel()
+        self.metrics_group.add_widget(self.metrics_panel)
+        self.metrics_group.toggle_btn.setChecked(False)
+        self.metrics_group.on_toggle()
+
         self.main_layout = QVBoxLayout()
         self.main_layout.setContentsMargins(2, 2, 2, 2)
         self.main_layout.setSpacing(2)
@@ -578,6 +1004,7 @@ class LiveImagingGUI(QWidget):
         self.main_layout.addWidget(self.acq_group)
         self.main_layout.addWidget(self.camera_group)
         self.main_layout.addWidget(self.info_group)
+        self.main_layout.addWidget(self.metrics_group)
         self.main_layout.addWidget(self.log_group)
         self.setLayout(self.main_layout)
 
@@ -603,79 +1030,99 @@ class LiveImagingGUI(QWidget):
 
     def log_event(self, msg, color="white"):
         timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]  # include milliseconds
-        self.log_text.append(f"<span style='color:{color}'>{timestamp} - {msg}</span>")
+        self.log_queue.put((timestamp, msg, color))
 
-    def flush_log_queue(self):
-        while not self.log_queue.empty():
+    def flush_log_queue(self, max_entries=1000):
+        # one model insert and one file hand-off per tick, however busy the threads were
+        batch = []
+        while len(batch) < max_entries:
             try:
                 ts, msg, color = self.log_queue.get_nowait()  # expects exactly 3
-                self.log_text.append(f"<span style='color:{color}'>{ts} - {msg}</span>")
-            except Exception as e:
-                print("Log flush error:", e)
+            except Empty:
+                break
+            batch.append((ts, msg, color))
+        if not batch:
+            return
+        for ts, msg, color in batch:
+            if color == "red":
+                self.journal_event("error", self.burst_index, detail=msg)
+        self.session_log.put_batch(batch)
+        at_bottom = self.log_text.verticalScrollBar().value() >= self.log_text.verticalScrollBar().maximum()
+        self.log_model.append_batch(batch)
+        if at_bottom:
+            self.log_text.scrollToBottom()
 
     # -------------------- Folder & Arduino --------------------
     def browse_folder(self):
         folder = QFileDialog.getExistingDirectory(self,"Select Save Folder")
         if folder: self.save_path_edit.setText(folder)
+        if folder and self.settings.get("preflight_benchmark", True) and cached_write_bandwidth(folder) is None:
+            self.probe_write_bandwidth(folder)   # measured in the background before the first session
 
     def test_ttl(self):
         if not self.arduino: self.open_arduino()
         if self.arduino: 
-            try:
-                ts = datetime.now().strftime("%H:%M:%S.%f")[:-3] 
-                self.log_queue.put((ts, "TTL sent successfully", "yellow"))
-                self.arduino.write(b'H')
-                self.arduino.flush()
-                self.arduino.flushInput()  # Clear any previous input
-                self.arduino.flushOutput()  # Clear any previous output
-            except Exception as e:
-                self.set_overlay("TTL ERROR", color="red")
-                QTimer.singleShot(500, lambda: self.set_overlay("READY", color="green"))
-                self.log_event(f"Error sending TTL pulse: {e}", color="red")
+            ts = datetime.now().strftime("%H:%M:%S.%f")[:-3] 
+            self.log_queue.put((ts, "TTL queued", "yellow"))
+            self.arduino.send(pulse_command(1000), expect="pulse_ended")
 
     def send_ttl_threaded(self, frequency_hz=40, duration_ms=300, mode="Train"):
+        # pulse width and train timing are handled on the Arduino; only one command goes out
         if not self.arduino:
             self.open_arduino()
         if not self.arduino:
             return
 
-        def ttl_worker():
-            ts = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-            try:
-                if mode == "Single Pulse":
-                # Send one TTL pulse (1 ms)
-                    self.arduino.write(b'H')
-                    time.sleep(0.001)
-                    self.arduino.write(b'L')
-                    self.log_queue.put((ts, f"{mode} sent successfully", "yellow"))
-                else:
-                # Calculate interval between pulses
-                    interval = 1.0 / frequency_hz
-                    pulses = int(duration_ms / 1000 * frequency_hz)
-                    for _ in range(pulses):
-                        self.arduino.write(b'H')
-                        time.sleep(0.001)  # pulse width 1 ms
-                        self.arduino.write(b'L')
-                        time.sleep(interval - 0.001)
-                        self.log_queue.put((ts, f"{mode} sent {pulses} pulses at {frequency_hz} Hz for {duration_ms} ms successfully", "yellow"))
-
-            except Exception as e:
-                self.set_overlay("TTL ERROR", color="red")
-                QTimer.singleShot(500, lambda: self.set_overlay("READY", color="green"))
-                self.log_event(f"Error sending TTL pulse: {e}", color="red")
-
-        threading.Thread(target=ttl_worker, daemon=True).start()
+        ts = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        t0 = time.perf_counter()
+        TTL_COMMANDS.inc()
+        if mode == "Single Pulse":
+            self.arduino.send(pulse_command(1000), expect="pulse_ended")  # pulse width 1 ms
+            TTL_DISPATCH_MS.observe((time.perf_counter() - t0) * 1000.0)
+            self.log_queue.put((ts, f"{mode} queued", "yellow"))
+        else:
+            pulses = self.arduino.send_train(frequency_hz, duration_ms, pulse_ms=1.0)
+            TTL_DISPATCH_MS.observe((time.perf_counter() - t0) * 1000.0)
+            self.log_queue.put((ts, f"{mode} queued: {pulses} pulses at {frequency_hz} Hz for {duration_ms} ms", "yellow"))
 
     def open_arduino(self):
         if self.run_trigger_cb.isChecked():
-            try:
-                self.arduino = serial.Serial(self.serial_edit.text(),int(self.baud_combo.currentText()),timeout=1)
-            except Exception as e:
-                self.log_event(f"Arduino error: {e}"); self.arduino=None
+            port, baud = self.serial_edit.text(), int(self.baud_combo.currentText())
+            if self.arduino and (self.arduino.port, self.arduino.baud) == (port, baud):
+                return
+            if self.arduino:
+                self.arduino.close()
+            # one persistent connection per GUI session; reconnects on its own
+            self.arduino = SerialManager(port, baud, on_event=self.on_serial_event)
+            self.arduino.start()
         else: 
             self.log_event("Arduino not enabled", color = "red")
             QTimer.singleShot(500, lambda: self.set_overlay("READY", color = "green"))
 
+    def on_serial_event(self, event):
+        # called from the serial threads; only touches the thread-safe log queue
+        kind, values = event["kind"], event["values"]
+        if kind in SERIAL_JOURNAL_KINDS:
+            detail = f"{kind} {event['text']}" if SERIAL_JOURNAL_KINDS[kind] == "error" else event["text"]
+            self.journal_event(SERIAL_JOURNAL_KINDS[kind], self.burst_index, detail=detail,
+                               t_ns=event["t_ns"], wall=event["wall"])
+        if kind == "tx":
+            return
+        if values.get("latency_ms") is not None:
+            TTL_ACK_MS.observe(values["latency_ms"])
+        ts = datetime.fromtimestamp(event["wall"]).strftime("%H:%M:%S.%f")[:-3]
+        if kind == "connected":
+            self.arduino_connected.emit()
+            self.log_queue.put((ts, f"Arduino connected on {values['port']} at {values['baud']} baud", "green"))
+        elif kind in ("disconnected", "error"):
+            self.log_queue.put((ts, f"Arduino error: {values.get('error')} (reconnecting)", "red"))
+        elif kind in ("missed", "timeout"):
+            self.log_queue.put((ts, f"Arduino {event['text']} {kind}: {values.get('error')}", "red"))
+        elif values.get("latency_ms") is not None:
+            self.log_queue.put((ts, f"Arduino: {event['text']} (ack {values['latency_ms']:.1f} ms)", "yellow"))
+        elif kind in ("stim", "done", "text"):
+            self.log_queue.put((ts, f"Arduino: {event['text']}", "yellow"))
+
         # -------------------- Live Preview --------------------
     def toggle_live(self):
         # target_fps = int(self.fps_combo.currentText())
@@ -697,11 +1144,8 @@ class LiveImagingGUI(QWidget):
 
     # Start thread if not running
         if self.live_thread is None or not self.live_thread.isRunning():
-            fps = int(self.fps_combo.currentText())
-            self.live_thread = LivePreviewThread(core=self.core, lock=self.camera_lock)
-            self.live_thread.image_ready.connect(self.update_live_frame)
+            self.live_thread = LivePreviewThread(core=self.core, lock=self.camera_lock, bus=self.frame_bus)
             self.live_thread.log_event_signal.connect(self.log_event)
-            self.live_thread.burst_done_signal.connect(self.on_burst_done)
             self.live_thread.start()
 
     def start_live(self):
@@ -714,11 +1158,22 @@ class LiveImagingGUI(QWidget):
             self.live_thread.stop()
             self.live_thread.wait()
 
-        self.live_thread = LivePreviewThread(self.core, lock=self.camera_lock)
-        self.live_thread.image_ready.connect(self.update_live_frame)
+        self.live_thread = LivePreviewThread(self.core, lock=self.camera_lock, bus=self.frame_bus)
         self.live_thread.start()
         self.overlay_label.setText("LIVE ON")
 
+    def poll_preview(self):
+        # latest-only consumer: older frames are skipped, the GUI never falls behind
+        item = self.preview_cursor.poll()
+        if item is not None:
+            if not self.first_frame_seen:
+                self.first_frame_seen = True
+                self.mark_startup("first_frame")
+                if STARTUP_BENCH:
+                    QTimer.singleShot(0, QApplication.quit)
+            PREVIEW_FRAMES.inc()
+            self.update_live_frame(item[2])
+
     def update_live_frame(self, arr):
         # print("[DEBUG] Received frame:", arr.shape, arr.min(), arr.max())
         self.last_frame = arr
@@ -745,39 +1200,112 @@ class LiveImagingGUI(QWidget):
     def start_experiment(self):
         if self.arduino is None and self.run_trigger_cb.isChecked():
             self.open_arduino()
-            self.arduino.flushInput()  # Clear any previous input
-            self.arduino.flushOutput()  # Clear any previous output
-            if self.arduino is None:
-                self.log_event("Cannot start experiment: Arduino not connected", "red")
-                return
             
         if not self.core:
             self.log_event("Cannot start experiment: core not ready", "red")
             return
-        
-        if not self.record_cb.isChecked():
-            self.record_cb.setChecked(True)
-            self.log_event("Recording enabled for experiment", "yellow")
+
+        if self.trigger_mode_combo.currentText().startswith("External") and self.arduino is None:
+            self.log_event("Cannot start experiment: external trigger mode needs the Arduino", "red")
+            return
+
+        if self.arduino is not None and not self.arduino.connected.is_set():
+            # the manager opens the port on its own thread; start again when it reports "connected"
+            self.wait_for_arduino()
+            return
+
+        schedule = self.build_schedule()
+        if schedule is None:
+            return
+
+        report = self.run_preflight_check(schedule)
+        if report is None:
+            return
+        writer_mb_s = float(self.settings.get("writer_mb_s", 150.0))
+        if report.measured_mb_s:
+            writer_mb_s = min(writer_mb_s, report.measured_mb_s)
+
+        plan = plan_capacity(
+            exposure_ms=self.exp_spin.value(),
+            fps=int(self.fps_combo.currentText()),
+            roi_shape=(self.core.getImageHeight(), self.core.getImageWidth()),
+            burst_s=float(schedule["burst_duration_s"].max()),
+            wait_s=float(schedule["wait_interval_s"].min()),
+            writer_mb_s=writer_mb_s,
+            bytes_per_px=self.core.getBytesPerPixel(),
+            stall_s=float(self.settings.get("stall_s", 1.0)),
+            max_circular_frames=int(self.settings.get("circular_buffer_frames", 2000)),
+        )
+        if not plan.ok:
+            for problem in plan.problems:
+                self.log_event(f"Cannot start experiment: {problem}", "red")
+            self.log_event(plan.summary().replace("\n", "<br>"), "orange")
+            self.set_overlay("CAPACITY ERROR", color="red")
+            return
+        try:
+            reducer = ReductionStage.from_settings(self.settings, (self.core.getImageHeight(), self.core.getImageWidth()))
+        except ValueError as e:
+            self.log_event(f"Cannot start experiment: {e}", "red")
+            return
+        self.apply_capacity_plan(plan)
+        self.external_trigger = self.trigger_mode_combo.currentText().startswith("External")
+        if self.external_trigger and not self.set_camera_trigger(external=True):
+            # a free-running camera would make trigger_index and stim wrong for every frame
+            self.log_event("Cannot start experiment: camera did not switch to external trigger", "red")
+            self.set_camera_trigger(external=False)
+            self.external_trigger = False
+            return
         
         base_folder = self.save_path_edit.text() or "."
         exp_folder = f"{self.expt_name_edit.text()}_{self.expt_type_edit.text()}_{self.final_titer_edit.text()}"
+        if self.dry_run is not None:
+            exp_folder = "DRYRUN_" + exp_folder
         file_name = f"{self.mouse_id_edit.text()}_{datetime.now():%H%M%S}_{datetime.now():%d%m%y}"
         self.title_folder = os.path.join(base_folder, exp_folder)
         self.session_folder = os.path.join(self.title_folder, file_name)
         os.makedirs(self.session_folder, exist_ok=True)
-
-        self.experiment_duration_s = float(self.total_time_spin.value()) * 60.0  # convert to seconds
-        self.burst_duration_s = float(self.burst_duration_spin.value())
-        self.pause_between_bursts_s = float(self.wait_interval_spin.value())
-        self.start_time = time.time()
+        self.session_log.set_path(os.path.join(self.session_folder, "session_log.jsonl"))
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = EventJournal(os.path.join(self.session_folder, "events.journal"),
+                                    meta={"mouse_id": self.mouse_id_edit.text(), "dry_run": self.dry_run is not None},
+                                    anchor_t_ns=self.perf_ns(), anchor_wall=self.now())
+        self.journal.start()
+        if self.profile_cb.isChecked():
+            self.start_profiling()
+
+        self.schedule = schedule
+        self.experiment_duration_s = schedule_duration_s(schedule)
+        self.start_time = self.now()
+        if self.dry_run is not None:
+            self.dry_run.mark("session_start")
+        self.journal_event("session_start", value=len(schedule), detail=self.protocol.get("name", "") if self.protocol else "manual")
         self.experiment_running = True
         self.burst_index = 0
         self.target_fps = int(self.fps_combo.currentText())
-        self.total_bursts = int(self.experiment_duration_s / (self.burst_duration_s + self.pause_between_bursts_s))
-        self.burst_job_queue = Queue(maxsize=2000)
-        self.writer_thread = FrameWriterThread(self.burst_job_queue)
-        self.writer_thread.log_event_signal.connect(self.log_event)
-        self.writer_thread.start()
+        self.total_bursts = len(schedule)
+        save_schedule(os.path.join(self.session_folder, "schedule.csv"), schedule)
+        if self.protocol is not None:
+            with open(os.path.join(self.session_folder, "protocol.json"), "w") as f:
+                json.dump(self.protocol, f, indent=4)
+        bleach_mode = self.settings.get("bleach_mode", "session")
+        self.bleach_corrector = None if bleach_mode == "off" else BleachCorrector(mode=bleach_mode, dark_level=self.settings.get("dark_level"))
+        if self.bleach_corrector is not None:
+            self.log_event(f"Bleach correction ({bleach_mode} fit): parameters are fitted during the session, "
+                           f"saved bursts stay raw (offline correction with bleach_correction.py)", "yellow")
+        if self.dry_run is not None and self.dry_run.virtual:
+            self.burst_job_queue = self.dry_run.make_writer_queue(writer_mb_s)
+            self.writer_thread = None
+        else:
+            self.burst_job_queue = Queue(maxsize=plan.burst_queue_size)
+            self.reducer = reducer
+            if self.reducer is not None:
+                self.log_event(f"Reduction before writing: {self.reducer.bin_factor}x{self.reducer.bin_factor} bin, "
+                               f"{self.reducer.temporal_sum}-frame sum, {len(self.reducer.crops)} crops, "
+                               f"rescale {self.reducer.rescale}", "yellow")
+            self.writer_thread = FrameWriterThread(self.burst_job_queue, journal=self.journal, reducer=self.reducer)
+            self.writer_thread.log_event_signal.connect(self.log_event)
+            self.writer_thread.start()
 
         cam = self.core.getCameraDevice()
         try:
@@ -786,19 +1314,268 @@ class LiveImagingGUI(QWidget):
         except Exception:
             pass
 
-        if self.live_thread is None or not self.live_thread.isRunning():
-            self.live_thread = LivePreviewThread(self.core, lock=self.camera_lock)
-            self.live_thread.image_ready.connect(self.update_live_frame)
+        if self.dry_run is not None and self.dry_run.virtual:
+            pass   # simulated bursts make their own frames
+        elif self.live_thread is None or not self.live_thread.isRunning() or self.live_thread.core is not self.core:
+            if self.live_thread is not None:
+                self.live_thread.stop()
+                self.live_thread.wait(2000)
+            self.live_thread = LivePreviewThread(self.core, lock=self.camera_lock, bus=self.frame_bus)
             self.live_thread.log_event_signal.connect(self.log_event)
-            self.live_thread.burst_done_signal.connect(self.on_burst_done)
             self.live_thread.start()
 
-        if self.live_window is None or not self.live_window.isVisible():
+        if self.record_cb.isChecked() and not self.external_trigger and not (self.dry_run is not None and self.dry_run.virtual):
+            self.start_background_recording()
+
+        if self.pretrigger_cb.isChecked() and not self.external_trigger and not (self.dry_run is not None and self.dry_run.virtual):
+            self.start_pretrigger_ring(schedule)
+
+        if self.dry_run is None and (self.live_window is None or not self.live_window.isVisible()):
             self.live_window = LivePreviewWindow(core=self.core, lock=self.camera_lock)
             self.live_window.show()
 
-        self.set_overlay("EXPERIMENT IN PROGRESS...", color="blue")
-        QTimer.singleShot(0, self.start_burst_and_ttl)
+        self.set_overlay("DRY RUN IN PROGRESS..." if self.dry_run else "EXPERIMENT IN PROGRESS...", color="blue")
+        self.call_later(0, self.start_burst_and_ttl)
+
+    def now(self):
+        # the dry run swaps in a virtual clock; everything in the burst schedule goes through these
+        return self.dry_run.clock.time() if self.dry_run is not None else time.time()
+
+    def perf_ns(self):
+        return self.dry_run.clock.perf_ns() if self.dry_run is not None else time.perf_counter_ns()
+
+    def start_profiling(self):
+        PROFILER.reset()
+        PROFILER.enabled = True
+        if self.settings.get("profile_sampling", True):
+            self.sampler = SamplingProfiler(interval_ms=self.settings.get("profile_interval_ms", 5.0))
+            self.sampler.start()
+        self.log_event("Profiling enabled for this session", "yellow")
+
+    def finish_profiling(self):
+        # stage histograms (and the folded-stack flamegraph input) land next to the bursts
+        PROFILER.enabled = False
+        try:
+            text = PROFILER.dump(self.session_folder)
+            self.log_event("Stage timing:\n" + text, "white")
+            if self.sampler is not None:
+                self.sampler.stop()
+                path = self.sampler.save(os.path.join(self.session_folder, "profile.folded"))
+                self.log_event(f"Flamegraph stacks ({self.sampler.samples} samples): {path} "
+                               f"(open in speedscope or flamegraph.pl)", "white")
+        except Exception as e:
+            self.log_event(f"Could not save profile: {e}", "orange")
+        self.sampler = None
+
+    def journal_event(self, kind, burst=-1, value=0, detail="", t_ns=None, wall=None):
+        # monotonic + wall pair on the experiment clock (virtual during a dry run)
+        if self.journal is not None:
+            self.journal.record(kind, burst, value, detail, t_ns=self.perf_ns() if t_ns is None else t_ns,
+                                wall=self.now() if wall is None else wall)
+
+    def call_later(self, delay_ms, fn):
+        if self.dry_run is not None:
+            self.dry_run.clock.call_later(delay_ms, fn)
+        else:
+            QTimer.singleShot(int(delay_ms), fn)
+
+    def start_dry_run(self, realtime=None, shape=None):
+        if self.experiment_running:
+            self.log_event("Cannot start dry run: experiment in progress", "red")
+            return
+        if realtime is None:
+            realtime = self.dry_run_realtime_cb.isChecked()
+        if shape is None:
+            shape = (self.core.getImageHeight(), self.core.getImageWidth()) if self.core else (600, 600)
+        from dry_run import DryRun
+        dry = DryRun(realtime=realtime, shape=shape, fps=int(self.fps_combo.currentText()),
+                     serial_latency_ms=self.settings.get("dryrun_serial_latency_ms", 2.0))
+        if realtime and self.live_thread is not None and self.live_thread.isRunning():
+            self.live_thread.stop()   # the synthetic camera gets its own preview thread
+            self.live_thread.wait(2000)
+            self.live_thread = None
+        dry.install(self)
+        self.dry_run_summary = None
+        self.log_event(f"Dry run started ({'real time' if realtime else 'virtual clock'}, {shape[1]}x{shape[0]} synthetic camera)", "yellow")
+        self.start_experiment()
+        if not self.experiment_running:
+            dry.uninstall(self)
+            return
+        if dry.virtual:
+            # runs the whole session to completion; finish_experiment ends it through stop_experiment
+            try:
+                dry.clock.run()
+            except Exception as e:
+                self.log_event(f"Dry run failed: {e}", "red")
+                if self.dry_run is not None:
+                    self.stop_experiment()
+
+    def finish_dry_run(self):
+        dry = self.dry_run
+        dry.mark("session_end")
+        writer_mb_s = self.writer_thread.throughput_mb_s() if self.writer_thread else None
+        try:
+            self.dry_run_summary = dry.report(self.schedule, folder=self.session_folder, writer_mb_s=writer_mb_s)
+            self.log_event(self.dry_run_summary.replace("\n", "<br>"), "white")
+        except Exception as e:
+            self.log_event(f"Dry run report failed: {e}", "red")
+        dry.uninstall(self)
+        if dry.realtime and self.core is not None and self.live_thread is None:
+            self.live_thread = LivePreviewThread(self.core, lock=self.camera_lock, bus=self.frame_bus)
+            self.live_thread.log_event_signal.connect(self.log_event)
+            self.live_thread.start()
+
+    def build_schedule(self):
+        # a loaded protocol wins; otherwise every burst repeats the spin box values
+        base = {
+            "burst_duration_s": float(self.burst_duration_spin.value()),
+            "wait_interval_s": float(self.wait_interval_spin.value()),
+            "trigger_time_ms": float(self.trigger_time_spin.value()),
+            "ttl_frequency_hz": float(self.ttl_frequency_spin.value()),
+            "ttl_duration_ms": float(self.ttl_duration_spin.value()),
+            "ttl_mode": self.ttl_mode_combo.currentText(),
+        }
+        try:
+            if self.protocol is not None:
+                schedule = compile_protocol(self.protocol, base=base)
+            else:
+                schedule = uniform_schedule(float(self.total_time_spin.value()) * 60.0, **base)
+        except Exception as e:
+            self.log_event(f"Cannot start experiment: invalid protocol ({e})", "red")
+            return None
+        if not len(schedule):
+            self.log_event("Cannot start experiment: schedule has no bursts", "red")
+            return None
+        self.log_event(f"Schedule: {len(schedule)} bursts, {len(np.unique(schedule['condition']))} condition(s), "
+                       f"{schedule_duration_s(schedule) / 60:.1f} min", "white")
+        return schedule
+
+    def browse_protocol(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load Stimulation Protocol", "", "Protocol (*.json *.yaml *.yml);;All files (*)")
+        if not path:
+            # cancelling the dialog goes back to the spin box values
+            self.protocol = None
+            self.settings.pop("protocol_path", None)
+            self.protocol_label.setText("Manual (spin boxes)")
+            return
+        self.load_protocol_file(path)
+
+    def load_protocol_file(self, path):
+        try:
+            protocol = load_protocol(path)
+            compile_protocol(protocol)   # fail now rather than at Start
+        except Exception as e:
+            self.log_event(f"Could not load protocol {path}: {e}", "red")
+            return
+        self.protocol = protocol
+        self.settings["protocol_path"] = path
+        self.protocol_label.setText(protocol.get("name") or os.path.basename(path))
+        self.log_event(f"Protocol loaded: {path}", "yellow")
+
+    def run_preflight_check(self, schedule):
+        # before any session folder exists: volume, RAM and a short write benchmark on the target drive
+        burst_s = float(schedule["burst_duration_s"].max())
+        wait_s = float(schedule["wait_interval_s"].min())
+        fps = int(self.fps_combo.currentText())
+        total_bursts = len(schedule)
+        frame_bytes = self.core.getImageHeight() * self.core.getImageWidth() * self.core.getBytesPerPixel()
+        self.set_overlay("PRE-FLIGHT CHECK...", color="yellow")
+        folder = self.save_path_edit.text() or "."
+        measure = self.settings.get("preflight_benchmark", True)
+        measured_mb_s = cached_write_bandwidth(folder) if measure else None
+        if measured_mb_s is None and measure:
+            if self.dry_run is None:
+                # first session on this drive: benchmark on a worker, start again when it reports
+                self.probe_write_bandwidth(folder, then_start=True)
+                return None
+            self.log_event("Dry run: write bandwidth not measured yet, using the writer_mb_s setting", "orange")
+            measure = False
+        try:
+            report = run_preflight(folder, total_bursts, int(np.ceil(burst_s * fps)), frame_bytes,
+                                   burst_s, wait_s, measure=measure, measured_mb_s=measured_mb_s)
+        except Exception as e:
+            self.log_event(f"Pre-flight check failed: {e}", "red")
+            self.set_overlay("PRE-FLIGHT ERROR", color="red")
+            return None
+
+        self.log_event(report.summary().replace("\n", "<br>"), "white" if report.ok else "orange")
+        if not report.ok:
+            for problem in report.problems:
+                self.log_event(f"Cannot start experiment: {problem}", "red")
+            self.set_overlay("PRE-FLIGHT FAILED", color="red")
+            return None
+        return report
+
+    def wait_for_arduino(self):
+        if self.start_after_connect:
+            return
+        self.start_after_connect = True
+        self.connect_wait_id += 1
+        wait_id = self.connect_wait_id
+        timeout_s = float(self.settings.get("arduino_connect_timeout_s", 5.0))
+        self.log_event(f"Waiting for the Arduino on {self.arduino.port}...", "yellow")
+        self.set_overlay("CONNECTING ARDUINO...", color="yellow")
+        QTimer.singleShot(int(timeout_s * 1000), lambda: self.on_arduino_connect_timeout(wait_id, timeout_s))
+
+    def on_arduino_connected(self):
+        if not self.start_after_connect:
+            return
+        self.start_after_connect = False
+        if not self.experiment_running:
+            self.start_experiment()
+
+    def on_arduino_connect_timeout(self, wait_id, timeout_s):
+        if wait_id != self.connect_wait_id or not self.start_after_connect:
+            return
+        self.start_after_connect = False
+        port = self.arduino.port if self.arduino is not None else "?"
+        self.log_event(f"Cannot start experiment: Arduino not connected on {port} after {timeout_s:g} s", "red")
+        self.set_overlay("ARDUINO ERROR", color="red")
+
+    def probe_write_bandwidth(self, folder, then_start=False):
+        self.start_after_probe = self.start_after_probe or then_start
+        if self.bandwidth_probe is not None and self.bandwidth_probe.isRunning():
+            return
+        target = existing_parent(folder)
+        self.log_event(f"Measuring write bandwidth on {target}...", "yellow")
+        self.bandwidth_probe = BandwidthProbeThread(target, self.settings.get("preflight_mb", 64))
+        self.bandwidth_probe.measured.connect(self.on_bandwidth_measured)
+        self.bandwidth_probe.start()
+
+    def on_bandwidth_measured(self, target, mb_s, error):
+        start, self.start_after_probe = self.start_after_probe, False
+        if error:
+            self.log_event(f"Pre-flight check failed: write benchmark on {target}: {error}", "red")
+            if start:
+                self.set_overlay("PRE-FLIGHT ERROR", color="red")
+            return
+        self.log_event(f"Write bandwidth on {target}: {mb_s:.0f} MB/s", "white")
+        if start and not self.experiment_running:
+            self.start_experiment()
+
+    def apply_capacity_plan(self, plan):
+        # buffers can only be resized while the sequence is stopped and nothing publishes to the bus
+        live_core = None
+        if self.live_thread is not None and self.live_thread.isRunning():
+            live_core = self.live_thread.core
+            self.live_thread.stop()
+            self.live_thread.wait(2000)
+        with self.camera_lock:
+            running = self.core.isSequenceRunning()
+            if running:
+                self.core.stopSequenceAcquisition()
+            try:
+                apply_to_core(self.core, plan)
+            except Exception as e:
+                self.log_event(f"Could not resize circular buffer: {e}", "orange")
+            self.frame_bus.resize(plan.bus_frames)
+            if running:
+                self.core.startContinuousSequenceAcquisition(0)
+        if live_core is not None:
+            self.live_thread = LivePreviewThread(live_core, lock=self.camera_lock, bus=self.frame_bus)
+            self.live_thread.log_event_signal.connect(self.log_event)
+            self.live_thread.start()
+        self.log_event(plan.summary().replace("\n", "<br>"), "white")
 
     def on_burst_started(self, burst_idx):
         ts = datetime.now().strftime("%H:%M:%S.%f")[:-3]
@@ -806,27 +1583,47 @@ class LiveImagingGUI(QWidget):
 
     def start_burst_and_ttl(self):
         ts = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        ttl_freq = self.ttl_frequency_spin.value()
-        ttl_duration = self.ttl_duration_spin.value()
-        burst_number = self.burst_index + 1
-        self.burst_index = burst_number
-        burst_duration = float(self.burst_duration_spin.value()) # convert ms to s
-        ttl_delay_ms = int(self.trigger_time_spin.value())
-
         if not self.experiment_running:
             return
+        row = self.schedule[self.burst_index]
+        ttl_freq = float(row["ttl_frequency_hz"])
+        ttl_duration = float(row["ttl_duration_ms"])
+        ttl_mode = str(row["ttl_mode"])
+        burst_number = self.burst_index + 1
+        self.burst_index = burst_number
+        burst_duration = float(row["burst_duration_s"])
+        ttl_delay_ms = int(row["trigger_time_ms"])
+        if self.dry_run is not None:
+            self.dry_run.mark("burst_start", burst_number, due_s=float(row["t_start_s"]))
+        self.journal_event("burst_start", burst_number, value=ttl_delay_ms, detail=f"{ttl_mode} {ttl_freq:g} Hz {ttl_duration:g} ms")
 
         if burst_number == 1:
             self.log_queue.put((ts, f"Burst 1 scheduled to start immediately (TTL in {ttl_delay_ms} ms)", "orange"))
 
     # Schedule TTL independently
 
+        if self.pretrigger_ring is not None:
+            # baseline comes out of the ring, so recording starts at the TTL
+            self.call_later(ttl_delay_ms, lambda: self.start_burst_at_ttl(
+                burst_number, burst_duration - ttl_delay_ms / 1000.0, ttl_delay_ms, ttl_freq, ttl_duration, ttl_mode))
+            return
+
         # Start burst
         # self.burst_thread = BurstThread(burst_index=self.burst_index, duration_s=burst_duration)
-        self.burst_thread = BurstThread(burst_index=burst_number, duration_s=burst_duration)
-
-    # Connect live preview frames to burst collection
-        self.live_thread.new_frame.connect(self.burst_thread.collect_frame)
+        cursor = self.frame_bus.subscribe(f"burst_{burst_number:03d}", policy="lossless")
+        trigger_plan = None
+        if self.external_trigger:
+            # Arduino paces the camera and places the stimulus on an exact frame
+            trigger_plan = burst_trigger_plan(self.target_fps, burst_duration, ttl_delay_ms, mode=ttl_mode,
+                                              ttl_freq=ttl_freq, ttl_duration_ms=ttl_duration)
+        burst_kwargs = dict(burst_index=burst_number, duration_s=burst_duration + (1.0 if trigger_plan else 0.0),
+                            cursor=cursor, corrector=self.bleach_corrector, session_start=self.start_time, fps=self.target_fps,
+                            max_frames=trigger_plan["n_frames"] if trigger_plan else None,
+                            stim_frame=trigger_plan["stim_frame"] if trigger_plan else None)
+        if self.dry_run is not None and self.dry_run.virtual:
+            self.burst_thread = self.dry_run.make_burst(**burst_kwargs)
+        else:
+            self.burst_thread = BurstThread(**burst_kwargs)
 
     # Connect GUI logging
         self.burst_thread.burst_started.connect(self.on_burst_started)
@@ -834,11 +1631,99 @@ class LiveImagingGUI(QWidget):
         self.burst_thread.log_event_signal.connect(self.log_event)
     # Start burst
         self.burst_thread.start()
-        QTimer.singleShot(ttl_delay_ms,lambda: self.send_ttl_threaded(frequency_hz=ttl_freq,duration_ms=ttl_duration,mode=self.ttl_mode_combo.currentText()))
+        if trigger_plan:
+            self.send_arduino_command(trigger_plan["command"])
+            return
+        self.call_later(ttl_delay_ms,lambda: self.send_ttl_threaded(frequency_hz=ttl_freq,duration_ms=ttl_duration,mode=ttl_mode))
+
+    def start_burst_at_ttl(self, burst_number, post_s, ttl_delay_ms, ttl_freq, ttl_duration, ttl_mode):
+        if not self.experiment_running:
+            return
+        cursor = self.frame_bus.subscribe(f"burst_{burst_number:03d}", policy="lossless")
+        pre_s = float(self.settings.get("pretrigger_ms", ttl_delay_ms)) / 1000.0
+        # the baseline copy runs on the burst thread; the GUI thread only notes the TTL time
+        self.burst_thread = BurstThread(burst_index=burst_number, duration_s=max(post_s, 0.0), cursor=cursor,
+                                        corrector=self.bleach_corrector, session_start=self.start_time,
+                                        fps=self.target_fps, pretrigger=(self.pretrigger_ring, pre_s, time.perf_counter()))
+        self.burst_thread.burst_started.connect(self.on_burst_started)
+        self.burst_thread.burst_done.connect(self.on_burst_done)
+        self.burst_thread.log_event_signal.connect(self.log_event)
+        self.burst_thread.start()
+        self.send_ttl_threaded(frequency_hz=ttl_freq, duration_ms=ttl_duration, mode=ttl_mode)
+
+    def start_pretrigger_ring(self, schedule):
+        pre_ms = float(self.settings.get("pretrigger_ms", schedule["trigger_time_ms"].max()))
+        seconds = pre_ms / 1000.0 + 0.5   # margin for the snapshot landing a little after the TTL
+        self.pretrigger_ring = PreTriggerRing(self.frame_bus, seconds, self.target_fps)
+        shape = (self.core.getImageHeight(), self.core.getImageWidth())
+        self.pretrigger_ring.start()
+        self.log_event(f"Pre-trigger ring: {self.pretrigger_ring.n_slots} frames ({seconds:.1f} s), "
+                       f"{self.pretrigger_ring.nbytes(shape) / 1e6:.0f} MB", "yellow")
+
+    def start_background_recording(self):
+        self.background_recorder = BackgroundRecorder(
+            self.frame_bus, os.path.join(self.session_folder, "background"),
+            bin_factor=int(self.settings.get("background_bin", 4)), fps=float(self.settings.get("background_fps", 2.0)),
+            compression=self.settings.get("background_compression", "zlib"),
+            anchor_perf=time.perf_counter(), anchor_wall=time.time())
+        self.background_recorder.start()
+        self.log_event(f"Background recording at {self.background_recorder.bin_factor}x binning, "
+                       f"{1.0 / self.background_recorder.period_s:g} fps", "yellow")
+
+    def stop_background_recording(self):
+        if self.background_recorder is None:
+            return
+        self.background_recorder.stop()
+        self.log_event(self.background_recorder.summary(), "white")
+        self.background_recorder = None
+
+    def stop_pretrigger_ring(self):
+        if self.pretrigger_ring is None:
+            return
+        self.pretrigger_ring.stop()
+        if self.pretrigger_ring.dropped:
+            self.log_event(f"Pre-trigger ring dropped {self.pretrigger_ring.dropped} frames", "orange")
+        self.pretrigger_ring = None
+
+    def send_arduino_command(self, command):
+        expect = "armed" if command.startswith(b"A,") else None
+        return self.arduino.send(command, expect=expect)
 
-    def on_burst_done(self, burst_idx, frames_array):
+    def set_camera_trigger(self, external):
+        # property names differ between cameras, so they come from the settings file
+        cam = self.core.getCameraDevice()
+        prop = self.settings.get("trigger_property", "TriggerMode")
+        value = self.settings.get("trigger_external_value" if external else "trigger_internal_value",
+                                  "Edge Trigger" if external else "Internal Trigger")
+        # many cameras reject or defer a trigger change while a sequence runs, so stop it around the change
+        with self.camera_lock:
+            running = self.core.isSequenceRunning()
+            if running:
+                self.core.stopSequenceAcquisition()
+            try:
+                self.core.setProperty(cam, prop, value)
+                actual = self.core.getProperty(cam, prop)
+                if str(actual) != str(value):
+                    raise RuntimeError(f"camera reports {actual!r}")
+                ok = True
+            except Exception as e:
+                self.log_event(f"Could not set camera {prop} to {value}: {e}", "red")
+                ok = False
+            if running:
+                self.core.startContinuousSequenceAcquisition(0)
+        if ok:
+            self.log_event(f"Camera {prop} = {value}", "yellow")
+        return ok
+
+    def on_burst_done(self, burst_idx, frames_array, frame_index=None):
         ts = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         self.log_queue.put((ts, f"Burst {burst_idx} done, {len(frames_array)} frames captured", "green"))
+        if self.dry_run is not None:
+            self.dry_run.mark("burst_done", burst_idx, detail=f"{len(frames_array)} frames")
+        self.journal_event("burst_stop", burst_idx, value=len(frames_array))
+        seqs = (frame_index or {}).get("bus_seq") or []
+        if seqs:
+            self.journal_event("frame_batch", burst_idx, value=len(seqs), detail=f"bus seq {seqs[0]}-{seqs[-1]}")
 
     # Save burst to disk
         save_folder = self.session_folder
@@ -846,17 +1731,18 @@ class LiveImagingGUI(QWidget):
         out_path = os.path.join(save_folder, f"burst_{burst_idx:03d}.tif")
     
     # Queue the array to the writer
-        self.burst_job_queue.put((out_path, frames_array))
+        self.burst_job_queue.put((out_path, frames_array, frame_index, burst_idx))
+        WRITER_QUEUE.set(self.burst_job_queue.qsize() if isinstance(self.burst_job_queue, Queue) else 0)
         self.log_queue.put((ts, f"Burst {burst_idx} for Mouse {self.mouse_id_edit.text()} Saved to: {self.title_folder}", "green"))
-        if self.experiment_running:
-            burst_interval = float(self.wait_interval_spin.value()) * 1000
-            burst_duration = float(self.burst_duration_spin.value()) * 1000  # ms
-            ttl_delay_ms = int(self.trigger_time_spin.value())
-            burst_number = self.burst_index + 1
-
+        if not self.experiment_running:
+            return
         if self.burst_index < self.total_bursts:
-            self.log_queue.put((ts, f"Burst {burst_number} scheduled in {(burst_interval) / 1000:.1f} s (TTL after {ttl_delay_ms} ms)" , "orange"))
-            QTimer.singleShot(int(burst_interval), self.start_burst_and_ttl)
+            # next start comes from the precompiled table, so late bursts do not push the rest back
+            row = self.schedule[self.burst_index]
+            delay_ms = max(0.0, (self.start_time + float(row["t_start_s"]) - self.now()) * 1000.0)
+            self.log_queue.put((ts, f"Burst {int(row['burst'])} scheduled in {delay_ms / 1000:.1f} s "
+                                    f"(TTL after {row['trigger_time_ms']:g} ms, {row['ttl_mode']} {row['ttl_frequency_hz']:g} Hz)", "orange"))
+            self.call_later(delay_ms, self.start_burst_and_ttl)
         else:
             self.finish_experiment()
             
@@ -872,17 +1758,60 @@ class LiveImagingGUI(QWidget):
         cam = self.core.getCameraDevice()
         self.core.setProperty(cam,"ClearMode", "Pre-Exposure")
         self.core.setProperty(cam,"ClearCycles", 2)
+        if getattr(self, "external_trigger", False):
+            if self.arduino:
+                self.send_arduino_command(ABORT_COMMAND)
+            self.set_camera_trigger(external=False)
+            self.external_trigger = False
 
         if self.writer_thread and self.writer_thread.isRunning():
             self.writer_thread.stop()
+            measured = self.writer_thread.throughput_mb_s()
+            if measured:
+                self.settings["writer_mb_s"] = round(measured, 1)
+            if self.reducer is not None:
+                self.log_event(self.reducer.report(), "white")
+                try:
+                    with open(os.path.join(self.session_folder, "reduction.json"), "w") as f:
+                        json.dump(self.reducer.summary(), f, indent=4)
+                except Exception as e:
+                    self.log_event(f"Could not save reduction report: {e}", "orange")
 
         if hasattr(self, "current_burst_thread") and self.burst_thread.isRunning():
             self.burst_thread.stop()
             self.burst_thread.wait()
 
+        self.stop_pretrigger_ring()
+        self.stop_background_recording()
+        self.save_bleach_correction()
+
+        if PROFILER.enabled:
+            self.finish_profiling()
+
+        self.journal_event("session_stop", self.burst_index)
+        if self.journal is not None:
+            self.journal.close()   # writer has been stopped above, so its completions are in
+            self.journal = None
+
+        if self.dry_run is not None:
+            self.finish_dry_run()
+
         self.set_overlay("EXPERIMENT STOPPED", color="red")
         QTimer.singleShot(2000, lambda: self.set_overlay("READY", color="green"))
 
+    def save_bleach_correction(self):
+        # written once per session (finish or stop); the raw bursts stay uncorrected
+        if self.bleach_corrector is None or not self.bleach_corrector.bursts:
+            return
+        path = os.path.join(self.session_folder, "bleach_correction.json")
+        try:
+            self.bleach_corrector.finalize()   # bursts stored the partial fit of their time
+            self.bleach_corrector.save(path)
+            self.log_event(f"Bleach correction parameters for {len(self.bleach_corrector.bursts)} bursts saved to {path}; "
+                           f"apply them offline with bleach_correction.py --saved", "white")
+        except Exception as e:
+            self.log_event(f"Could not save bleach correction parameters: {e}", "orange")
+
     def core_reset(self):
         # stop acquisition safely
         try:
@@ -904,8 +1833,9 @@ class LiveImagingGUI(QWidget):
         try:
             if getattr(self, "core_thread", None) and self.core_thread.isRunning():
                 self.core_thread.stop()
-            self.core_thread = LoadCoreThread(self.cfg_path)
+            self.core_thread = LoadCoreThread(self.cfg_path, synthetic=self.core_thread.synthetic)
             self.core_thread.core_loaded.connect(self.on_core_loaded)
+            self.core_thread.acquisition = self.acquisition_process_args()
             self.core_thread.start()
         except Exception as e:
             self.log_event(f"Failed to restart core thread: {e}", "red")
@@ -933,6 +1863,13 @@ class LiveImagingGUI(QWidget):
             self.trigger_time_spin.setValue(settings.get("trigger_time", 2))
             self.serial_edit.setText(settings.get("arduino_port", "COM5"))
             self.baud_combo.setCurrentText(settings.get("baud_rate", "115200"))
+            self.trigger_mode_combo.setCurrentText(settings.get("trigger_mode", "Internal (free-run)"))
+            self.log_model.max_lines = int(settings.get("log_max_lines", 2000))
+            self.profile_cb.setChecked(settings.get("profiling", False))
+            self.pretrigger_cb.setChecked(settings.get("pretrigger", False))
+            self.record_cb.setChecked(settings.get("record", False))
+            if settings.get("protocol_path"):
+                self.load_protocol_file(settings["protocol_path"])
         except FileNotFoundError:
             self.log_event("Settings file not found, using defaults.")        
 
@@ -955,6 +1892,9 @@ class LiveImagingGUI(QWidget):
             "baud_rate": self.baud_combo.currentText(),
             "send_ttl": self.run_trigger_cb.isChecked(),
             "record": self.record_cb.isChecked(),
+            "trigger_mode": self.trigger_mode_combo.currentText(),
+            "profiling": self.profile_cb.isChecked(),
+            "pretrigger": self.pretrigger_cb.isChecked(),
             "exp": self.exp_spin.value()
         })
 
@@ -977,8 +1917,12 @@ class LiveImagingGUI(QWidget):
             self.writer_thread.wait(2000)
             self.writer_thread = None
 
+    # Close the session-long consumers so their last chunks reach disk
+        self.stop_background_recording()
+        self.stop_pretrigger_ring()
+
     # Close Arduino
-        if getattr(self, "arduino", None) and getattr(self.arduino, "is_open", False):
+        if getattr(self, "arduino", None):
             self.arduino.close()
 
     # Close live window
@@ -989,6 +1933,9 @@ class LiveImagingGUI(QWidget):
         if getattr(self, "core", None):
             try:
                 self.core.stopSequenceAcquisition()
+            except Exception:
+                pass   # reset below still releases the devices (or the acquisition process and its ring)
+            try:
                 self.core.reset()
             except Exception as e:
                 self.log_event(f"Error resetting core: {e}", "red")
@@ -997,6 +1944,14 @@ class LiveImagingGUI(QWidget):
 
     # Save settings
         self.save_settings()
+
+    # Stop metrics endpoint
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+    # Drain the last log entries to the session file
+        self.flush_log_queue()
+        self.session_log.stop()
         event.accept()
         super().closeEvent(event)
 
@@ -1026,5 +1981,5 @@ if __name__ == "__main__":
             gui.writer_thread.stop()
             gui.writer_thread.wait()
 
-app.aboutToQuit.connect(cleanup)
-sys.exit(app.exec_())
+    app.aboutToQuit.connect(cleanup)
+    sys.exit(app.exec_())
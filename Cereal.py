@@ -1,66 +1,169 @@
 import threading
 import queue
 import time
-import tifffile
+from chunked_tiff import ChunkedTiffWriter
+from capacity import plan_capacity
 
 class CameraWorker:
-    def __init__(self, core, gui):
+    def __init__(self, core, gui, save_queue_size=None, chunk_size=100, burst_s=2.0, wait_s=0.0, writer_mb_s=150.0):
         self.core = core
         self.gui = gui
-        self.frame_queue = queue.Queue(maxsize=10)   # live frames
-        self.save_queue = queue.Queue(maxsize=100)   # burst save buffer
+        # free-running camera: frames arrive at the exposure rate; queue depth from capacity.plan_capacity
+        exposure_ms = self.core.getExposure()
+        self.plan = plan_capacity(
+            exposure_ms=exposure_ms, fps=1000.0 / exposure_ms if exposure_ms > 0 else 30.0,
+            roi_shape=(self.core.getImageHeight(), self.core.getImageWidth()), burst_s=burst_s, wait_s=wait_s,
+            writer_mb_s=writer_mb_s, bytes_per_px=self.core.getBytesPerPixel())
+        for problem in self.plan.problems:
+            self.gui.log(f"Capacity: {problem}")
+        if save_queue_size is None:
+            save_queue_size = self.plan.save_queue_frames
+        self.save_queue = queue.Queue(maxsize=save_queue_size)   # burst save buffer
+        self.chunk_size = chunk_size     # frames per saved stack; 1 gives one file per frame
+        self.burst_count = 0
         self.burst_active = False
         self.running = True
 
+        # Live display is latest-only: one slot, overwritten by every new frame
+        self._latest = None
+        self._latest_event = threading.Event()
+
+        # Throughput / integrity counters (read with stats())
+        self.popped = 0          # frames taken out of the circular buffer
+        self.dropped = 0         # gaps in the camera image numbers
+        self.duplicates = 0      # repeated image numbers, not passed on
+        self.overflows = 0       # circular buffer overflow events
+        self.queued = 0          # frames handed to the save path
+        self.saved = 0           # frames written by the save thread
+        self.save_stalls = 0     # times the acquire loop waited on a full save queue
+        self.last_seq = None
+        self.burst_t0 = None
+        self.burst_t1 = None
+        self.burst_popped = 0
+
         # Start acquisition
-        self.core.startContinuousSequenceAcquisition(0)  
+        self.core.startContinuousSequenceAcquisition(0)
 
         # Launch threads
         threading.Thread(target=self._acquire_loop, daemon=True).start()
         threading.Thread(target=self._display_loop, daemon=True).start()
         threading.Thread(target=self._save_loop, daemon=True).start()
 
+    def _pop(self):
+        """Pop the oldest frame with its camera image number (None if the camera does not report one)."""
+        if hasattr(self.core, "popNextImageAndMD"):
+            frame, md = self.core.popNextImageAndMD()
+            try:
+                return frame, int(md["ImageNumber"])
+            except Exception:
+                return frame, None
+        return self.core.popNextImage(), None
+
     def _acquire_loop(self):
-        """Continuously pull frames from camera into frame_queue (and save_queue if burst is active)."""
+        """Drain every frame from the circular buffer in order; live gets the newest, saving gets all of them."""
+        seq = 0
         while self.running:
-            if self.core.getRemainingImageCount() > 0:
-                frame = self.core.getLastImage()
-                # Push to live display
-                if not self.frame_queue.full():
-                    self.frame_queue.put(frame, block=False)
-                # Push to save if burst active
-                if self.burst_active and not self.save_queue.full():
-                    self.save_queue.put(frame, block=False)
-            else:
+            if self.core.getRemainingImageCount() == 0:
+                if getattr(self.core, "isBufferOverflowed", lambda: False)():
+                    self.overflows += 1
+                    self.gui.log("Circular buffer overflowed, frames lost")
+                    self.core.clearCircularBuffer()
                 time.sleep(0.001)
+                continue
+
+            while self.running and self.core.getRemainingImageCount() > 0:
+                frame, image_number = self._pop()
+                ts = time.perf_counter()
+                self.popped += 1
+                if image_number is not None:
+                    if self.last_seq is not None:
+                        if image_number == self.last_seq:
+                            self.duplicates += 1
+                            continue
+                        if image_number > self.last_seq + 1:
+                            self.dropped += image_number - self.last_seq - 1
+                    self.last_seq = image_number
+                seq += 1
+
+                # Live display: overwrite the slot, never queue
+                self._latest = frame
+                self._latest_event.set()
+
+                # Save path: lossless, so wait for room instead of skipping the frame
+                if self.burst_active:
+                    self.burst_popped += 1
+                    item = (self.burst_count, seq, image_number, ts, frame)
+                    while self.running:
+                        try:
+                            self.save_queue.put(item, timeout=0.1)
+                            self.queued += 1
+                            break
+                        except queue.Full:
+                            self.save_stalls += 1
 
     def _display_loop(self):
-        """Update GUI preview from frame_queue."""
+        """Update GUI preview with the newest frame only."""
         while self.running:
-            try:
-                frame = self.frame_queue.get(timeout=1)
+            if not self._latest_event.wait(timeout=1):
+                continue
+            self._latest_event.clear()
+            frame = self._latest
+            if frame is not None:
                 self.gui.update_preview(frame)
-            except queue.Empty:
-                pass
 
     def _save_loop(self):
-        """Save frames to disk only during burst."""
-        while self.running:
+        """
+        Write every frame queued during a burst into burst_NNN_<chunk>.tif stacks plus
+        burst_NNN_index.csv; frames already queued are saved even after stop_burst.
+        """
+        writer, writer_burst = None, None
+        while self.running or not self.save_queue.empty():
             try:
-                frame = self.save_queue.get(timeout=1)
-                if self.burst_active:
-                    fname = f"{self.gui.save_dir}/frame_{int(time.time()*1000)}.tif"
-                    tifffile.imwrite(fname, frame)
+                burst, seq, image_number, ts, frame = self.save_queue.get(timeout=1)
             except queue.Empty:
-                pass
+                # burst over and queue drained: write the last partial chunk
+                if writer is not None and not self.burst_active:
+                    self._close_writer(writer)
+                    writer, writer_burst = None, None
+                continue
+            if burst != writer_burst:
+                if writer is not None:
+                    self._close_writer(writer)
+                writer = ChunkedTiffWriter(self.gui.save_dir, f"burst_{burst:03d}", self.chunk_size)
+                writer_burst = burst
+            writer.append(frame, seq, image_number, ts)
+            self.saved += 1
+        if writer is not None:
+            self._close_writer(writer)
+
+    def _close_writer(self, writer):
+        writer.close()
+        self.gui.log(f"Saved {writer.frames_written} frames in {writer.chunks_written} stacks ({writer.basename})")
+
+    def stats(self):
+        """Counters plus burst pop rate; saved == queued once the save queue has drained."""
+        elapsed = ((self.burst_t1 or time.perf_counter()) - self.burst_t0) if self.burst_t0 else 0.0
+        return {
+            "popped": self.popped, "dropped": self.dropped, "duplicates": self.duplicates,
+            "overflows": self.overflows, "queued": self.queued, "saved": self.saved,
+            "save_backlog": self.save_queue.qsize(), "save_stalls": self.save_stalls,
+            "burst_fps": self.burst_popped / elapsed if elapsed > 0 else 0.0,
+        }
 
     def start_burst(self):
+        self.burst_count += 1
+        self.burst_t0 = time.perf_counter()
+        self.burst_t1 = None
+        self.burst_popped = 0
         self.burst_active = True
         self.gui.log("Burst started")
 
     def stop_burst(self):
         self.burst_active = False
-        self.gui.log("Burst stopped")
+        self.burst_t1 = time.perf_counter()
+        s = self.stats()
+        self.gui.log(f"Burst stopped: {self.burst_popped} frames at {s['burst_fps']:.1f} fps, "
+                     f"{s['dropped']} dropped, {s['duplicates']} duplicates, {s['save_backlog']} still to save")
 
     def shutdown(self):
         self.running = False
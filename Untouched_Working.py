@@ -7,6 +7,7 @@ import numpy as np
 import serial
 import tifffile
 import threading
+from queue import Queue, Empty
 
 from PyQt5.QtWidgets import (
     QApplication, QLabel, QVBoxLayout, QWidget, QPushButton,
@@ -54,6 +55,194 @@ class LivePreviewThread(QThread):
         self.running = False
         self.wait()
 
+# -------------------- Interval Acquisition Thread --------------------
+class IntervalAcquisitionThread(QThread):
+    """
+    Snaps one frame per interval on its own thread. Frame k is due at start + k * interval
+    (deadlines do not drift with snap time); slots that have already passed when a snap
+    returns are skipped and counted instead of being snapped back to back.
+    Frames are copied straight into a preallocated (batch_size, H, W) buffer; a full buffer
+    goes to the writer and filling continues in the second one (double buffering), so there
+    is no list-to-array copy or allocation at batch boundaries. Per-frame lateness is kept
+    for report().
+    """
+    progress = pyqtSignal(int)
+    log_signal = pyqtSignal(str)
+
+    def __init__(self, writer, interval_ms, total_frames, batch_size, lock=None):
+        super().__init__()
+        self.writer = writer
+        self.interval_s = interval_ms / 1000.0
+        self.total_frames = total_frames
+        self.batch_size = batch_size
+        self.lock = lock
+        self.running = False
+        self.frames_taken = 0
+        self.missed = 0
+        self.extra_buffers = 0
+        self._allocated = 0
+        self.frame_times = []   # (slot, deadline_s, snap_s) relative to start
+
+    def _wait_until(self, deadline):
+        # coarse sleep, then yield until the deadline (sleep alone overshoots by up to a tick)
+        remaining = deadline - time.perf_counter()
+        if remaining > 0.002:
+            time.sleep(remaining - 0.001)
+        while time.perf_counter() < deadline:
+            time.sleep(0)
+
+    def _next_buffer(self, shape):
+        # a buffer the writer has finished with, else a new one (only if the writer falls behind)
+        try:
+            return self.writer.recycle.get_nowait()
+        except Empty:
+            if self._allocated >= 2:
+                self.extra_buffers += 1
+            self._allocated += 1
+            return np.empty((self.batch_size,) + shape, dtype=np.uint16)
+
+    def run(self):
+        # bridge objects belong to one thread: this worker opens its own connection to Micro-Manager
+        try:
+            core = Core()
+        except Exception as e:
+            self.log_signal.emit(f"Could not connect to Micro-Manager: {e}")
+            self.writer.finish()
+            return
+        self.running = True
+        shape = None
+        buf, n = None, 0
+        t0 = time.perf_counter()
+        slot = 0
+        while self.running and slot < self.total_frames:
+            deadline = t0 + slot * self.interval_s
+            self._wait_until(deadline)
+            t_snap = time.perf_counter()
+            try:
+                if self.lock:
+                    self.lock.acquire()
+                try:
+                    core.snap_image()
+                    pixels = core.get_image()
+                    if shape is None:
+                        shape = (core.get_image_height(), core.get_image_width())
+                finally:
+                    if self.lock:
+                        self.lock.release()
+                if pixels is not None:
+                    if buf is None:
+                        buf = self._next_buffer(shape)
+                    buf[n] = np.asarray(pixels, dtype=np.uint16).reshape(shape)
+                    n += 1
+                    self.frame_times.append((slot, deadline - t0, t_snap - t0))
+                    self.frames_taken += 1
+                    self.progress.emit(self.frames_taken)
+                    if n == self.batch_size:
+                        self.writer.put(buf, n)
+                        buf, n = None, 0
+            except Exception as e:
+                self.log_signal.emit(f"Error snapping image: {e}")
+
+            slot += 1
+            current = min(int((time.perf_counter() - t0) / self.interval_s), self.total_frames)
+            if current > slot:
+                self.missed += current - slot
+                slot = current
+
+        if n:
+            self.writer.put(buf, n)
+        self.writer.finish()
+        if self.extra_buffers:
+            self.log_signal.emit(f"Writer fell behind: {self.extra_buffers} extra batch buffers allocated")
+        self.running = False
+        self.log_signal.emit(self.report())
+        self.save_frame_times(os.path.join(self.writer.folder, "frame_times.csv"))
+
+    def report(self):
+        if not self.frame_times:
+            return "No frames acquired."
+        times = np.array(self.frame_times)
+        late_ms = (times[:, 2] - times[:, 1]) * 1000.0
+        gaps_ms = np.diff(times[:, 2]) * 1000.0 if len(times) > 1 else np.zeros(1)
+        return (f"Interval timing: {self.frames_taken} frames, {self.missed} missed slots, "
+                f"interval {gaps_ms.mean():.2f} ± {gaps_ms.std():.2f} ms (target {self.interval_s * 1000:.2f}), "
+                f"lateness p50 {np.percentile(late_ms, 50):.2f} / p99 {np.percentile(late_ms, 99):.2f} / "
+                f"max {late_ms.max():.2f} ms")
+
+    def save_frame_times(self, path):
+        try:
+            with open(path, "w") as f:
+                f.write("frame,slot,deadline_s,snap_s,lateness_ms\n")
+                for i, (slot, deadline, t) in enumerate(self.frame_times):
+                    f.write(f"{i},{slot},{deadline:.6f},{t:.6f},{(t - deadline) * 1000.0:.3f}\n")
+        except Exception as e:
+            self.log_signal.emit(f"Error saving frame times: {e}")
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+# -------------------- Batch Writer Thread --------------------
+class BatchWriterThread(QThread):
+    """Writes batches handed over by the acquisition thread, then merges them into the final TIFF."""
+    log_signal = pyqtSignal(str)
+
+    def __init__(self, folder, prefix, expt_name):
+        super().__init__()
+        self.folder = folder
+        self.prefix = prefix
+        self.expt_name = expt_name
+        self.queue = Queue()
+        self.recycle = Queue()   # written buffers go back to the acquisition thread
+        self.batch_files = []
+        os.makedirs(folder, exist_ok=True)
+
+    def put(self, buf, n):
+        self.queue.put((buf, n))
+
+    def finish(self):
+        self.queue.put(None)   # merge after the batches already queued
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            buf, n = job
+            batch_file = os.path.join(self.folder, f"{self.prefix}_batch_{len(self.batch_files) + 1:05d}.tiff")
+            try:
+                tifffile.imwrite(batch_file, buf[:n])
+                self.batch_files.append(batch_file)
+                self.log_signal.emit(f"Saved {n} frames to batch: {batch_file}")
+            except Exception as e:
+                self.log_signal.emit(f"Error saving batch {batch_file}: {e}")
+            self.recycle.put(buf)
+        self.merge_batches_to_final_tiff()
+
+    def merge_batches_to_final_tiff(self):
+        if not self.batch_files:
+            self.log_signal.emit("No batch files found to merge.")
+            return
+
+        all_frames = []
+        for f in self.batch_files:
+            stack = tifffile.imread(f)
+            all_frames.append(stack)
+        all_frames = np.concatenate(all_frames, axis=0)
+
+        # Find a unique final filename
+        final_file = os.path.join(self.folder, f"{self.expt_name}_.tiff")
+        i = 1
+        while os.path.exists(final_file):
+            final_file = os.path.join(self.folder, f"{self.expt_name}_E{i}.tiff")
+            i += 1
+
+        tifffile.imwrite(final_file, all_frames)
+        self.log_signal.emit(f"Final TIFF saved: {final_file}")
+
+        for f in self.batch_files:
+            os.remove(f)
+
 # -------------------- Live Imaging Window --------------------
 class LiveImageWindow(QWidget):
     def __init__(self, zoom_combo):
@@ -108,6 +297,9 @@ class LiveImagingGUI(QWidget):
         self.arduino = None
         self.camera_lock = None
         self.live_thread = None
+        self.experiment_timer = None
+        self.acq_thread = None
+        self.writer_thread = None
         self.show()
         self.original_height = self.height()
 
@@ -315,9 +507,8 @@ class LiveImagingGUI(QWidget):
         if self.arduino and self.arduino.is_open:
             self.arduino.close()
 
-        if self.batch_stack:
-            self.save_batch_stack()
-            self.merge_batches_to_final_tiff()
+        if self.acq_thread and self.acq_thread.isRunning():
+            self.finish_acquisition()
             self.set_overlay("EXPERIMENT STOPPED", color="red")
             self.log("Experiment stopped.")
 
@@ -348,6 +539,9 @@ class LiveImagingGUI(QWidget):
 
     # -------------------- Experiment Functions --------------------
     def start_experiment(self):
+        if (self.acq_thread and self.acq_thread.isRunning()) or (self.writer_thread and self.writer_thread.isRunning()):
+            self.log("Experiment already running or still writing its last batch; stop it first.")
+            return
         if self.live_window is None:
             self.start_live()
         self.set_overlay("ACQUIRING IMAGES...", color="blue")
@@ -355,7 +549,6 @@ class LiveImagingGUI(QWidget):
         self.total_duration = self.total_time_spin.value() * 60
         self.interval = self.interval_spin.value()
         self.trigger_time = self.trigger_time_spin.value() * 60
-        self.batch_stack = []
         self.frames_taken = 0
         baud_rate = int(self.baud_rate_combo.currentText())
 
@@ -373,10 +566,22 @@ class LiveImagingGUI(QWidget):
                 self.arduino = None
 
         self.start_time = int(time.time() * 1000)  # store start time in ms
-        self.last_image_time = 0
         self.ttl_pulse_sent = False
         self.experiment_stopped = False  # Flag for experiment stop
 
+        # Snapping and saving run off the GUI thread; this timer only drives the clock, TTL and stop
+        date_str = datetime.now().strftime("%d%m%y")
+        expt_name = self.expt_name_edit.text()
+        batch_folder = os.path.join(self.save_path_edit.text(), f"{date_str}_{expt_name}")
+        self.writer_thread = BatchWriterThread(batch_folder, f"{date_str}_{expt_name}", expt_name)
+        self.writer_thread.log_signal.connect(self.log)
+        self.writer_thread.start()
+        self.acq_thread = IntervalAcquisitionThread(self.writer_thread, self.interval, self.total_frames,
+                                                    self.batch_size_spin.value(), lock=self.camera_lock)
+        self.acq_thread.progress.connect(self.update_progress)
+        self.acq_thread.log_signal.connect(self.log)
+        self.acq_thread.start()
+
         self.experiment_timer = QTimer()
         self.experiment_timer.timeout.connect(self.run_experiment)
         self.experiment_timer.start(10)
@@ -391,11 +596,6 @@ class LiveImagingGUI(QWidget):
         total_sec = int(self.total_duration % 60)
         self.timer_label.setText(f"{elapsed_min:02d}:{elapsed_sec:02d} / {total_min:02d}:{total_sec:02d}")
 
-        # Snap image at interval
-        if elapsed_ms_total - self.last_image_time >= self.interval:
-            self.snap_and_store_image()
-            self.last_image_time += self.interval
-
         # Single TTL pulse at trigger time
         if self.run_trigger_cb.isChecked() and not self.ttl_pulse_sent and elapsed >= self.trigger_time:
             self.send_ttl_pulse()
@@ -407,9 +607,7 @@ class LiveImagingGUI(QWidget):
             if self.arduino and self.arduino.is_open:
                 self.arduino.close()
 
-            if self.batch_stack:
-                self.save_batch_stack()
-            self.merge_batches_to_final_tiff()
+            self.finish_acquisition()
             self.set_overlay("EXPERIMENT COMPLETE", color="green")
             self.log("Experiment completed.")
 
@@ -418,89 +616,18 @@ class LiveImagingGUI(QWidget):
             if self.arduino and self.arduino.is_open:
                 self.arduino.close()
 
-            if self.batch_stack:
-                self.save_batch_stack()
-            self.merge_batches_to_final_tiff()
+            self.finish_acquisition()
             self.set_overlay("EXPERIMENT STOPPED", color="red")
             self.log("Experiment stopped.")
     
-    def snap_and_store_image(self):
-        try:
-            if self.camera_lock:
-                self.camera_lock.acquire()
-            try:
-                self.core.snap_image()
-                pixels = self.core.get_image()
-                width = self.core.get_image_width()
-                height = self.core.get_image_height()
-                if pixels is not None:
-                    arr = np.array(pixels, dtype=np.uint16).reshape((height, width))
-                    self.batch_stack.append(arr)  # Only append once
-
-            finally:
-                if self.camera_lock:
-                    self.camera_lock.release()
+    def update_progress(self, frames_taken):
+        self.progressbar.setValue(int(frames_taken / max(self.total_frames, 1) * 100))
 
-            if pixels is not None:
-                percent = int((len(self.batch_stack) / self.total_frames) * 100)
-                self.progressbar.setValue(percent)
-
-                # Store for live re-render with sliders
-               # self.last_frame = arr.copy()
-                # self._update_display_from_frame(arr)
-
-                if len(self.batch_stack) >= self.batch_size_spin.value():
-                    self.save_batch_stack()
-        except Exception as e:
-            self.log(f"Error snapping image: {e}")
-
-    def save_batch_stack(self):
-        save_dir = self.save_path_edit.text()
-        os.makedirs(save_dir, exist_ok=True)
-        expt_name = self.expt_name_edit.text()
-        date_str = datetime.now().strftime("%d%m%y")
-        timestamp = int(time.time())
-        folder = f"{date_str}_{expt_name}"
-        batch_folder = f"{save_dir}/{folder}"
-        os.makedirs(batch_folder, exist_ok=True)
-        batch_file = f"{batch_folder}/{date_str}_{expt_name}__batch_{timestamp}.tiff"
-        tifffile.imwrite(batch_file, np.array(self.batch_stack))
-        self.log(f"Saved batch TIFF: {batch_file}"); self.log(f"Saved {len(self.batch_stack)} frames to batch.")
-        self.batch_stack = []
-
-    def merge_batches_to_final_tiff(self):
-        import glob
-        save_dir = self.save_path_edit.text()
-        expt_name = self.expt_name_edit.text()
-        timestamp = int(time.time())
-        date_str = datetime.now().strftime("%d%m%y")
-        folder = f"{date_str}_{expt_name}"
-        batch_folder = f"{save_dir}/{folder}"
-        batch_files = sorted(glob.glob(f"{batch_folder}/{date_str}_{expt_name}_batch_*.tiff"))
-
-        if not batch_files:
-            self.log("No batch files found to merge.")
-            return
-
-        all_frames = []
-        for f in batch_files:
-            stack = tifffile.imread(f)
-            all_frames.append(stack)
-        all_frames = np.concatenate(all_frames, axis=0)
-
-        # Find a unique final filename
-        base_final_file = f"{save_dir}/{folder}/{expt_name}_.tiff"
-        final_file = base_final_file
-        i = 1
-        while os.path.exists(final_file):
-            final_file = f"{save_dir}/{folder}/{expt_name}_E{i}.tiff"
-            i += 1
-
-        tifffile.imwrite(final_file, all_frames)
-        self.log(f"Final TIFF saved: {final_file}")
-
-        for f in batch_files:
-            os.remove(f)
+    def finish_acquisition(self):
+        """Stop the interval worker; it hands its last batch to the writer, which merges in the background."""
+        if self.acq_thread:
+            self.acq_thread.stop()
+            self.acq_thread = None
 
     # -------------------- TTL Trigger --------------------
     def test_ttl_trigger(self):
@@ -599,6 +726,10 @@ class LiveImagingGUI(QWidget):
         self.save_settings()
         if self.live_thread:
             self.live_thread.stop()
+        if self.acq_thread:
+            self.acq_thread.stop()
+        if self.writer_thread:
+            self.writer_thread.wait()
         if self.arduino and self.arduino.is_open:
             self.arduino.close()
         if self.live_window:
@@ -13,38 +13,47 @@ from pycromanager import Core, Acquisition
 import tifffile
 from queue import Queue
 from tifffile import imwrite, imread
+from chunked_tiff import ChunkedTiffWriter
 
 
 # -------------------- Frame Writer Thread --------------------
 
 class FrameWriterThread(QThread):
-    def __init__(self, frame_queue: Queue, folder: str, basename: str = "live", save_every: int = 1):
+    """
+    Keeps every save_every-th frame and appends it to rolling multi-page stacks
+    <basename>_chunk_NNNNNN.tif of chunk_size frames, with <basename>_chunk_index.csv
+    mapping frame numbers to file and page (see chunked_tiff.py).
+    """
+    def __init__(self, frame_queue: Queue, folder: str, basename: str = "live", save_every: int = 1,
+                 chunk_size: int = 500):
         super().__init__()
         self.queue = frame_queue
         self.folder = folder ##Send from main GUI
         os.makedirs(self.folder, exist_ok=True)
         self.basename = basename
         self.save_every = max(1, int(save_every))
+        self.chunk_size = chunk_size
         self._running = False
         self._idx = 0
+        self.writer = None
 
     def run(self):
         self._running = True
-        while self._running:
-            try:
-                arr = self.queue.get(timeout=0.1)
-            except Exception:
-                continue
-            self._idx += 1
-            if self._idx % self.save_every != 0:
-                continue
-            fname = os.path.join(self.folder, f"{self.basename}_{self._idx:06d}.tif")
-            # self.log_event(f"Saved batch TIFF: {fname}"); self.log_event(f"Saved {len(arr)} frames to batch.")
-            try:
-                imwrite(fname, arr, photometric='minisblack')
-            except Exception as e:
-                # self.log_event(f"[Writer] save error: {e}")
-                return
+        self.writer = ChunkedTiffWriter(self.folder, f"{self.basename}_chunk", self.chunk_size)
+        try:
+            while self._running or not self.queue.empty():
+                try:
+                    arr = self.queue.get(timeout=0.1)
+                except Exception:
+                    continue
+                self._idx += 1
+                if self._idx % self.save_every != 0:
+                    continue
+                self.writer.append(arr, self._idx)
+        except Exception as e:
+            print(f"[Writer] save error: {e}")
+        finally:
+            self.writer.close()
 
 ###### Maybe create another Class/Thread for batching and Merging####
     ####Figure out Logs between Classes####
@@ -107,9 +116,16 @@ class FrameWriterThread(QThread):
 
 # -------------------- Live Preview Thread --------------------
 class LivePreviewThread(QThread):
+    """
+    Streams frames with continuous sequence acquisition and pulls whatever has accumulated
+    in the circular buffer every interval_ms, so the bridge is crossed once per frame instead
+    of four times. Width/height are read once and re-read when the ROI changes.
+    mode="snap" keeps the old snap-per-frame loop (used by sequence_bench.py for comparison).
+    """
     image_ready = pyqtSignal(np.ndarray)
 
-    def __init__(self, core, lock=None, interval_ms=10, record_queue: Queue = None, record_stride: int = 1):
+    def __init__(self, core, lock=None, interval_ms=10, record_queue: Queue = None, record_stride: int = 1,
+                 mode="sequence", max_batch=256):
         super().__init__()
         self.core = Core()
         self.lock = lock
@@ -117,28 +133,75 @@ class LivePreviewThread(QThread):
         self.running = False
         self.record_queue = record_queue
         self.record_stride = max(1, int(record_stride))
+        self.mode = mode
+        self.max_batch = max_batch
         self._frame_count = 0
+        self._shape = None   # (height, width), cached per ROI
+
+    def invalidate_dims(self):
+        """Call after changing ROI or binning; the next batch re-reads the frame size."""
+        self._shape = None
+
+    def _frame_shape(self):
+        if self._shape is None:
+            self._shape = (self.core.get_image_height(), self.core.get_image_width())
+        return self._shape
+
+    def _to_array(self, pixels):
+        h, w = self._frame_shape()
+        if pixels.size != h * w:   # ROI changed under us
+            self.invalidate_dims()
+            h, w = self._frame_shape()
+        return np.asarray(pixels, dtype=np.uint16).reshape((h, w))
+
+    def _handle(self, arr):
+        self._frame_count += 1
+        # optionally enqueue for disk writing
+        if self.record_queue and (self._frame_count % self.record_stride == 0):
+            # copy to decouple from any downstream modifications
+            self.record_queue.put(arr.copy())
+
+    def _pull_batch(self):
+        """Pop up to max_batch frames from the circular buffer; returns the newest or None."""
+        newest = None
+        n = min(self.core.get_remaining_image_count(), self.max_batch)
+        for _ in range(n):
+            arr = self._to_array(self.core.pop_next_image())
+            self._handle(arr)
+            newest = arr
+        return newest
 
     def run(self):
         self.running = True
+        if self.mode == "snap":
+            self._run_snap()
+            return
+        self.core.start_continuous_sequence_acquisition(0)
+        while self.running:
+            newest = None
+            try:
+                if self.lock: self.lock.acquire()
+                newest = self._pull_batch()
+            except Exception as e:
+                print(f"Live preview error: {e}")
+            finally:
+                if self.lock: self.lock.release()
+            # display only needs the latest frame of the batch
+            if newest is not None:
+                self.image_ready.emit(newest)
+            self.msleep(self.interval_ms)
+        self.core.stop_sequence_acquisition()
+
+    def _run_snap(self):
         while self.running:
             try:
                 if self.lock: self.lock.acquire()
                 self.core.snap_image()
                 pixels = self.core.get_image()
                 if pixels is not None:
-                    width = self.core.get_image_width()
-                    height = self.core.get_image_height()
-                    arr = np.array(pixels, dtype=np.uint16).reshape((height, width))
-                    self._frame_count += 1
-
-                    # emit for display
+                    arr = self._to_array(pixels)
                     self.image_ready.emit(arr)
-
-                    # optionally enqueue for disk writing
-                    if self.record_queue and (self._frame_count % self.record_stride == 0):
-                        # copy to decouple from any downstream modifications
-                        self.record_queue.put(arr.copy())
+                    self._handle(arr)
             except Exception as e:
                 print(f"Live preview error: {e}")
             finally:
@@ -536,7 +599,8 @@ class LiveImagingGUI(QWidget):
         if self.live_window is None:
             self.start_live()
         self.record_queue = Queue(maxsize=50)  # small buffer; adjust as needed
-        self.writer_thread = FrameWriterThread(self.record_queue, folder=live_folder, basename="live", save_every=1)
+        self.writer_thread = FrameWriterThread(self.record_queue, folder=live_folder, basename="live", save_every=1,
+                                               chunk_size=self.settings.get("live_chunk_frames", 500))
         self.writer_thread.start()
         self.overlay_label.setText("RECORDING IN PROGRESS...")
 
@@ -0,0 +1,147 @@
+// Frame trigger + stimulus generator for external-trigger acquisition.
+//
+// Serial protocol (one line per command, '\n' terminated):
+//   A,<fps>,<n_frames>,<stim_frame>,<stim_hz>,<stim_ms>,<pulse_us>
+//       Arm a burst: n_frames camera trigger pulses at fps. The stimulus starts on the
+//       rising edge of frame <stim_frame>; stim_hz = 0 gives a single pulse.
+//       Replies "ARMED <n_frames>", then "S <frame> <micros>" at stimulus onset and
+//       "D <frames_sent> <micros>" when the burst is finished.
+//   X   Abort the current burst (replies "D <frames_sent> <micros>") or stop a running train.
+//   P,<width_us>
+//       Single TTL pulse on the stimulus pin, replies "Pulse ended".
+//   T,<freq_hz>,<duration_ms>,<width_us>
+//       Pulse train timed on the board, replies "Pulse ended" after the last pulse.
+//       Ignored while a burst is armed.
+//   H   Legacy single 1 ms pulse, same as P,1000.
+
+const int CAM_PIN = 8;    // camera external trigger input
+const int STIM_PIN = 9;   // stimulus TTL output
+
+bool armed = false;
+unsigned long frame_period_us = 0, frame_t0 = 0, next_frame_us = 0;
+long n_frames = 0, frames_sent = 0, stim_frame = -1;
+unsigned long pulse_us = 100, stim_pulse_us = 100;
+unsigned long stim_period_us = 0, stim_end_us = 0, next_stim_us = 0;
+bool stim_running = false, train_reply = false;
+String line;
+
+void setup() {
+  pinMode(CAM_PIN, OUTPUT);
+  pinMode(STIM_PIN, OUTPUT);
+  digitalWrite(CAM_PIN, LOW);
+  digitalWrite(STIM_PIN, LOW);
+  Serial.begin(115200);
+}
+
+void pulse(int pin, unsigned long width_us) {
+  digitalWrite(pin, HIGH);
+  if (width_us > 16000) delay(width_us / 1000);   // delayMicroseconds is only accurate up to ~16 ms
+  else delayMicroseconds(width_us);
+  digitalWrite(pin, LOW);
+}
+
+void parse_fields(String cmd, float *fields, int n) {
+  int start = 2;
+  for (int i = 0; i < n; i++) {
+    int comma = cmd.indexOf(',', start);
+    String part = comma < 0 ? cmd.substring(start) : cmd.substring(start, comma);
+    fields[i] = part.toFloat();
+    start = comma + 1;
+  }
+}
+
+void finish() {
+  armed = false;
+  stim_running = false;
+  Serial.print("D ");
+  Serial.print(frames_sent);
+  Serial.print(' ');
+  Serial.println(micros());
+}
+
+void handle(String cmd) {
+  cmd.trim();
+  if (cmd.length() == 0) return;
+  if (cmd == "H") {
+    pulse(STIM_PIN, 1000);
+    Serial.println("Pulse ended");
+  } else if (cmd.startsWith("P,")) {
+    float fields[1];
+    parse_fields(cmd, fields, 1);
+    pulse(STIM_PIN, (unsigned long)fields[0]);
+    Serial.println("Pulse ended");
+  } else if (cmd.startsWith("T,")) {
+    if (armed) return;
+    float fields[3];
+    parse_fields(cmd, fields, 3);
+    if (fields[0] <= 0) return;
+    stim_period_us = (unsigned long)(1000000.0 / fields[0]);
+    stim_pulse_us = (unsigned long)fields[2];
+    next_stim_us = micros();
+    stim_end_us = next_stim_us + (unsigned long)(fields[1] * 1000.0);
+    stim_running = true;
+    train_reply = true;
+  } else if (cmd == "X") {
+    if (armed) finish();
+    else if (stim_running) {
+      stim_running = false;
+      if (train_reply) Serial.println("Pulse ended");
+      train_reply = false;
+    }
+  } else if (cmd.startsWith("A,")) {
+    float fields[6];
+    parse_fields(cmd, fields, 6);
+    frame_period_us = (unsigned long)(1000000.0 / fields[0]);
+    n_frames = (long)fields[1];
+    stim_frame = (long)fields[2];
+    stim_period_us = fields[3] > 0 ? (unsigned long)(1000000.0 / fields[3]) : 0;
+    stim_end_us = (unsigned long)(fields[4] * 1000.0);
+    pulse_us = (unsigned long)fields[5];
+    stim_pulse_us = pulse_us;
+    train_reply = false;
+    frames_sent = 0;
+    stim_running = false;
+    armed = true;
+    Serial.print("ARMED ");
+    Serial.println(n_frames);
+    frame_t0 = micros();
+    next_frame_us = frame_t0;
+  }
+}
+
+void loop() {
+  while (Serial.available()) {
+    char c = Serial.read();
+    if (c == '\n') { handle(line); line = ""; }
+    else if (c != '\r') line += c;
+  }
+
+  unsigned long now = micros();
+  if (armed && (long)(now - next_frame_us) >= 0) {
+    if (frames_sent == stim_frame) {
+      stim_running = true;
+      next_stim_us = next_frame_us;
+      stim_end_us += next_frame_us;
+      Serial.print("S ");
+      Serial.print(frames_sent);
+      Serial.print(' ');
+      Serial.println(next_frame_us);
+    }
+    pulse(CAM_PIN, pulse_us);
+    frames_sent++;
+    next_frame_us += frame_period_us;
+    if (frames_sent >= n_frames) {
+      finish();
+      return;
+    }
+  }
+  if (stim_running && (long)(now - next_stim_us) >= 0) {
+    pulse(STIM_PIN, stim_pulse_us);
+    if (stim_period_us == 0 || (long)(next_stim_us + stim_period_us - stim_end_us) >= 0) {
+      stim_running = false;
+      if (train_reply) Serial.println("Pulse ended");
+      train_reply = false;
+    }
+    else next_stim_us += stim_period_us;
+  }
+}
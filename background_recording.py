@@ -0,0 +1,66 @@
+import os, time, threading
+import numpy as np
+from chunked_tiff import ChunkedTiffWriter
+from reduction import bin_frames
+
+# -------------------- Background Recording --------------------
+class BackgroundRecorder(threading.Thread):
+    """
+    Session-long, low-resolution copy of the camera stream: takes the newest FrameBus frame
+    every 1/fps seconds, bins it N x N (mean, same dtype) and appends it to compressed
+    background_NNNNNN.tif stacks with background_index.csv (frame, bus seq, wall time).
+    Reads with a "latest" cursor, so it never holds up the burst consumers.
+    """
+
+    def __init__(self, bus, folder, bin_factor=4, fps=2.0, compression="zlib", chunk_size=600,
+                 anchor_perf=None, anchor_wall=None, name="background"):
+        super().__init__(name=name, daemon=True)
+        self.cursor = bus.subscribe(name, policy="latest")
+        self.writer = ChunkedTiffWriter(folder, "background", chunk_size, compression=compression)
+        self.bin_factor = int(bin_factor)
+        self.period_s = 1.0 / float(fps)
+        self.anchor_perf = time.perf_counter() if anchor_perf is None else anchor_perf
+        self.anchor_wall = time.time() if anchor_wall is None else anchor_wall
+        self.frames = 0
+        self.bytes_in = 0
+        self.busy_s = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_due = None
+        try:
+            while not self._stop_event.is_set():
+                item = self.cursor.get(timeout=0.1)
+                if item is None:
+                    continue
+                seq, ts, frame = item
+                if next_due is not None and ts < next_due:
+                    continue
+                # fixed rate; after a stall restart from now instead of catching up
+                if next_due is None or ts - next_due > self.period_s:
+                    next_due = ts
+                next_due += self.period_s
+                t0 = time.perf_counter()
+                small = bin_frames(frame, self.bin_factor, mean=True)
+                self.writer.append(np.ascontiguousarray(small), self.frames, seq,
+                                   self.anchor_wall + (ts - self.anchor_perf))
+                self.frames += 1
+                self.bytes_in += frame.nbytes
+                self.busy_s += time.perf_counter() - t0
+        finally:
+            self.writer.close()
+            self.cursor.close()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def summary(self):
+        out = self.writer.bytes_written
+        size = sum(os.path.getsize(os.path.join(self.writer.folder, f)) for f in os.listdir(self.writer.folder)
+                   if f.startswith("background_") and f.endswith(".tif"))
+        return (f"Background recording: {self.frames} frames, {self.bin_factor}x{self.bin_factor} binned at "
+                f"{1.0 / self.period_s:g} fps, {size / 1e6:.1f} MB on disk ({out / 1e6:.1f} MB raw binned, "
+                f"{self.bytes_in / 1e6:.0f} MB full-res), "
+                f"{self.busy_s / max(self.frames, 1) * 1000:.2f} ms per frame")
@@ -0,0 +1,90 @@
+import sys, time, threading, argparse
+import numpy as np
+from shm_ring import SharedFrameRing, RingReader, AcquisitionProcess, _synthetic_source
+
+# Compare single-process acquisition (producer thread sharing the GIL with a busy "GUI")
+# against the dedicated acquisition process writing into the shared-memory ring.
+
+def gui_load(stop, duty):
+    """Pure-Python work standing in for redraws and log appends on the GUI thread."""
+    while not stop.is_set():
+        t_end = time.perf_counter() + 0.010 * duty
+        while time.perf_counter() < t_end:
+            "".join(f"<span style='color:white'>{i}</span>" for i in range(200))
+        time.sleep(0.010 * (1.0 - duty))
+
+def consume(reader, seconds, stats):
+    lat = []
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        item = reader.next(timeout=0.05)
+        if item is None:
+            continue
+        seq, ts, view = item
+        _ = int(view[0, 0])  # touch the frame
+        lat.append((time.perf_counter_ns() - ts) / 1e6)
+    stats["read"] = reader.read
+    stats["dropped"] = reader.dropped
+    stats["latency_ms"] = np.array(lat) if lat else np.zeros(1)
+
+def run_single_process(shape, fps, seconds, duty, n_slots):
+    ring = SharedFrameRing.create(n_slots, shape)
+    stop = threading.Event()
+    def producer():
+        src = _synthetic_source(shape, fps)
+        while not stop.is_set():
+            frame = next(src)
+            if frame is not None:
+                ring.write(frame)
+            else:
+                time.sleep(0.0005)   # same wait as the acquisition process between frames
+    reader = RingReader(ring)
+    stats = {}
+    threads = [threading.Thread(target=producer, daemon=True), threading.Thread(target=gui_load, args=(stop, duty), daemon=True)]
+    for t in threads:
+        t.start()
+    consume(reader, seconds, stats)
+    stop.set()
+    for t in threads:
+        t.join()
+    stats["written"] = ring.latest_seq()
+    ring.close()
+    return stats
+
+def run_multi_process(shape, fps, seconds, duty, n_slots):
+    acq = AcquisitionProcess(cfg_path=None, shape=shape, n_slots=n_slots, setup={"fps": fps})
+    acq.start()
+    stop = threading.Event()
+    load = threading.Thread(target=gui_load, args=(stop, duty), daemon=True)
+    load.start()
+    stats = {}
+    consume(acq.reader(), seconds, stats)
+    stop.set()
+    load.join()
+    stats["written"] = acq.ring.latest_seq()
+    stats["crashed"] = acq.crashed()
+    stats["error"] = acq.error()
+    acq.stop()
+    return stats
+
+def report(name, stats, seconds):
+    lat = stats["latency_ms"]
+    print(f"{name:<16} written {stats['written'] / seconds:8.1f} fps | read {stats['read'] / seconds:8.1f} fps | "
+          f"dropped {stats['dropped']:6d} | latency p50 {np.percentile(lat, 50):6.2f} ms p99 {np.percentile(lat, 99):6.2f} ms")
+    if stats.get("crashed"):
+        print(f"{'':<16} acquisition process failed: {stats.get('error') or 'no heartbeat'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-process vs shared-memory acquisition benchmark")
+    parser.add_argument("--fps", type=float, default=500)
+    parser.add_argument("--size", type=int, default=600)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--gui-duty", type=float, default=0.7, help="fraction of time the fake GUI holds the GIL")
+    parser.add_argument("--slots", type=int, default=256)
+    args = parser.parse_args()
+
+    shape = (args.size, args.size)
+    print(f"{args.fps:.0f} fps target, {args.size}x{args.size} uint16, GUI duty {args.gui_duty:.0%}")
+    report("single-process", run_single_process(shape, args.fps, args.seconds, args.gui_duty, args.slots), args.seconds)
+    report("acq-process", run_multi_process(shape, args.fps, args.seconds, args.gui_duty, args.slots), args.seconds)
+    sys.exit(0)
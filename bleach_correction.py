@@ -0,0 +1,222 @@
+import os, json, glob, threading
+from collections import deque
+import numpy as np
+
+# -------------------- Bleach Corrector --------------------
+class BleachCorrector:
+    """
+    Incremental mono-exponential bleaching model F(t) - bg = A * exp(-k * t).
+    mode="session" fits one model across bursts from burst mean intensities,
+    mode="burst" fits a separate model inside each burst from its frame means.
+    The parameters applied to every burst are recorded so corrected values can be
+    reproduced later from the saved raw data without refitting.
+    """
+
+    def __init__(self, mode="session", background_window=10, dark_percentile=1.0, dark_level=None):
+        if mode not in ("session", "burst"):
+            raise ValueError(f"Unknown bleach correction mode: {mode}")
+        self.mode = mode
+        self.background_window = int(background_window)
+        self.dark_percentile = float(dark_percentile)
+        self.dark_level = dark_level            # fixed camera offset, overrides the rolling estimate
+        self._backgrounds = deque(maxlen=max(1, self.background_window))
+        self._sums = np.zeros(5)                # n, St, Stt, Sy, Sty of the log-linear fit
+        self.amplitude = None
+        self.rate = 0.0                         # 1/s
+        self.bursts = {}                        # burst_index -> parameters applied to that burst
+        self._lock = threading.Lock()
+
+    # ---- background ----
+    def frame_background(self, frames):
+        """Per-frame dark estimate: a low percentile of a subsampled frame."""
+        frames = np.asarray(frames)
+        sub = frames[:, ::4, ::4].reshape(frames.shape[0], -1)
+        return np.percentile(sub, self.dark_percentile, axis=1)
+
+    def background(self):
+        if self.dark_level is not None:
+            return float(self.dark_level)
+        if not self._backgrounds:
+            return 0.0
+        return float(np.median(self._backgrounds))
+
+    # ---- fitting ----
+    def _add_points(self, t, y):
+        t = np.asarray(t, dtype=np.float64)
+        y = np.log(np.maximum(np.asarray(y, dtype=np.float64), 1e-6))
+        self._sums += (t.size, t.sum(), (t * t).sum(), y.sum(), (t * y).sum())
+
+    def _solve(self, sums):
+        n, st, stt, sy, sty = sums
+        if n < 2 or abs(n * stt - st * st) < 1e-12:
+            return (float(np.exp(sy / n)) if n else None), 0.0
+        slope = (n * sty - st * sy) / (n * stt - st * st)
+        intercept = (sy - slope * st) / n
+        return float(np.exp(intercept)), float(max(0.0, -slope))
+
+    def update_burst(self, burst_index, t_start_s, frames, fps):
+        """Feed one burst (frames shaped (n, H, W) or a list of frames) into the model."""
+        frames = np.asarray(frames)
+        if frames.ndim != 3 or frames.shape[0] == 0:
+            return None
+        means = frames.reshape(frames.shape[0], -1).mean(axis=1)
+        darks = self.frame_background(frames)
+        times = t_start_s + np.arange(frames.shape[0]) / float(fps)
+
+        with self._lock:
+            self._backgrounds.append(float(np.median(darks)))
+            bg = self.background()
+            signal = means - bg
+            if self.mode == "session":
+                self._add_points([times.mean()], [signal.mean()])
+                self.amplitude, self.rate = self._solve(self._sums)
+                amplitude, rate = self.amplitude, self.rate
+            else:
+                sums = np.zeros(5)
+                tt = times - t_start_s
+                yy = np.log(np.maximum(signal, 1e-6))
+                sums += (tt.size, tt.sum(), (tt * tt).sum(), yy.sum(), (tt * yy).sum())
+                amplitude, rate = self._solve(sums)
+
+            params = {
+                "burst": int(burst_index),
+                "t_start_s": float(t_start_s),
+                "fps": float(fps),
+                "n_frames": int(frames.shape[0]),
+                "mean_intensity": float(means.mean()),
+                "background": bg,
+                "amplitude": amplitude,
+                "rate_per_s": rate,
+                # t0 of the gain curve: session start for session mode, burst start for burst mode
+                "t_ref_s": 0.0 if self.mode == "session" else float(t_start_s),
+            }
+            self.bursts[int(burst_index)] = params
+        return params
+
+    def finalize(self):
+        """Session mode: give every burst the final fit, so all bursts share one decay model."""
+        with self._lock:
+            if self.mode == "session":
+                for params in self.bursts.values():
+                    params.update(amplitude=self.amplitude, rate_per_s=self.rate)
+
+    # ---- applying ----
+    @staticmethod
+    def gain(params, t_s):
+        """Multiplicative correction exp(k * (t - t_ref)) that undoes the fitted decay."""
+        return np.exp(params["rate_per_s"] * (np.asarray(t_s, dtype=np.float64) - params["t_ref_s"]))
+
+    def correct(self, frames, burst_index):
+        """Background-subtracted, bleach-corrected float32 frames using the stored parameters."""
+        params = self.bursts[int(burst_index)]
+        frames = np.asarray(frames, dtype=np.float32)
+        times = params["t_start_s"] + np.arange(frames.shape[0]) / params["fps"]
+        g = self.gain(params, times).astype(np.float32)
+        return (frames - np.float32(params["background"])) * g[:, None, None]
+
+    def correct_trace(self, trace, burst_index):
+        """Same correction applied to a (..., n_frames) intensity trace, e.g. ROI means."""
+        params = self.bursts[int(burst_index)]
+        trace = np.asarray(trace, dtype=np.float32)
+        times = params["t_start_s"] + np.arange(trace.shape[-1]) / params["fps"]
+        return (trace - np.float32(params["background"])) * self.gain(params, times).astype(np.float32)
+
+    # ---- persistence ----
+    def to_dict(self):
+        with self._lock:
+            return {
+                "model": "F(t) - background = amplitude * exp(-rate_per_s * (t - t_ref_s))",
+                "mode": self.mode,
+                "dark_percentile": self.dark_percentile,
+                "dark_level": self.dark_level,
+                "background_window": self.background_window,
+                "session_fit": {"amplitude": self.amplitude, "rate_per_s": self.rate},
+                "bursts": [self.bursts[k] for k in sorted(self.bursts)],
+            }
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        corrector = cls(mode=data["mode"], background_window=data["background_window"],
+                        dark_percentile=data["dark_percentile"], dark_level=data["dark_level"])
+        corrector.amplitude = data["session_fit"]["amplitude"]
+        corrector.rate = data["session_fit"]["rate_per_s"]
+        corrector.bursts = {int(b["burst"]): b for b in data["bursts"]}
+        return corrector
+
+# -------------------- Saved Bursts --------------------
+def correct_saved_bursts(session_folder, fps, cycle_s, mode="session", write=True, **kwargs):
+    """
+    Fit and apply the correction to burst_###.tif files already on disk.
+    cycle_s is burst duration + wait interval, used to place bursts on the session clock.
+    Session mode fits on all bursts first so early bursts get the final model.
+    """
+    import tifffile
+
+    paths = sorted(glob.glob(os.path.join(session_folder, "burst_[0-9][0-9][0-9].tif")))
+    corrector = BleachCorrector(mode=mode, **kwargs)
+    indices = []
+    for path in paths:
+        idx = int(os.path.splitext(os.path.basename(path))[0].split("_")[-1])
+        frames = tifffile.imread(path)
+        if frames.ndim == 2:
+            frames = frames[None]
+        corrector.update_burst(idx, (idx - 1) * cycle_s, frames, fps)
+        indices.append(idx)
+
+    corrector.finalize()   # session mode: refit once all bursts are in, same model everywhere
+    corrector.save(os.path.join(session_folder, "bleach_correction.json"))
+
+    if write:
+        for path, idx in zip(paths, indices):
+            frames = tifffile.imread(path)
+            if frames.ndim == 2:
+                frames = frames[None]
+            tifffile.imwrite(path[:-4] + "_corrected.tif", corrector.correct(frames, idx), photometric="minisblack")
+    return corrector
+
+def apply_saved_correction(session_folder):
+    """Write burst_###_corrected.tif with the parameters the GUI stored in bleach_correction.json, no refit."""
+    import tifffile
+
+    corrector = BleachCorrector.load(os.path.join(session_folder, "bleach_correction.json"))
+    for idx in sorted(corrector.bursts):
+        path = os.path.join(session_folder, f"burst_{idx:03d}.tif")
+        if not os.path.exists(path):
+            continue
+        frames = tifffile.imread(path)
+        if frames.ndim == 2:
+            frames = frames[None]
+        tifffile.imwrite(path[:-4] + "_corrected.tif", corrector.correct(frames, idx), photometric="minisblack")
+    return corrector
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Photobleaching/background correction of saved bursts")
+    parser.add_argument("session_folder")
+    parser.add_argument("--fps", type=float)
+    parser.add_argument("--cycle-s", type=float, help="burst duration + wait interval (s)")
+    parser.add_argument("--saved", action="store_true", help="apply the parameters fitted during the session instead of refitting")
+    parser.add_argument("--mode", choices=["session", "burst"], default="session")
+    parser.add_argument("--dark-level", type=float, default=None)
+    parser.add_argument("--no-write", action="store_true", help="only fit and store parameters")
+    args = parser.parse_args()
+
+    if args.saved:
+        c = apply_saved_correction(args.session_folder)
+        print(f"{len(c.bursts)} bursts corrected with the session parameters")
+        raise SystemExit(0)
+    if args.fps is None or args.cycle_s is None:
+        parser.error("--fps and --cycle-s are required when refitting")
+    c = correct_saved_bursts(args.session_folder, args.fps, args.cycle_s, mode=args.mode,
+                             write=not args.no_write, dark_level=args.dark_level)
+    print(f"{len(c.bursts)} bursts, rate={c.rate:.5f}/s, background={c.background():.1f}")
@@ -0,0 +1,111 @@
+import os, math, sys
+
+# -------------------- Capacity Planning --------------------
+def available_ram_bytes():
+    """Physical memory currently available, or None when it cannot be determined."""
+    try:
+        import psutil
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("sullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        stat = MEMORYSTATUSEX()
+        stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat)):
+            return int(stat.ullAvailPhys)
+        return None
+    try:
+        return int(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+    except (ValueError, OSError, AttributeError):
+        return None
+
+class CapacityPlan:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+        self.problems = []
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def summary(self):
+        mb = 1e6
+        lines = [
+            f"Frame {self.frame_bytes / mb:.2f} MB at {self.fps:g} fps (exposure allows {self.max_fps:.1f} fps) -> {self.stream_mb_s:.1f} MB/s from the camera",
+            f"Burst {self.frames_per_burst} frames = {self.burst_bytes / mb:.0f} MB, written in ~{self.write_s:.2f} s of a {self.cycle_s:.1f} s cycle at {self.writer_mb_s:.0f} MB/s",
+            f"Circular buffer {self.circular_frames} frames ({self.circular_bytes / mb:.0f} MB), frame bus {self.bus_frames} frames, burst queue {self.burst_queue_size} bursts, save queue {self.save_queue_frames} frames",
+            f"Peak RAM ~{self.ram_needed / mb:.0f} MB" + (f" of {self.ram_available / mb:.0f} MB available" if self.ram_available else ""),
+        ]
+        return "\n".join(lines)
+
+def plan_capacity(exposure_ms, fps, roi_shape, burst_s, wait_s, writer_mb_s, bytes_per_px=2,
+                  available_ram=None, ram_fraction=0.5, stall_s=1.0, margin=1.5, max_circular_frames=2000):
+    """
+    Derive buffer and queue depths from the acquisition parameters.
+    stall_s is the longest hiccup any consumer must ride out (GUI freeze, disk flush)
+    without losing frames; margin is applied on top of every depth. The camera buffer
+    gets at least the stall depth and grows into whatever is left of the RAM budget,
+    up to max_circular_frames (2000 frames when the available RAM is unknown).
+    """
+    h, w = int(roi_shape[0]), int(roi_shape[1])
+    frame_bytes = h * w * bytes_per_px
+    max_fps = 1000.0 / exposure_ms if exposure_ms > 0 else float("inf")
+    frames_per_burst = int(math.ceil(burst_s * fps))
+    burst_bytes = frames_per_burst * frame_bytes
+    writer_bytes_s = max(writer_mb_s, 1e-3) * 1e6
+    write_s = burst_bytes / writer_bytes_s
+    cycle_s = burst_s + wait_s
+
+    # The camera buffer and the frame bus must absorb a full consumer stall
+    stall_frames = max(1, int(math.ceil(fps * stall_s * margin)))
+    bus_frames = max(64, stall_frames)
+    # Bursts waiting on the writer while the next ones are being recorded
+    burst_queue_size = max(2, int(math.ceil(write_s / max(cycle_s, 1e-3) * margin)) + 1)
+    # Continuous per-frame saving (Cereal.CameraWorker): a whole burst in flight while the writer catches up
+    save_queue_frames = max(16, int(math.ceil(frames_per_burst * margin)))
+
+    other_bytes = (bus_frames + save_queue_frames) * frame_bytes + (burst_queue_size + 1) * burst_bytes
+    if available_ram is None:
+        available_ram = available_ram_bytes()
+    spare_frames = max_circular_frames
+    if available_ram is not None:
+        spare_frames = int((available_ram * ram_fraction - other_bytes) // max(frame_bytes, 1))
+    circular_frames = max(stall_frames, min(max_circular_frames, spare_frames))
+    ram_needed = circular_frames * frame_bytes + other_bytes
+
+    plan = CapacityPlan(
+        frame_bytes=frame_bytes, fps=fps, max_fps=max_fps, stream_mb_s=frame_bytes * fps / 1e6,
+        frames_per_burst=frames_per_burst, burst_bytes=burst_bytes, write_s=write_s, cycle_s=cycle_s,
+        writer_mb_s=writer_mb_s, circular_frames=circular_frames, circular_bytes=circular_frames * frame_bytes,
+        bus_frames=bus_frames, burst_queue_size=burst_queue_size, save_queue_frames=save_queue_frames,
+        ram_needed=ram_needed, ram_available=available_ram,
+    )
+
+    if fps > max_fps + 1e-6:
+        plan.problems.append(f"{fps:g} fps needs exposure <= {1000.0 / fps:.1f} ms (current {exposure_ms:g} ms allows {max_fps:.1f} fps)")
+    if write_s > cycle_s:
+        plan.problems.append(f"writer needs {write_s:.1f} s per burst but bursts arrive every {cycle_s:.1f} s "
+                             f"({burst_bytes / cycle_s / 1e6:.0f} MB/s required, {writer_mb_s:.0f} MB/s measured)")
+    if available_ram is not None and ram_needed > available_ram * ram_fraction:
+        plan.problems.append(f"buffers need {ram_needed / 1e6:.0f} MB, more than {ram_fraction:.0%} of the "
+                             f"{available_ram / 1e6:.0f} MB RAM available")
+    return plan
+
+def apply_to_core(core, plan, cam=None):
+    """Resize the camera/MMCore circular buffer. Sequence acquisition must be stopped."""
+    cam = cam or core.getCameraDevice()
+    try:
+        core.setProperty(cam, "CircularBufferFrameCount", plan.circular_frames)
+    except Exception:
+        pass  # property only exists on some cameras
+    footprint_mb = int(math.ceil(plan.circular_bytes * 1.1 / (1024 * 1024)))
+    core.setCircularBufferMemoryFootprint(max(footprint_mb, 16))
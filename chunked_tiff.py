@@ -0,0 +1,143 @@
+import os, re, csv, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import tifffile
+
+# -------------------- Chunked TIFF Writer --------------------
+INDEX_FIELDS = ("seq", "image_number", "timestamp", "file", "page")
+
+class ChunkedTiffWriter:
+    """
+    Collects frames into a preallocated (chunk_size, H, W) block and writes each full block as
+    one multi-page TIFF named <basename>_<chunk:06d>.tif. Every frame gets a row in
+    <basename>_index.csv (sequence number, camera image number, timestamp, file, page), so a
+    frame can be found without opening the stacks. Chunk numbers continue after any chunks
+    already in the folder, so nothing is overwritten.
+    """
+
+    def __init__(self, folder, basename="frames", chunk_size=100, compression=None):
+        self.folder = folder
+        self.basename = basename
+        self.chunk_size = max(1, int(chunk_size))
+        self.compression = compression
+        os.makedirs(folder, exist_ok=True)
+        self.chunk = self._next_chunk()
+        self._buf = None
+        self._rows = []
+        self.frames_written = 0
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.write_time_s = 0.0
+
+        index_path = os.path.join(folder, f"{basename}_index.csv")
+        new_index = not os.path.exists(index_path)
+        self._index = open(index_path, "a", newline="")
+        self._index_writer = csv.writer(self._index)
+        if new_index:
+            self._index_writer.writerow(INDEX_FIELDS)
+
+    def _next_chunk(self):
+        pattern = re.compile(rf"^{re.escape(self.basename)}_(\d+)\.tif$")
+        used = [int(m.group(1)) for m in map(pattern.match, os.listdir(self.folder)) if m]
+        return max(used) + 1 if used else 0
+
+    @property
+    def pending(self):
+        return len(self._rows)
+
+    def append(self, frame, seq, image_number=None, timestamp=None):
+        if self._buf is None or self._buf.shape[1:] != frame.shape or self._buf.dtype != frame.dtype:
+            self.flush()
+            self._buf = np.empty((self.chunk_size,) + frame.shape, dtype=frame.dtype)
+        n = len(self._rows)
+        self._buf[n] = frame
+        self._rows.append((seq, "" if image_number is None else image_number,
+                           time.time() if timestamp is None else timestamp))
+        if n + 1 == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the frames collected so far (a short final chunk is fine)."""
+        n = len(self._rows)
+        if not n:
+            return None
+        name = f"{self.basename}_{self.chunk:06d}.tif"
+        t0 = time.perf_counter()
+        tifffile.imwrite(os.path.join(self.folder, name), self._buf[:n], photometric='minisblack',
+                         compression=self.compression)
+        self.add_index(name, self._rows)
+        self.write_time_s += time.perf_counter() - t0
+        self.bytes_written += self._buf[:n].nbytes
+        self.frames_written += n
+        self.chunk += 1
+        self.chunks_written += 1
+        self._rows = []
+        return name
+
+    def add_index(self, name, rows):
+        """Index rows (seq, image_number, timestamp) for the pages of file name, in page order."""
+        self._index_writer.writerows((seq, num, f"{ts:.6f}", name, page) for page, (seq, num, ts) in enumerate(rows))
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        if not self._index.closed:
+            self._index.close()
+
+def read_index(path):
+    """Index CSV as a list of dicts, in write order."""
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+# -------------------- Per-frame Folder Converter --------------------
+def _pack_chunk(folder, out_name, files):
+    stack = np.stack([tifffile.imread(os.path.join(folder, f)) for f in files])
+    tifffile.imwrite(os.path.join(folder, out_name), stack, photometric='minisblack')
+    return len(files)
+
+def pack_frame_folder(folder, basename="live", chunk_size=500, workers=4, delete=False):
+    """
+    Pack <basename>_NNNNNN.tif single-frame files (old FrameWriterThread layout) into
+    <basename>_chunk_NNNNNN.tif stacks plus <basename>_chunk_index.csv, same layout as the
+    live writer. Chunks are read and written in parallel; the originals are removed only
+    with delete=True and only after every chunk was written. Returns the number of frames packed.
+    """
+    pattern = re.compile(rf"^{re.escape(basename)}_(\d+)\.tif$")
+    frames = sorted((int(m.group(1)), m.group(0)) for m in map(pattern.match, os.listdir(folder)) if m)
+    if not frames:
+        return 0
+    out_base = f"{basename}_chunk"
+    writer = ChunkedTiffWriter(folder, out_base, chunk_size)   # next free chunk number, owns the index
+    jobs = []
+    for i in range(0, len(frames), writer.chunk_size):
+        part = frames[i:i + writer.chunk_size]
+        jobs.append((f"{out_base}_{writer.chunk + len(jobs):06d}.tif", part))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_pack_chunk, folder, name, [f for _, f in part]) for name, part in jobs]
+        packed = sum(f.result() for f in futures)
+
+    for name, part in jobs:
+        writer.add_index(name, [(n, "", os.path.getmtime(os.path.join(folder, f))) for n, f in part])
+    writer.close()
+    if delete:
+        for _, f in frames:
+            os.remove(os.path.join(folder, f))
+    return packed
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack per-frame TIFF folders into chunked multi-page stacks")
+    parser.add_argument("folders", nargs="+")
+    parser.add_argument("--basename", default="live")
+    parser.add_argument("--chunk", type=int, default=500, help="frames per stack")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--delete", action="store_true", help="remove the single-frame files once packed")
+    args = parser.parse_args()
+
+    for folder in args.folders:
+        t0 = time.perf_counter()
+        n = pack_frame_folder(folder, args.basename, args.chunk, args.workers, args.delete)
+        print(f"{folder}: {n} frames packed in {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,493 @@
+import os, csv, time, heapq, shutil, threading, itertools
+from collections import deque
+import numpy as np
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from serial_manager import SerialManager, Ticket
+from trigger_protocol import SketchEmulator, parse_line, train_command, train_pulses
+from preflight import existing_parent
+
+# -------------------- Clocks --------------------
+class VirtualClock:
+    """Discrete-event clock: call_later() queues callbacks, run() jumps straight to each one."""
+
+    def __init__(self, start=None):
+        self.t = time.time() if start is None else start
+        self._heap = []
+        self._counter = itertools.count()
+
+    def time(self):
+        return self.t
+
+    def perf_ns(self):
+        return int(self.t * 1e9)
+
+    def call_later(self, delay_ms, fn):
+        heapq.heappush(self._heap, (self.t + max(delay_ms, 0) / 1000.0, next(self._counter), fn))
+
+    def run(self, max_events=10_000_000):
+        n = 0
+        while self._heap and n < max_events:
+            when, _, fn = heapq.heappop(self._heap)
+            self.t = max(self.t, when)
+            fn()
+            n += 1
+        return n
+
+class RealClock:
+    """Wall-clock stand-in with the same interface; callbacks go through the Qt event loop."""
+
+    def time(self):
+        return time.time()
+
+    def perf_ns(self):
+        return time.perf_counter_ns()
+
+    def call_later(self, delay_ms, fn):
+        QTimer.singleShot(int(delay_ms), fn)
+
+# -------------------- Synthetic Camera --------------------
+class SyntheticCore:
+    """The subset of CMMCorePlus the experiment uses, producing noise frames at a fixed fps."""
+
+    def __init__(self, shape=(600, 600), bytes_per_px=2, fps=30, camera="SyntheticCam"):
+        self.shape = tuple(shape)
+        self.bytes_per_px = bytes_per_px
+        self.fps = fps
+        self.camera = camera
+        self.exposure = 10.0
+        self.props = {}
+        self.buffer_mb = None
+        self.running = False
+        self.t0 = 0.0
+        self.popped = 0
+        self._make_frames()
+
+    def _make_frames(self):
+        rng = np.random.default_rng(0)
+        self.frames = [rng.poisson(100, self.shape).astype(np.uint16) for _ in range(4)]
+
+    def setCameraDevice(self, dev):
+        self.camera = dev
+
+    def setROI(self, x, y, w, h):
+        self.shape = (h, w)
+        self._make_frames()
+
+    def getCameraDevice(self):
+        return self.camera
+
+    def getImageHeight(self):
+        return self.shape[0]
+
+    def getImageWidth(self):
+        return self.shape[1]
+
+    def getBytesPerPixel(self):
+        return self.bytes_per_px
+
+    def setProperty(self, dev, prop, value):
+        self.props[(dev, prop)] = value
+
+    def getProperty(self, dev, prop):
+        return self.props.get((dev, prop), "")
+
+    def setExposure(self, ms):
+        self.exposure = ms
+
+    def getExposure(self):
+        return self.exposure
+
+    def setCircularBufferMemoryFootprint(self, mb):
+        self.buffer_mb = mb
+
+    def isSequenceRunning(self):
+        return self.running
+
+    def startContinuousSequenceAcquisition(self, interval_ms=0):
+        self.running = True
+        self.t0 = time.perf_counter()
+        self.popped = 0
+
+    def stopSequenceAcquisition(self):
+        self.running = False
+
+    def getRemainingImageCount(self):
+        if not self.running:
+            return 0
+        return int((time.perf_counter() - self.t0) * self.fps) - self.popped
+
+    def popNextImage(self):
+        frame = self.frames[self.popped % len(self.frames)]
+        self.popped += 1
+        return frame
+
+    def reset(self):
+        self.running = False
+
+# -------------------- Fake Serial --------------------
+class LoopbackSerial:
+    """In-process serial port answering like frame_trigger.ino; used through SerialManager in real time."""
+
+    def __init__(self, port, baud, on_write=None, latency_s=0.001):
+        self.port = port
+        self.baudrate = baud
+        self.on_write = on_write
+        self.latency_s = latency_s
+        self._sketch = SketchEmulator(time.perf_counter())
+        self._lines = deque()
+        self._cond = threading.Condition()
+        self.is_open = True
+
+    def write(self, data):
+        if self.on_write:
+            self.on_write(data)
+        with self._cond:
+            self._sketch.feed(data, time.perf_counter() + self.latency_s)
+            self._cond.notify()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._sketch.due(time.perf_counter())
+            self._lines.clear()
+
+    def readline(self):
+        with self._cond:
+            deadline = time.perf_counter() + 0.1
+            while True:
+                now = time.perf_counter()
+                self._lines.extend((line + "\n").encode() for line in self._sketch.due(now))
+                if self._lines or now >= deadline:
+                    break
+                nxt = self._sketch.next_due()
+                self._cond.wait(max(0.0, min(deadline, nxt if nxt is not None else deadline) - now))
+            return self._lines.popleft() if self._lines else b""
+
+    def close(self):
+        self.is_open = False
+
+class VirtualSerial:
+    """SerialManager look-alike on the virtual clock: commands and replies are timeline events."""
+
+    def __init__(self, clock, on_event=None, on_write=None, latency_ms=2.0, port="DRYRUN", baud=115200):
+        self.clock = clock
+        self.on_event = on_event
+        self.on_write = on_write
+        self.latency_ms = latency_ms
+        self.port = port
+        self.baud = baud
+        self.is_open = True
+        self._sketch = SketchEmulator(clock.perf_ns() / 1e9)
+        self._pending = deque()
+        self._wake = None
+        self.reply_timeout_s = 2.0
+        self.connected = threading.Event()
+        self.connected.set()
+
+    def _at(self, at_ns, fn):
+        delay_ms = 0.0 if at_ns is None else (at_ns - self.clock.perf_ns()) / 1e6
+        self.clock.call_later(delay_ms, fn)
+
+    def _schedule_delivery(self):
+        nxt = self._sketch.next_due()
+        if nxt is None or (self._wake is not None and self._wake <= nxt):
+            return
+        self._wake = nxt
+        self.clock.call_later((nxt - self.clock.perf_ns() / 1e9) * 1000.0, self._deliver)
+
+    def _deliver(self):
+        self._wake = None
+        for line in self._sketch.due(self.clock.perf_ns() / 1e9):
+            kind, values = parse_line(line)
+            for ticket in self._pending:
+                if ticket.expect == kind:
+                    self._pending.remove(ticket)
+                    ticket.ack_ns, ticket.reply = self.clock.perf_ns(), line
+                    ticket.done.set()
+                    values = dict(values, latency_ms=ticket.latency_ms)
+                    break
+            if self.on_event:
+                self.on_event({"t_ns": self.clock.perf_ns(), "wall": self.clock.time(), "kind": kind,
+                               "values": values, "text": line})
+        self._schedule_delivery()
+
+    def _expire(self, ticket):
+        if ticket in self._pending:
+            self._pending.remove(ticket)
+            ticket.error = f"no '{ticket.expect}' reply within {ticket.timeout_s:g} s"
+            ticket.done.set()
+            if self.on_event:
+                self.on_event({"t_ns": self.clock.perf_ns(), "wall": self.clock.time(), "kind": "timeout",
+                               "values": {"error": ticket.error, "expect": ticket.expect},
+                               "text": ticket.data.decode(errors="replace").strip()})
+
+    def send(self, data, expect=None, at_ns=None, timeout_s=None):
+        ticket = Ticket(data, expect, self.reply_timeout_s if timeout_s is None else timeout_s)
+
+        def write():
+            ticket.sent_ns = self.clock.perf_ns()
+            if self.on_write:
+                self.on_write(data)
+            if self.on_event:
+                self.on_event({"t_ns": ticket.sent_ns, "wall": self.clock.time(), "kind": "tx",
+                               "values": {"sent_ns": ticket.sent_ns}, "text": data.decode(errors="replace").strip()})
+            if expect:
+                self._pending.append(ticket)
+                self.clock.call_later(ticket.timeout_s * 1000.0, lambda: self._expire(ticket))
+            self._sketch.feed(data, self.clock.perf_ns() / 1e9 + self.latency_ms / 1000.0)
+            self._schedule_delivery()
+            if not expect:
+                ticket.done.set()
+        self._at(at_ns, write)
+        return ticket
+
+    def send_train(self, frequency_hz, duration_ms, pulse_ms=1.0, start_ns=None):
+        self.send(train_command(frequency_hz, duration_ms, pulse_ms * 1000.0), expect="pulse_ended", at_ns=start_ns,
+                  timeout_s=duration_ms / 1000.0 + self.reply_timeout_s)
+        return train_pulses(frequency_hz, duration_ms)
+
+    def close(self, timeout=None):
+        self.is_open = False
+
+# -------------------- Simulated Burst / Writer --------------------
+class SimulatedBurst(QObject):
+    """BurstThread stand-in: delivers a burst of synthetic frames when its duration elapses on the clock."""
+    burst_done = pyqtSignal(int, object, object)
+    burst_started = pyqtSignal(int)
+    log_event_signal = pyqtSignal(str, str)
+
+    def __init__(self, clock, frame, burst_index, duration_s, cursor=None, fps=30, max_frames=None, stim_frame=None, **_):
+        super().__init__()
+        self.clock = clock
+        self.frame = frame
+        self.burst_index = burst_index
+        self.duration_s = duration_s
+        self.fps = fps
+        self.max_frames = max_frames
+        self.stim_frame = stim_frame
+        self.running = False
+        if cursor is not None:
+            cursor.close()
+
+    def start(self):
+        self.running = True
+        self.t_start = self.clock.time()
+        self.burst_started.emit(self.burst_index)
+        n = self.max_frames if self.max_frames is not None else int(self.duration_s * self.fps)
+        self.clock.call_later(n / self.fps * 1000.0, lambda: self._finish(n))
+
+    def _finish(self, n):
+        if not self.running:
+            return
+        self.running = False
+        # zero-stride view: reports the real burst size without allocating it
+        frames = np.broadcast_to(self.frame, (n,) + self.frame.shape)
+        index = {"frame": list(range(n)), "bus_seq": list(range(n)),
+                 "timestamp_s": [f"{self.t_start + i / self.fps:.6f}" for i in range(n)]}
+        if self.max_frames is not None:
+            index["trigger_index"] = list(range(n))
+            index["stim"] = [int(i == self.stim_frame) for i in range(n)]
+        self.burst_done.emit(self.burst_index, frames, index)
+
+    def isRunning(self):
+        return self.running
+
+    def stop(self):
+        self.running = False
+
+    def wait(self, *args):
+        return True
+
+class SimulatedWriterQueue:
+    """Replaces the burst job queue; models each write as bytes / writer_mb_s on the clock."""
+
+    def __init__(self, dry_run, writer_mb_s):
+        self.dry_run = dry_run
+        self.writer_mb_s = writer_mb_s
+        self.busy_until = 0.0
+        self.pending = []         # (finish time, bytes)
+        self.peak_backlog_bytes = 0
+        self.busy_s = 0.0
+
+    def put(self, job, block=True, timeout=None):
+        path, frames = job[0], job[1]
+        now = self.dry_run.clock.time()
+        nbytes = int(frames.nbytes)
+        write_s = nbytes / (self.writer_mb_s * 1e6)
+        start = max(now, self.busy_until)
+        self.busy_until = start + write_s
+        self.busy_s += write_s
+        self.pending = [(t, b) for t, b in self.pending if t > now] + [(self.busy_until, nbytes)]
+        self.peak_backlog_bytes = max(self.peak_backlog_bytes, sum(b for _, b in self.pending))
+        self.dry_run.mark("write_queued", detail=f"{os.path.basename(path)} {nbytes / 1e6:.1f} MB")
+        self.dry_run.clock.call_later((self.busy_until - now) * 1000.0,
+                                      lambda: self.dry_run.mark("write_done", detail=os.path.basename(path)))
+
+# -------------------- Dry Run --------------------
+class DryRun:
+    """
+    Swaps the GUI's camera core, Arduino and clock for synthetic ones so start_experiment,
+    start_burst_and_ttl and on_burst_done run unchanged. Virtual mode finishes a whole
+    session in seconds; realtime mode uses real timers, threads and disk writes to measure jitter.
+    """
+
+    def __init__(self, realtime=False, shape=(600, 600), bytes_per_px=2, fps=30, serial_latency_ms=2.0):
+        self.realtime = realtime
+        self.virtual = not realtime
+        self.clock = RealClock() if realtime else VirtualClock()
+        self.core = SyntheticCore(shape, bytes_per_px, fps)
+        self.serial_latency_ms = serial_latency_ms
+        self.timeline = []        # (t_s, kind, burst, due_s, detail)
+        self.t0 = None
+        self.writer_queue = None
+        self.wall_start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._saved = None
+        self._gui_on_event = None
+
+    def now(self):
+        return self.clock.time() if self.virtual else time.perf_counter()
+
+    def mark(self, kind, burst=None, due_s=None, detail=""):
+        with self._lock:
+            t = self.now()
+            if self.t0 is None or kind == "session_start":
+                self.t0 = t
+            self.timeline.append((t - self.t0, kind, burst, due_s, detail))
+
+    def _on_write(self, data):
+        self.mark("serial_tx", detail=data.decode(errors="replace").strip() or repr(data))
+
+    def _on_event(self, event):
+        if event["kind"] in ("stim", "done", "armed", "pulse_ended", "missed", "timeout"):
+            self.mark(event["kind"], detail=event["text"])
+        if self._gui_on_event:
+            self._gui_on_event(event)
+
+    def install(self, gui):
+        self._saved = (gui.core, gui.arduino)
+        self._gui_on_event = gui.on_serial_event
+        gui.core = self.core
+        gui.dry_run = self
+        if self.virtual:
+            gui.arduino = VirtualSerial(self.clock, on_event=self._on_event, on_write=self._on_write,
+                                        latency_ms=self.serial_latency_ms)
+        else:
+            self.core.startContinuousSequenceAcquisition(0)
+            gui.arduino = SerialManager("DRYRUN", 115200, on_event=self._on_event, settle_s=0.0,
+                                        serial_factory=lambda port, baud: LoopbackSerial(port, baud, self._on_write,
+                                                                                         self.serial_latency_ms / 1000.0))
+            gui.arduino.start()
+            gui.arduino.connected.wait(1.0)   # the loopback port opens at once (settle_s=0)
+
+    def uninstall(self, gui):
+        if gui.live_thread is not None and gui.live_thread.core is self.core:
+            gui.live_thread.stop()
+            gui.live_thread.wait(2000)
+            gui.live_thread = None
+        self.core.stopSequenceAcquisition()
+        if gui.arduino is not None:
+            gui.arduino.close()
+        gui.core, gui.arduino = self._saved
+        gui.dry_run = None
+
+    def make_writer_queue(self, writer_mb_s):
+        self.writer_queue = SimulatedWriterQueue(self, writer_mb_s)
+        return self.writer_queue
+
+    def make_burst(self, **kwargs):
+        return SimulatedBurst(self.clock, self.core.frames[0], **kwargs)
+
+    # ---- report ----
+    def report(self, schedule, folder=None, writer_mb_s=None):
+        rows = self.timeline
+        starts = {b: (t, due) for t, k, b, due, _ in rows if k == "burst_start"}
+        dones = {b: t for t, k, b, _, _ in rows if k == "burst_done"}
+        tx = [t for t, k, _, _, d in rows if k == "serial_tx" and (d == "H" or d[:2] in ("P,", "T,"))]
+        stims = [t for t, k, _, _, _ in rows if k == "stim"]
+
+        start_err, ttl_err = [], []
+        for row in schedule:
+            b = int(row["burst"])
+            if b not in starts:
+                continue
+            t, due = starts[b]
+            start_err.append(t - due)
+            # first stimulus after this burst started: the Arduino's stim report in external mode, else the first H
+            onsets = [s for s in (stims or tx) if s >= t]
+            if onsets and b + 1 in starts and onsets[0] >= starts[b + 1][0]:
+                onsets = []
+            if onsets:
+                ttl_err.append(onsets[0] - (t + row["trigger_time_ms"] / 1000.0))
+        start_err = np.asarray(start_err) * 1000.0
+        ttl_err = np.asarray(ttl_err) * 1000.0
+
+        frame_bytes = self.core.shape[0] * self.core.shape[1] * self.core.bytes_per_px
+        burst_bytes = schedule["burst_duration_s"] * self.core.fps * frame_bytes
+        session_s = rows[-1][0] if rows else 0.0
+        lines = [
+            f"Dry run ({'real time' if self.realtime else 'virtual clock'}): {len(starts)}/{len(schedule)} bursts, "
+            f"{len(dones)} completed",
+            f"Session length {session_s:.1f} s simulated in {time.perf_counter() - self.wall_start:.1f} s",
+        ]
+        if len(start_err):
+            lines.append(f"Burst start error: mean {start_err.mean():.2f} ms, p95 {np.percentile(start_err, 95):.2f} ms, "
+                         f"max {start_err.max():.2f} ms")
+        if len(ttl_err):
+            lines.append(f"TTL onset error: mean {ttl_err.mean():.2f} ms, p95 {np.percentile(np.abs(ttl_err), 95):.2f} ms, "
+                         f"max {np.abs(ttl_err).max():.2f} ms")
+        lines.append(f"Data: {burst_bytes.sum() / 1e9:.2f} GB total, largest burst {burst_bytes.max() / 1e6:.0f} MB in RAM")
+        if self.writer_queue is not None and session_s > 0:
+            w = self.writer_queue
+            lines.append(f"Writer at {w.writer_mb_s:.0f} MB/s: busy {w.busy_s / session_s:.0%} of the session, "
+                         f"peak backlog {w.peak_backlog_bytes / 1e6:.0f} MB")
+        elif writer_mb_s:
+            lines.append(f"Writer throughput {writer_mb_s:.0f} MB/s")
+        if folder:
+            free = shutil.disk_usage(existing_parent(folder)).free
+            lines.append(f"Disk: {free / 1e9:.1f} GB free, session needs {burst_bytes.sum() / 1e9:.2f} GB")
+            self.save_timeline(os.path.join(folder, "dryrun_timeline.csv"))
+            with open(os.path.join(folder, "dryrun_report.txt"), "w") as f:
+                f.write("\n".join(lines) + "\n")
+        return "\n".join(lines)
+
+    def save_timeline(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["t_s", "kind", "burst", "due_s", "detail"])
+            for t, kind, burst, due, detail in self.timeline:
+                writer.writerow([f"{t:.6f}", kind, "" if burst is None else burst,
+                                 "" if due is None else f"{due:.6f}", detail])
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import sys, json, argparse
+    from PyQt5.QtWidgets import QApplication
+
+    parser = argparse.ArgumentParser(description="Run an experiment configuration against a synthetic rig")
+    parser.add_argument("--settings", default="stim_gui_settings.json")
+    parser.add_argument("--protocol", default=None, help="protocol file (default: spin box values from settings)")
+    parser.add_argument("--realtime", action="store_true", help="run on real timers and threads to measure jitter")
+    parser.add_argument("--shape", type=int, nargs=2, default=(600, 600))
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv)
+    from Calcium_Imaging import LiveImagingGUI
+
+    gui = LiveImagingGUI(cfg_path=None)
+    gui.settings_file = args.settings
+    gui.load_settings()
+    if args.protocol:
+        gui.load_protocol_file(args.protocol)
+    gui.start_dry_run(realtime=args.realtime, shape=tuple(args.shape))
+    if args.realtime:
+        poll = QTimer()
+        poll.timeout.connect(lambda: app.quit() if gui.dry_run is None else None)
+        poll.start(200)
+        app.exec_()
+    print(gui.dry_run_summary or "Dry run did not start")
@@ -0,0 +1,182 @@
+import os, csv
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# -------------------- Event Table Layout --------------------
+# One row per (burst, cell). Latencies are relative to the TTL timestamp, not the burst start.
+EVENT_DTYPE = np.dtype([
+    ("session", "U64"),
+    ("burst", "i4"),
+    ("cell", "i4"),
+    ("responded", "?"),
+    ("onset_frame", "i4"),
+    ("onset_latency_ms", "f4"),
+    ("peak_frame", "i4"),
+    ("peak_latency_ms", "f4"),
+    ("peak_dff", "f4"),
+    ("threshold", "f4"),
+    ("baseline_sd", "f4"),
+])
+
+# Upper bound for the temporary (cells, frames, window) view copied by np.percentile
+_BASELINE_CHUNK_BYTES = 64 * 1024 * 1024
+
+# -------------------- Baseline / dF/F --------------------
+def rolling_baseline(traces, window, percentile=8.0):
+    """Centered rolling percentile of each row of a (n_cells, n_frames) array."""
+    traces = np.asarray(traces, dtype=np.float32)
+    n_cells, n_frames = traces.shape
+    window = int(min(max(1, window), n_frames))
+    half = window // 2
+    padded = np.pad(traces, ((0, 0), (half, window - 1 - half)), mode="edge")
+
+    out = np.empty_like(traces)
+    chunk = max(1, _BASELINE_CHUNK_BYTES // max(1, n_frames * window * 4))
+    for start in range(0, n_cells, chunk):
+        windows = sliding_window_view(padded[start:start + chunk], window, axis=1)
+        out[start:start + chunk] = np.percentile(windows, percentile, axis=-1)
+    return out
+
+def compute_dff(traces, ttl_frame=None, mode="pre", window=None, percentile=8.0):
+    """
+    Convert raw fluorescence traces to dF/F.
+    mode="pre"     -> F0 is the percentile of the pre-TTL frames of each cell
+    mode="rolling" -> F0 is a centered rolling percentile of `window` frames
+    """
+    traces = np.asarray(traces, dtype=np.float32)
+    if mode == "pre" and ttl_frame is not None and ttl_frame >= 2:
+        f0 = np.percentile(traces[:, :ttl_frame], percentile, axis=1, keepdims=True)
+    elif mode in ("pre", "rolling"):
+        window = window or max(3, traces.shape[1] // 4)
+        f0 = rolling_baseline(traces, window, percentile)
+    else:
+        raise ValueError(f"Unknown baseline mode: {mode}")
+    f0 = np.where(np.abs(f0) < 1e-6, 1e-6, f0)
+    return (traces - f0) / f0
+
+# -------------------- Event Detection --------------------
+def detect_events(dff, fps, ttl_s, k=3.0, min_dff=0.0, min_frames=1, response_window_s=None):
+    """
+    Vectorized stimulus-evoked event detection on a (n_cells, n_frames) dF/F array.
+    A cell responds when dF/F stays above max(k * baseline SD, min_dff) for `min_frames`
+    consecutive frames after the TTL. Returns a dict of per-cell arrays.
+    """
+    dff = np.asarray(dff, dtype=np.float32)
+    n_cells, n_frames = dff.shape
+    ttl_frame = int(min(max(0, np.ceil(ttl_s * fps)), n_frames - 1))
+    end_frame = n_frames if response_window_s is None else int(min(n_frames, ttl_frame + np.ceil(response_window_s * fps)))
+    end_frame = max(end_frame, ttl_frame + 1)
+
+    # Robust noise estimate (scaled MAD) from the pre-stimulus period
+    pre = dff[:, :ttl_frame] if ttl_frame >= 2 else dff
+    med = np.median(pre, axis=1, keepdims=True)
+    sd = 1.4826 * np.median(np.abs(pre - med), axis=1)
+    threshold = np.maximum(k * sd, min_dff).astype(np.float32)
+
+    post = dff[:, ttl_frame:end_frame]
+    above = post > threshold[:, None]
+    min_frames = int(max(1, min(min_frames, post.shape[1])))
+    if min_frames > 1:
+        above = sliding_window_view(above, min_frames, axis=1).all(axis=-1)
+
+    responded = above.any(axis=1)
+    onset = np.where(responded, ttl_frame + above.argmax(axis=1), -1)
+    peak_rel = post.argmax(axis=1)
+    peak_frame = ttl_frame + peak_rel
+    peak = post[np.arange(n_cells), peak_rel]
+
+    frame_ms = 1000.0 / fps
+    onset_latency = np.where(responded, onset * frame_ms - ttl_s * 1000.0, np.nan)
+    peak_latency = peak_frame * frame_ms - ttl_s * 1000.0
+
+    return {
+        "responded": responded,
+        "onset_frame": onset,
+        "onset_latency_ms": onset_latency,
+        "peak_frame": peak_frame,
+        "peak_latency_ms": peak_latency,
+        "peak_dff": peak,
+        "threshold": threshold,
+        "baseline_sd": sd,
+    }
+
+def events_table(session, burst, events):
+    n = len(events["responded"])
+    table = np.zeros(n, dtype=EVENT_DTYPE)
+    table["session"] = session
+    table["burst"] = burst
+    table["cell"] = np.arange(n)
+    for name in EVENT_DTYPE.names[3:]:
+        table[name] = events[name]
+    return table
+
+# -------------------- Session --------------------
+def session_event_table(session, bursts, fps, ttl_s, baseline="pre", window=None, percentile=8.0, **detect_kwargs):
+    """
+    bursts: iterable of (burst_index, traces) with traces shaped (n_cells, n_frames).
+    Bursts with the same frame count are stacked and processed in one pass, so hundreds
+    of bursts cost a handful of NumPy calls instead of a Python loop over cells.
+    """
+    groups = {}
+    for burst_idx, traces in bursts:
+        traces = np.asarray(traces, dtype=np.float32)
+        groups.setdefault(traces.shape[1], []).append((int(burst_idx), traces))
+
+    ttl_frame = int(np.ceil(ttl_s * fps))
+    tables = []
+    for _, items in groups.items():
+        stacked = np.concatenate([t for _, t in items], axis=0)
+        dff = compute_dff(stacked, ttl_frame=ttl_frame, mode=baseline, window=window, percentile=percentile)
+        events = detect_events(dff, fps, ttl_s, **detect_kwargs)
+        start = 0
+        for burst_idx, traces in items:
+            stop = start + traces.shape[0]
+            tables.append(events_table(session, burst_idx, {k: v[start:stop] for k, v in events.items()}))
+            start = stop
+
+    if not tables:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    table = np.concatenate(tables)
+    return table[np.lexsort((table["cell"], table["burst"]))]
+
+def write_event_table(path, table):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.dtype.names)
+        for row in table.tolist():
+            writer.writerow(row)
+
+def load_burst_traces(path):
+    """Load an .npz of per-burst traces saved with keys like burst_001, burst_002, ..."""
+    with np.load(path) as data:
+        bursts = []
+        for key in sorted(data.files):
+            if key.startswith("burst_"):
+                bursts.append((int(key.split("_")[-1]), data[key]))
+    return bursts
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import argparse, time
+
+    parser = argparse.ArgumentParser(description="Detect stimulus-evoked events in extracted traces")
+    parser.add_argument("traces", help=".npz with one (n_cells, n_frames) array per burst (burst_001, ...)")
+    parser.add_argument("--fps", type=float, required=True)
+    parser.add_argument("--ttl-ms", type=float, required=True, help="TTL time relative to burst start (Trigger Time)")
+    parser.add_argument("--k", type=float, default=3.0, help="threshold in baseline SDs")
+    parser.add_argument("--min-dff", type=float, default=0.0)
+    parser.add_argument("--min-frames", type=int, default=1)
+    parser.add_argument("--baseline", choices=["pre", "rolling"], default="pre")
+    parser.add_argument("--window", type=int, default=None, help="rolling baseline window (frames)")
+    parser.add_argument("-o", "--out", default=None)
+    args = parser.parse_args()
+
+    session = os.path.splitext(os.path.basename(args.traces))[0]
+    t0 = time.perf_counter()
+    table = session_event_table(session, load_burst_traces(args.traces), args.fps, args.ttl_ms / 1000.0,
+                                baseline=args.baseline, window=args.window,
+                                k=args.k, min_dff=args.min_dff, min_frames=args.min_frames)
+    out = args.out or os.path.splitext(args.traces)[0] + "_events.csv"
+    write_event_table(out, table)
+    print(f"{len(table)} rows ({int(table['responded'].sum())} responses) in {time.perf_counter() - t0:.2f} s -> {out}")
@@ -0,0 +1,110 @@
+import os, json, time, struct, threading
+from collections import deque
+import numpy as np
+
+# -------------------- Session Event Journal --------------------
+# Append-only binary file: an 8-byte magic, a 4-byte header length, a JSON header
+# (kind names, clock anchor), then fixed-size little-endian records.
+
+MAGIC = b"CIJRNL01"
+KINDS = ("session_start", "session_stop", "burst_start", "burst_stop", "ttl_command", "ttl_ack",
+         "arm", "stim", "trigger_done", "frame_batch", "write_done", "error")
+KIND_CODES = {k: i for i, k in enumerate(KINDS)}
+
+DETAIL_BYTES = 40
+RECORD = struct.Struct(f"<qdHiq{DETAIL_BYTES}s")
+RECORD_DTYPE = np.dtype([("t_ns", "<i8"), ("wall", "<f8"), ("kind", "<u2"), ("burst", "<i4"),
+                         ("value", "<i8"), ("detail", f"S{DETAIL_BYTES}")], align=False)
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+class EventJournal(threading.Thread):
+    """
+    record() only appends a tuple to a deque, so it is cheap from any thread; a background
+    thread packs and writes whatever has accumulated every flush_s seconds.
+    t_ns is time.perf_counter_ns() (monotonic), wall is time.time().
+    """
+
+    def __init__(self, path, flush_s=0.2, meta=None, anchor_t_ns=None, anchor_wall=None):
+        super().__init__(name="event-journal", daemon=True)
+        self.path = path
+        self.flush_s = flush_s
+        self._pending = deque()
+        self._stop_event = threading.Event()
+        self.count = 0
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            anchor_t_ns = time.perf_counter_ns() if anchor_t_ns is None else anchor_t_ns
+            anchor_wall = time.time() if anchor_wall is None else anchor_wall
+            header = json.dumps({"kinds": KINDS, "anchor_t_ns": anchor_t_ns, "anchor_wall": anchor_wall,
+                                 "meta": meta or {}}).encode()
+            self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+            self._file.flush()
+
+    def record(self, kind, burst=-1, value=0, detail="", t_ns=None, wall=None):
+        self._pending.append((time.perf_counter_ns() if t_ns is None else t_ns,
+                              time.time() if wall is None else wall,
+                              KIND_CODES[kind], burst, int(value), detail))
+
+    def _drain(self):
+        chunks = []
+        while self._pending:
+            t_ns, wall, kind, burst, value, detail = self._pending.popleft()
+            detail = str(detail).encode("utf-8", "replace")[:DETAIL_BYTES]
+            chunks.append(RECORD.pack(t_ns, wall, kind, burst, value, detail))
+        if chunks:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            self.count += len(chunks)
+
+    def run(self):
+        while not self._stop_event.wait(self.flush_s):
+            self._drain()
+        self._drain()
+        self._file.close()
+
+    def close(self, timeout=2.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        elif not self._file.closed:
+            self._drain()
+            self._file.close()
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an event journal")
+        n = struct.unpack("<I", f.read(4))[0]
+        return json.loads(f.read(n)), len(MAGIC) + 4 + n
+
+def load_journal(path):
+    """Return the journal as a structured array with kind names and decoded details."""
+    header, offset = read_header(path)
+    size = os.path.getsize(path) - offset
+    raw = np.fromfile(path, dtype=RECORD_DTYPE, count=size // RECORD_DTYPE.itemsize, offset=offset)
+    kinds = np.asarray(header["kinds"])
+    out = np.zeros(len(raw), dtype=[("t_ns", "i8"), ("t_s", "f8"), ("wall", "f8"), ("kind", "U16"),
+                                    ("burst", "i4"), ("value", "i8"), ("detail", f"U{DETAIL_BYTES}")])
+    out["t_ns"] = raw["t_ns"]
+    out["t_s"] = (raw["t_ns"] - header["anchor_t_ns"]) / 1e9
+    out["wall"] = raw["wall"]
+    out["kind"] = kinds[raw["kind"]]
+    out["burst"] = raw["burst"]
+    out["value"] = raw["value"]
+    out["detail"] = np.char.decode(raw["detail"], "utf-8", "replace")
+    return out
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import sys, csv
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python event_journal.py <events.journal> [out.csv]")
+    events = load_journal(sys.argv[1])
+    kinds, counts = np.unique(events["kind"], return_counts=True)
+    print(f"{len(events)} events: " + ", ".join(f"{k} {c}" for k, c in zip(kinds, counts)))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(events.dtype.names)
+            writer.writerows(events.tolist())
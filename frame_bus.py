@@ -0,0 +1,113 @@
+import time, threading
+
+# -------------------- Frame Bus --------------------
+class FrameBus:
+    """
+    Single-producer / multi-consumer frame stream.
+    The producer stores (seq, ts, frame) tuples into a fixed ring and bumps the sequence
+    number; consumers read through their own FrameCursor without taking any lock.
+    The condition variable is only used to wake consumers that are waiting.
+    """
+
+    def __init__(self, capacity=512):
+        self.capacity = int(capacity)
+        self._slots = [None] * self.capacity
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._cursors = {}
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, frame, ts=None):
+        seq = self._seq + 1
+        slots = self._slots
+        slots[seq % len(slots)] = (seq, ts if ts is not None else time.perf_counter(), frame)
+        self._seq = seq             # publish after the slot is filled
+        with self._cond:
+            self._cond.notify_all()
+        return seq
+
+    def read(self, seq):
+        slots = self._slots
+        item = slots[seq % len(slots)]
+        if item is None or item[0] != seq:
+            return None
+        return item
+
+    def wait(self, seq, timeout):
+        """Block until a frame newer than `seq` exists or the timeout expires."""
+        with self._cond:
+            if self._seq > seq:
+                return True
+            return self._cond.wait_for(lambda: self._seq > seq, timeout)
+
+    def subscribe(self, name, policy="lossless"):
+        cursor = FrameCursor(self, name, policy)
+        self._cursors[name] = cursor
+        return cursor
+
+    def unsubscribe(self, name):
+        self._cursors.pop(name, None)
+
+    def stats(self):
+        return {name: (c.read_count, c.dropped) for name, c in list(self._cursors.items())}
+
+    def resize(self, capacity):
+        """Change the ring depth. Frames still in the old ring are lost, so call it between sessions."""
+        self._slots = [None] * int(capacity)
+        self.capacity = int(capacity)
+
+class FrameCursor:
+    """
+    Read position of one consumer.
+    policy="lossless"    -> every frame in order; frames overwritten before they are read count as dropped
+    policy="latest"      -> always the newest frame, older ones are skipped on purpose
+    """
+
+    def __init__(self, bus, name, policy="lossless"):
+        if policy not in ("lossless", "latest"):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.bus = bus
+        self.name = name
+        self.policy = policy
+        self.next_seq = bus.seq + 1
+        self.read_count = 0
+        self.dropped = 0
+
+    def poll(self):
+        latest = self.bus.seq
+        if latest < self.next_seq:
+            return None
+        if self.policy == "latest":
+            self.next_seq = latest
+        oldest = latest - self.bus.capacity + 1
+        if self.next_seq < oldest:
+            self.dropped += oldest - self.next_seq
+            self.next_seq = oldest
+        item = self.bus.read(self.next_seq)
+        self.next_seq += 1
+        if item is None:
+            self.dropped += 1
+            return None
+        self.read_count += 1
+        return item
+
+    def get(self, timeout=0.1):
+        item = self.poll()
+        if item is None and self.bus.wait(self.next_seq - 1, timeout):
+            item = self.poll()
+        return item
+
+    def drain(self, max_items=None):
+        items = []
+        while max_items is None or len(items) < max_items:
+            item = self.poll()
+            if item is None:
+                break
+            items.append(item)
+        return items
+
+    def close(self):
+        self.bus.unsubscribe(self.name)
@@ -0,0 +1,103 @@
+import os, time, shutil
+import numpy as np
+
+# -------------------- Pre-flight Resource Check --------------------
+def existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+_bandwidth_cache = {}   # st_dev of the target volume -> last measured MB/s
+
+def volume_id(folder):
+    return os.stat(existing_parent(folder)).st_dev
+
+def cached_write_bandwidth(folder):
+    """Last measure_write_bandwidth result for the volume holding `folder`, or None."""
+    return _bandwidth_cache.get(volume_id(folder))
+
+def measure_write_bandwidth(folder, total_mb=64, chunk_mb=4):
+    """Sustained MB/s for fsync'd sequential writes into `folder` (uses incompressible data); cached per volume."""
+    folder = existing_parent(folder)
+    chunk = np.random.default_rng().integers(0, 255, size=int(chunk_mb * 1e6), dtype=np.uint8).tobytes()
+    n_chunks = max(1, int(total_mb // chunk_mb))
+    path = os.path.join(folder, f".preflight_{os.getpid()}.tmp")
+    try:
+        t0 = time.perf_counter()
+        with open(path, "wb", buffering=0) as f:
+            for _ in range(n_chunks):
+                f.write(chunk)
+            os.fsync(f.fileno())
+        elapsed = time.perf_counter() - t0
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    mb_s = n_chunks * len(chunk) / elapsed / 1e6
+    _bandwidth_cache[volume_id(folder)] = mb_s
+    return mb_s
+
+class PreflightReport:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+        self.problems = []
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def summary(self):
+        gb, mb = 1e9, 1e6
+        lines = [
+            f"Projected data {self.total_bytes / gb:.2f} GB ({self.total_bursts} bursts x {self.burst_bytes / mb:.0f} MB), "
+            f"{self.free_bytes / gb:.1f} GB free on {self.target}",
+            f"Peak RAM per burst ~{self.peak_ram_bytes / mb:.0f} MB",
+            f"Write rate needed {self.required_mb_s:.0f} MB/s to clear a burst in {self.drain_window_s:.1f} s"
+            + (f", measured {self.measured_mb_s:.0f} MB/s" if self.measured_mb_s else ", not measured"),
+        ]
+        return "\n".join(lines)
+
+def run_preflight(folder, total_bursts, frames_per_burst, frame_bytes, burst_s, wait_s,
+                  measure=True, bench_mb=64, disk_margin=0.95, measured_mb_s=None):
+    """
+    Projected volume vs. free space, peak RAM per burst, and required vs. measured disk
+    bandwidth. A burst must be written within the inter-burst interval (or the whole
+    cycle when the interval is zero) or the writer backlog grows without bound.
+    measured_mb_s skips the benchmark with a figure measured earlier (e.g. on a worker thread).
+    """
+    target = existing_parent(folder)
+    burst_bytes = frames_per_burst * frame_bytes
+    total_bytes = total_bursts * burst_bytes
+    free_bytes = shutil.disk_usage(target).free
+    # collected frames + the stacked uint16 copy made by the writer
+    peak_ram_bytes = 2 * burst_bytes
+    drain_window_s = wait_s if wait_s > 0 else burst_s
+    required_mb_s = burst_bytes / max(drain_window_s, 1e-3) / 1e6
+    if measured_mb_s is None and measure:
+        measured_mb_s = measure_write_bandwidth(target, total_mb=bench_mb)
+
+    report = PreflightReport(
+        target=target, total_bursts=total_bursts, burst_bytes=burst_bytes, total_bytes=total_bytes,
+        free_bytes=free_bytes, peak_ram_bytes=peak_ram_bytes, drain_window_s=drain_window_s,
+        required_mb_s=required_mb_s, measured_mb_s=measured_mb_s,
+    )
+    if total_bytes > free_bytes * disk_margin:
+        report.problems.append(f"session needs {total_bytes / 1e9:.1f} GB but only {free_bytes / 1e9:.1f} GB is free on {target}")
+    if measured_mb_s is not None and required_mb_s > measured_mb_s:
+        report.problems.append(f"disk sustains {measured_mb_s:.0f} MB/s but {required_mb_s:.0f} MB/s is needed between bursts")
+    return report
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure sustained write bandwidth of a folder")
+    parser.add_argument("folder")
+    parser.add_argument("--mb", type=float, default=256)
+    args = parser.parse_args()
+    print(f"{measure_write_bandwidth(args.folder, total_mb=args.mb):.0f} MB/s")
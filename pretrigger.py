@@ -0,0 +1,69 @@
+import time, threading
+import numpy as np
+
+# -------------------- Pre-trigger Ring --------------------
+class PreTriggerRing(threading.Thread):
+    """
+    Lossless FrameBus consumer that copies every frame into a preallocated (n, H, W) ring
+    holding the last `seconds` of the stream. When a burst starts at the TTL, snapshot()
+    copies the baseline window out of the ring, so recording no longer has to start early.
+    """
+
+    def __init__(self, bus, seconds, fps, name="pretrigger"):
+        super().__init__(name=name, daemon=True)
+        self.cursor = bus.subscribe(name, policy="lossless")
+        self.seconds = seconds
+        self.n_slots = max(2, int(np.ceil(seconds * fps)) + 1)
+        self.frames = None                                  # allocated once the frame shape is known
+        self.seqs = np.zeros(self.n_slots, dtype=np.int64)  # 0 = empty slot
+        self.times = np.zeros(self.n_slots, dtype=np.float64)
+        self.last_seq = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def nbytes(self, shape, itemsize=2):
+        return self.n_slots * int(np.prod(shape)) * itemsize
+
+    def run(self):
+        while not self._stop_event.is_set():
+            item = self.cursor.get(timeout=0.05)
+            if item is None:
+                continue
+            seq, ts, frame = item
+            with self._lock:
+                if self.frames is None or self.frames.shape[1:] != frame.shape or self.frames.dtype != frame.dtype:
+                    self.frames = np.empty((self.n_slots,) + frame.shape, dtype=frame.dtype)
+                    self.seqs[:] = 0
+                i = seq % self.n_slots
+                self.frames[i] = frame
+                self.seqs[i] = seq
+                self.times[i] = ts
+                self.last_seq = seq
+        self.cursor.close()
+
+    def snapshot(self, before_seq, window_s, now=None, timeout=0.2):
+        """
+        Copy of the frames with bus sequence < before_seq taken in the last window_s seconds,
+        oldest first, as (frames, seqs, times). Waits up to timeout for the ring to catch up
+        with the bus so there is no gap before before_seq.
+        """
+        now = time.perf_counter() if now is None else now
+        deadline = time.perf_counter() + timeout
+        while self.last_seq < before_seq - 1 and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        with self._lock:
+            if self.frames is None:
+                return None
+            mask = (self.seqs > 0) & (self.seqs < before_seq) & (self.times >= now - window_s)
+            idx = np.flatnonzero(mask)
+            idx = idx[np.argsort(self.seqs[idx])]
+            return self.frames[idx], self.seqs[idx].copy(), self.times[idx].copy()
+
+    @property
+    def dropped(self):
+        return self.cursor.dropped
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
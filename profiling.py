@@ -0,0 +1,132 @@
+import os, sys, json, time, threading
+from collections import defaultdict, Counter
+import numpy as np
+
+# -------------------- Stage Timing --------------------
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "stage", "t0")
+
+    def __init__(self, profiler, stage):
+        self.profiler, self.stage = profiler, stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.samples[self.stage].append(time.perf_counter_ns() - self.t0)
+        return False
+
+class StageProfiler:
+    """
+    Opt-in timing of the acquisition stages. When disabled, span() returns a shared no-op
+    context and start()/stop() return immediately, so the hooks can stay in the hot path.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.samples = defaultdict(list)   # stage -> durations in ns (list.append is thread-safe)
+
+    def reset(self):
+        self.samples = defaultdict(list)
+
+    def span(self, stage):
+        return _Span(self, stage) if self.enabled else _NULL_SPAN
+
+    def start(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage, t0):
+        if t0:
+            self.samples[stage].append(time.perf_counter_ns() - t0)
+
+    def summary(self):
+        """Per-stage count, total and percentiles (ms) plus a log2 histogram of durations in us."""
+        out = {}
+        for stage, values in list(self.samples.items()):
+            if not values:
+                continue
+            us = np.asarray(values, dtype=np.float64) / 1e3
+            edges = 2.0 ** np.arange(0, int(np.ceil(np.log2(max(us.max(), 1.0)))) + 2)
+            counts, _ = np.histogram(us, bins=np.concatenate(([0.0], edges)))
+            out[stage] = {
+                "count": len(us),
+                "total_s": us.sum() / 1e6,
+                "mean_ms": us.mean() / 1e3,
+                "p50_ms": np.percentile(us, 50) / 1e3,
+                "p95_ms": np.percentile(us, 95) / 1e3,
+                "p99_ms": np.percentile(us, 99) / 1e3,
+                "max_ms": us.max() / 1e3,
+                "histogram_us": {f"<{e:g}": int(c) for e, c in zip(edges, counts) if c},
+            }
+        return out
+
+    def format_summary(self, summary=None):
+        summary = summary if summary is not None else self.summary()
+        lines = [f"{'stage':<10}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'total s':>9}  (ms)"]
+        for stage, st in sorted(summary.items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(f"{stage:<10}{st['count']:>8}{st['mean_ms']:9.3f}{st['p50_ms']:9.3f}{st['p95_ms']:9.3f}"
+                         f"{st['p99_ms']:9.3f}{st['max_ms']:9.3f}{st['total_s']:9.2f}")
+        return "\n".join(lines)
+
+    def dump(self, folder, prefix="profile"):
+        summary = self.summary()
+        with open(os.path.join(folder, f"{prefix}_stages.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        text = self.format_summary(summary)
+        with open(os.path.join(folder, f"{prefix}_stages.txt"), "w") as f:
+            f.write(text + "\n")
+        return text
+
+PROFILER = StageProfiler()
+
+# -------------------- Sampling Profiler --------------------
+class SamplingProfiler(threading.Thread):
+    """
+    Samples every Python thread's stack every interval_ms and counts identical stacks.
+    save() writes the folded-stack format ("thread;outer;...;inner count") read by
+    speedscope, flamegraph.pl and inferno.
+    """
+
+    def __init__(self, interval_ms=5.0):
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.interval_s = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
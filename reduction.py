@@ -0,0 +1,152 @@
+import numpy as np
+
+# -------------------- Spatial Binning --------------------
+def bin_frames(frames, factor, mean=False):
+    """
+    N x N spatial binning of a frame (H, W) or stack (..., H, W). Sums accumulate in uint32,
+    so 16-bit data cannot overflow; mean=True divides back to the input dtype. Rows and
+    columns that do not fill a whole bin are cropped.
+    """
+    if factor <= 1:
+        return frames
+    *lead, h, w = frames.shape
+    hb, wb = h // factor, w // factor
+    view = frames[..., :hb * factor, :wb * factor].reshape(*lead, hb, factor, wb, factor)
+    out = view.sum(axis=(-3, -1), dtype=np.uint32)
+    if mean:
+        return (out // (factor * factor)).astype(frames.dtype)
+    return out
+
+def group_sizes(n, k):
+    """Frames in each K-frame group of an n-frame stack; the last group may be shorter."""
+    k = max(1, int(k))
+    return np.minimum(k, n - np.arange(0, n, k))
+
+def sum_frames(stack, k):
+    """K-frame temporal sum of a (T, H, W) stack in uint32; a last group shorter than k is summed as is."""
+    if k <= 1:
+        return stack
+    if not len(stack):
+        return stack.astype(np.uint32)
+    return np.add.reduceat(stack, np.arange(0, len(stack), k), axis=0, dtype=np.uint32)
+
+# -------------------- Reduction Stage --------------------
+class ReductionStage:
+    """
+    Applied by the writer to each burst before it is encoded:
+    crops -> N x N spatial binning -> K-frame temporal sum -> optional rescale.
+
+    crops    list of (x, y, w, h) in frame pixels; each crop is written as its own stack,
+             no crops means the whole frame
+    rescale  None keeps the uint32 sums, "mean" divides by N*N*K back to uint16,
+             a number multiplies the sums and clips to uint16
+
+    A burst that does not fill the last K-frame group keeps it as a shorter sum; its
+    index row records the real frames_summed.
+    """
+
+    def __init__(self, bin_factor=1, temporal_sum=1, crops=None, rescale=None):
+        self.bin_factor = max(1, int(bin_factor))
+        self.temporal_sum = max(1, int(temporal_sum))
+        self.crops = [tuple(int(v) for v in c) for c in (crops or [])]
+        self.rescale = rescale
+        self.frames_in = self.frames_out = 0
+        self.bytes_in = self.bytes_out = 0
+
+    @classmethod
+    def from_settings(cls, settings, frame_shape=None):
+        """None when the settings ask for no reduction at all; ValueError when they do not fit frame_shape."""
+        cfg = settings.get("reduction") or {}
+        try:
+            stage = cls(cfg.get("bin", 1), cfg.get("temporal_sum", 1), cfg.get("crops"), cfg.get("rescale"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"bad reduction settings: {e}")
+        if not stage.active:
+            return None
+        problems = stage.check(frame_shape)
+        if problems:
+            raise ValueError("bad reduction settings: " + "; ".join(problems))
+        return stage
+
+    def check(self, frame_shape=None):
+        """Problems with the rescale setting and, given (H, W), with the crops; empty when usable."""
+        problems = []
+        if self.rescale is not None and self.rescale != "mean":
+            try:
+                float(self.rescale)
+            except (TypeError, ValueError):
+                problems.append(f"rescale must be null, \"mean\" or a number, not {self.rescale!r}")
+        for i, crop in enumerate(self.crops):
+            if len(crop) != 4:
+                problems.append(f"crop {i} must be (x, y, w, h), got {crop}")
+                continue
+            x, y, cw, ch = crop
+            if cw < self.bin_factor or ch < self.bin_factor:
+                problems.append(f"crop {i} {crop} is smaller than one {self.bin_factor}x{self.bin_factor} bin")
+            elif frame_shape is not None:
+                h, w = frame_shape
+                if x < 0 or y < 0 or x + cw > w or y + ch > h:
+                    problems.append(f"crop {i} {crop} is outside the {w}x{h} frame")
+        if not self.crops and frame_shape is not None and min(frame_shape) < self.bin_factor:
+            problems.append(f"{self.bin_factor}x{self.bin_factor} binning is larger than the {frame_shape[1]}x{frame_shape[0]} frame")
+        return problems
+
+    @property
+    def active(self):
+        return self.bin_factor > 1 or self.temporal_sum > 1 or bool(self.crops) or self.rescale is not None
+
+    def _rescale(self, out, n_stack):
+        if self.rescale is None:
+            return out
+        if self.rescale == "mean":
+            n = self.bin_factor * self.bin_factor * group_sizes(n_stack, self.temporal_sum)
+            return (out // n[:, None, None]).astype(np.uint16) if len(out) else out.astype(np.uint16)
+        return np.clip(out * float(self.rescale), 0, 65535).astype(np.uint16)
+
+    def _reduce(self, stack):
+        out = bin_frames(stack, self.bin_factor)
+        out = sum_frames(out, self.temporal_sum)
+        if out is stack and self.rescale is not None:
+            out = stack.astype(np.uint32)
+        return self._rescale(out, len(stack))
+
+    def reduce_index(self, index, n_out, n_in):
+        """Per-frame index of the reduced stack: each output frame keeps the row of its first input frame."""
+        if not index:
+            return index
+        k = self.temporal_sum
+        out = {name: list(values[::k][:n_out]) for name, values in index.items()}
+        if k > 1 and "stim" in index:   # keep the stimulus mark wherever it falls in the group
+            stim = index["stim"]
+            out["stim"] = [int(any(stim[i * k:(i + 1) * k])) for i in range(n_out)]
+        out["frame"] = list(range(n_out))
+        if k > 1:
+            out["frames_summed"] = [int(n) for n in group_sizes(n_in, k)]
+        return out
+
+    def apply(self, stack, index=None):
+        """List of (name suffix, reduced stack, index) for one (T, H, W) burst."""
+        h, w = stack.shape[1:]
+        regions = self.crops or [(0, 0, w, h)]
+        outputs = []
+        for i, (x, y, cw, ch) in enumerate(regions):
+            region = stack[:, y:y + ch, x:x + cw]   # crops are checked against the frame at session start
+            out = self._reduce(region)
+            outputs.append((f"_crop{i}" if self.crops else "", out, self.reduce_index(index, len(out), len(stack))))
+            self.bytes_out += out.nbytes
+        self.frames_out += len(outputs[0][1])   # per stack; every crop has the same frame count
+        self.frames_in += len(stack)
+        self.bytes_in += stack.nbytes
+        return outputs
+
+    def summary(self):
+        ratio = self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+        return {"bin": self.bin_factor, "temporal_sum": self.temporal_sum, "crops": self.crops,
+                "rescale": self.rescale, "frames_in": self.frames_in, "frames_out": self.frames_out,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out, "reduction_factor": ratio}
+
+    def report(self):
+        s = self.summary()
+        return (f"Reduction {s['bin']}x{s['bin']} bin, {s['temporal_sum']}-frame sum, {len(s['crops']) or 'no'} crops: "
+                f"{s['bytes_in'] / 1e6:.0f} MB -> {s['bytes_out'] / 1e6:.0f} MB "
+                f"({s['reduction_factor']:.1f}x less data, {s['frames_in']} -> {s['frames_out']} frames)")
@@ -0,0 +1,68 @@
+import sys, time, argparse
+import numpy as np
+
+# Snap-per-frame (old Workspace.LivePreviewThread) against streaming sequence acquisition
+# with cached dimensions and batch pulls, through the pycromanager bridge. Needs Micro-Manager
+# running with the demo configuration (or a real camera) and the ZMQ server enabled.
+
+def snap_loop(core, seconds):
+    """snap, get_image, get_image_width, get_image_height for every frame."""
+    n = 0
+    per_frame = []
+    t_end = time.perf_counter() + seconds
+    t_start = time.perf_counter()
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        core.snap_image()
+        pixels = core.get_image()
+        w, h = core.get_image_width(), core.get_image_height()
+        np.asarray(pixels, dtype=np.uint16).reshape((h, w))
+        per_frame.append(time.perf_counter() - t0)
+        n += 1
+    return n / (time.perf_counter() - t_start), np.array(per_frame)
+
+def sequence_loop(core, seconds, max_batch=256, poll_ms=10):
+    """Continuous sequence acquisition, dimensions read once, frames popped in batches."""
+    h, w = core.get_image_height(), core.get_image_width()
+    n = 0
+    batches = []
+    core.start_continuous_sequence_acquisition(0)
+    try:
+        t_start = time.perf_counter()
+        t_end = t_start + seconds
+        while time.perf_counter() < t_end:
+            k = min(core.get_remaining_image_count(), max_batch)
+            for _ in range(k):
+                np.asarray(core.pop_next_image(), dtype=np.uint16).reshape((h, w))
+            if k:
+                batches.append(k)
+            n += k
+            time.sleep(poll_ms / 1000.0)
+        elapsed = time.perf_counter() - t_start
+    finally:
+        core.stop_sequence_acquisition()
+    return n / elapsed, np.array(batches or [0])
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snap-loop vs sequence-acquisition fps over the pycromanager bridge")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--exposure", type=float, default=1.0, help="camera exposure in ms")
+    parser.add_argument("--batch", type=int, default=256, help="max frames popped per poll")
+    parser.add_argument("--poll-ms", type=float, default=10, help="sleep between polls (LivePreviewThread interval_ms)")
+    args = parser.parse_args()
+
+    from pycromanager import Core
+    core = Core()
+    core.set_exposure(args.exposure)
+    print(f"{core.get_camera_device()}: {core.get_image_width()}x{core.get_image_height()}, "
+          f"exposure {args.exposure} ms, {args.seconds:.0f} s per mode")
+
+    fps, per_frame = snap_loop(core, args.seconds)
+    print(f"  snap loop      {fps:8.1f} fps   per frame median {np.median(per_frame) * 1e3:.2f} ms"
+          f"  p95 {np.percentile(per_frame, 95) * 1e3:.2f} ms")
+    seq_fps, batches = sequence_loop(core, args.seconds, args.batch, args.poll_ms)
+    print(f"  sequence       {seq_fps:8.1f} fps   frames per pull median {np.median(batches):.0f}"
+          f"  max {batches.max()}")
+    print(f"  speed-up       {seq_fps / fps if fps else float('nan'):8.1f}x")
+    sys.exit(0)
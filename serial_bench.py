@@ -0,0 +1,168 @@
+import os, sys, time, select, threading, argparse
+from queue import Queue, Empty
+import numpy as np
+import serial
+from trigger_protocol import SketchEmulator, pulse_command
+
+BAUD_RATES = [9600, 115200, 250000]   # same choices as the GUI baud_combo
+
+# -------------------- Fake Arduino --------------------
+class FakeArduino:
+    """
+    pty-backed stand-in for the stimulus Arduino (POSIX only).
+    Parses '\n'-terminated commands and answers with frame_trigger.ino's reply timing
+    (trigger_protocol.SketchEmulator): "P,<width_us>" gets "Pulse ended" after the pulse,
+    "A,..." gets "ARMED <n>" and so on. With emulate_baud the replies are delayed by the
+    time the bytes would spend on a real UART (10 bits per byte).
+    """
+
+    def __init__(self, emulate_baud=None):
+        import pty, tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.emulate_baud = emulate_baud
+        self.sketch = SketchEmulator(time.perf_counter())
+        self.running = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def _reply(self, text):
+        data = text.encode()
+        if self.emulate_baud:
+            time.sleep(len(data) * 10.0 / self.emulate_baud)
+        os.write(self.master, data)
+
+    def _run(self):
+        while self.running:
+            nxt = self.sketch.next_due()
+            timeout = 0.1 if nxt is None else max(0.0, nxt - time.perf_counter())
+            try:
+                readable, _, _ = select.select([self.master], [], [], timeout)
+                if readable:
+                    self.sketch.feed(os.read(self.master, 256), time.perf_counter())
+            except (OSError, ValueError):
+                break
+            for line in self.sketch.due(time.perf_counter()):
+                self._reply(line + "\n")
+
+    def stop(self):
+        self.running = False
+        for fd in (self.slave, self.master):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+# -------------------- Reader Designs --------------------
+def measure_polling(ser, n, command=pulse_command(1000), done=b"Pulse ended"):
+    """trigger_Arduino.py style: poll in_waiting with 1 ms sleeps."""
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter_ns()
+        ser.write(command)
+        ser.flush()
+        while True:
+            if ser.in_waiting:
+                line = ser.readline()
+                if done in line:
+                    break
+            else:
+                time.sleep(0.001)
+        out.append(time.perf_counter_ns() - t0)
+    return out
+
+def measure_blocking(ser, n, command=pulse_command(1000), done=b"Pulse ended"):
+    """Blocking readline with a timeout: the OS wakes us when bytes arrive."""
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter_ns()
+        ser.write(command)
+        ser.flush()
+        while done not in ser.readline():
+            pass
+        out.append(time.perf_counter_ns() - t0)
+    return out
+
+def measure_event(ser, n, command=pulse_command(1000), done=b"Pulse ended"):
+    """Dedicated reader thread timestamps lines and hands them over through a queue."""
+    lines = Queue()
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            line = ser.readline()
+            if line:
+                lines.put((time.perf_counter_ns(), line))
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    out = []
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter_ns()
+            ser.write(command)
+            ser.flush()
+            while True:
+                t_rx, line = lines.get(timeout=2.0)
+                if done in line:
+                    break
+            out.append(t_rx - t0)
+    finally:
+        stop.set()
+        t.join(2.0)
+    return out
+
+DESIGNS = {"polling": measure_polling, "blocking": measure_blocking, "event": measure_event}
+
+def summarize(ns):
+    ms = np.asarray(ns, dtype=np.float64) / 1e6
+    return {"n": len(ms), "mean": ms.mean(), "p50": np.percentile(ms, 50), "p95": np.percentile(ms, 95),
+            "p99": np.percentile(ms, 99), "max": ms.max(), "jitter_sd": ms.std()}
+
+def run_benchmark(port=None, bauds=BAUD_RATES, designs=DESIGNS, n=200, emulate_baud=True, pulse_ms=1.0):
+    command = pulse_command(pulse_ms * 1000.0)
+    results = []
+    for baud in bauds:
+        fake = None
+        if port is None:
+            fake = FakeArduino(emulate_baud=baud if emulate_baud else None).start()
+        try:
+            with serial.Serial(port or fake.port, baud, timeout=1) as ser:
+                if port is not None:
+                    time.sleep(2.0)   # real Arduino resets when the port opens
+                ser.reset_input_buffer()
+                for name, fn in designs.items():
+                    fn(ser, 5, command)        # warm-up
+                    ser.reset_input_buffer()
+                    results.append((name, baud, summarize(fn(ser, n, command))))
+        finally:
+            if fake:
+                fake.stop()
+    return results
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial command-to-ack latency benchmark")
+    parser.add_argument("--port", default=None, help="real Arduino port (e.g. COM5); default uses a pty fake")
+    parser.add_argument("-n", type=int, default=200, help="commands per design and baud rate")
+    parser.add_argument("--baud", type=int, nargs="*", default=BAUD_RATES)
+    parser.add_argument("--design", nargs="*", default=list(DESIGNS), choices=list(DESIGNS))
+    parser.add_argument("--no-emulate-baud", action="store_true", help="fake replies without UART transfer delay")
+    parser.add_argument("--pulse-ms", type=float, default=1.0, help="pulse width requested with P,<width_us>")
+    args = parser.parse_args()
+
+    if args.port is None and sys.platform == "win32":
+        sys.exit("The fake Arduino needs a pty; pass --port to benchmark the real device on Windows.")
+
+    target = args.port or "fake Arduino (pty)"
+    print(f"Target: {target}, {args.n} commands each, latency = write('P,{int(args.pulse_ms * 1000)}') -> 'Pulse ended' received")
+    print(f"{'design':<10}{'baud':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'sd':>9}  (ms)")
+    for name, baud, st in run_benchmark(args.port, args.baud, {d: DESIGNS[d] for d in args.design}, args.n,
+                                        emulate_baud=not args.no_emulate_baud, pulse_ms=args.pulse_ms):
+        print(f"{name:<10}{baud:>8}{st['mean']:9.3f}{st['p50']:9.3f}{st['p95']:9.3f}{st['p99']:9.3f}{st['max']:9.3f}{st['jitter_sd']:9.3f}")
@@ -0,0 +1,224 @@
+import time, heapq, threading, itertools
+from collections import deque
+from queue import Queue, Empty
+from trigger_protocol import parse_line, train_command, train_pulses
+
+# -------------------- Serial Manager --------------------
+class Ticket:
+    """Handle for one queued command; done is set when its acknowledgement arrives."""
+
+    def __init__(self, data, expect=None, timeout_s=None):
+        self.data = data
+        self.expect = expect
+        self.timeout_s = timeout_s        # how long to wait for the expected reply once written
+        self.sent_ns = None
+        self.ack_ns = None
+        self.reply = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def latency_ms(self):
+        if self.sent_ns is None or self.ack_ns is None:
+            return None
+        return (self.ack_ns - self.sent_ns) / 1e6
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+class SerialManager(threading.Thread):
+    """
+    Owns the Arduino port for the whole GUI session.
+    Commands are queued (optionally at an absolute perf_counter_ns deadline) and written
+    by this thread only, so concurrent callers cannot interleave bytes. A reader thread
+    turns every reply line into a timestamped event and matches acknowledgements to the
+    oldest pending ticket expecting that kind. Lost connections are reopened automatically.
+    Tickets whose deadline passed by more than late_ms (e.g. while the port was reopening)
+    are not written but failed with a "missed" event, and expected replies that do not come
+    within the ticket's timeout fail with a "timeout" event.
+    """
+
+    def __init__(self, port, baud, on_event=None, reconnect_s=1.0, settle_s=2.0, serial_factory=None,
+                 late_ms=5.0, reply_timeout_s=2.0):
+        super().__init__(name="serial-manager", daemon=True)
+        self.port = port
+        self.baud = int(baud)
+        self.on_event = on_event
+        self.reconnect_s = reconnect_s
+        self.settle_s = settle_s              # Arduino resets when the port is opened
+        self.serial_factory = serial_factory
+        self.late_ns = int(late_ms * 1e6)
+        self.reply_timeout_s = reply_timeout_s
+        self.ser = None
+        self.running = False
+        self._queue = Queue()
+        self._heap = []
+        self._counter = itertools.count()
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._reader = None
+        self.connected = threading.Event()
+
+    # ---- public API ----
+    @property
+    def is_open(self):
+        return self.connected.is_set()
+
+    def send(self, data, expect=None, at_ns=None, timeout_s=None):
+        """Queue raw bytes. expect is a parse_line kind ("pulse_ended", "armed", "done") to wait for."""
+        ticket = Ticket(data, expect, self.reply_timeout_s if timeout_s is None else timeout_s)
+        self._queue.put((at_ns, ticket))
+        return ticket
+
+    def send_train(self, frequency_hz, duration_ms, pulse_ms=1.0, start_ns=None):
+        """Queue one train command; the Arduino times the pulses and their width itself."""
+        self.send(train_command(frequency_hz, duration_ms, pulse_ms * 1000.0), expect="pulse_ended", at_ns=start_ns,
+                  timeout_s=duration_ms / 1000.0 + self.reply_timeout_s)
+        return train_pulses(frequency_hz, duration_ms)
+
+    def close(self, timeout=2.0):
+        self.running = False
+        self._queue.put((None, None))
+        if self.is_alive():
+            self.join(timeout)
+
+    # ---- internals ----
+    def _emit(self, kind, values=None, text=""):
+        if self.on_event:
+            try:
+                self.on_event({"t_ns": time.perf_counter_ns(), "wall": time.time(), "kind": kind,
+                               "values": values or {}, "text": text})
+            except Exception:
+                pass
+
+    def _open(self):
+        if self.serial_factory is not None:
+            ser = self.serial_factory(self.port, self.baud)
+        else:
+            import serial
+            ser = serial.Serial(self.port, self.baud, timeout=0.1, write_timeout=1.0)
+        time.sleep(self.settle_s)
+        ser.reset_input_buffer()
+        self.ser = ser
+        self.connected.set()
+        self._reader = threading.Thread(target=self._read_loop, args=(ser,), name="serial-reader", daemon=True)
+        self._reader.start()
+        self._emit("connected", {"port": self.port, "baud": self.baud})
+
+    def _drop(self, error):
+        if self.ser is None:
+            return
+        self.connected.clear()
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        self.ser = None
+        with self._pending_lock:
+            while self._pending:
+                t = self._pending.popleft()
+                t.error = str(error)
+                t.done.set()
+        self._emit("disconnected", {"error": str(error)})
+
+    def _read_loop(self, ser):
+        while self.running and ser is self.ser:
+            try:
+                raw = ser.readline()
+            except Exception as e:
+                self._drop(e)
+                return
+            if not raw:
+                continue
+            t_ns = time.perf_counter_ns()
+            line = raw.decode(errors="replace").strip()
+            kind, values = parse_line(line)
+            with self._pending_lock:
+                for t in self._pending:
+                    if t.expect == kind:
+                        self._pending.remove(t)
+                        t.ack_ns, t.reply = t_ns, line
+                        t.done.set()
+                        values = dict(values, latency_ms=t.latency_ms)
+                        break
+            self._emit(kind, values, line)
+
+    def _fail(self, ticket, kind, error, **values):
+        ticket.error = error
+        ticket.done.set()
+        self._emit(kind, dict(values, error=error), ticket.data.decode(errors="replace").strip())
+
+    def _expire_pending(self, now):
+        with self._pending_lock:
+            expired = [t for t in self._pending if t.timeout_s is not None and now - t.sent_ns > t.timeout_s * 1e9]
+            for t in expired:
+                self._pending.remove(t)
+        for t in expired:
+            self._fail(t, "timeout", f"no '{t.expect}' reply within {t.timeout_s:g} s", expect=t.expect)
+
+    def _write(self, ticket):
+        try:
+            if ticket.expect:
+                with self._pending_lock:
+                    self._pending.append(ticket)
+            ticket.sent_ns = time.perf_counter_ns()
+            self.ser.write(ticket.data)
+            self.ser.flush()
+            self._emit("tx", {"sent_ns": ticket.sent_ns}, ticket.data.decode(errors="replace").strip())
+            if not ticket.expect:
+                ticket.done.set()
+        except Exception as e:
+            ticket.error = str(e)
+            ticket.done.set()
+            self._drop(e)
+
+    def run(self):
+        self.running = True
+        while self.running:
+            if self.ser is None:
+                try:
+                    self._open()
+                except Exception as e:
+                    self._emit("error", {"error": str(e)})
+                    time.sleep(self.reconnect_s)
+                    continue
+
+            # next deadline decides how long to wait for new commands
+            timeout = 0.05
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - time.perf_counter_ns()) / 1e9)
+                if timeout < 0.002:
+                    timeout = 0.0   # spin for the last ms; timed waits are too coarse on Windows
+            try:
+                at_ns, ticket = self._queue.get(timeout=timeout)
+                if ticket is None:
+                    break
+                heapq.heappush(self._heap, (at_ns or 0, next(self._counter), ticket))
+                while True:   # pull everything already queued
+                    at_ns, ticket = self._queue.get_nowait()
+                    if ticket is None:
+                        self.running = False
+                        break
+                    heapq.heappush(self._heap, (at_ns or 0, next(self._counter), ticket))
+            except Empty:
+                pass
+
+            now = time.perf_counter_ns()
+            while self._heap and self._heap[0][0] <= now and self.ser is not None:
+                at_ns, _, ticket = heapq.heappop(self._heap)
+                late_ns = now - at_ns if at_ns else 0
+                if late_ns > self.late_ns:
+                    # deadline passed while the port was busy or reopening: firing now would be wrong
+                    self._fail(ticket, "missed", f"missed deadline by {late_ns / 1e6:.1f} ms", late_ms=late_ns / 1e6)
+                else:
+                    self._write(ticket)
+            self._expire_pending(time.perf_counter_ns())
+
+        self.running = False
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+        self.connected.clear()
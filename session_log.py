@@ -0,0 +1,118 @@
+import json, time, threading
+from collections import deque
+from queue import Queue, Empty
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+LEVELS = {"red": "error", "orange": "warning"}
+
+# -------------------- Log Model --------------------
+class LogModel(QAbstractListModel):
+    """Capped list of (timestamp, message, color) rows for a QListView; the oldest rows fall off."""
+
+    def __init__(self, max_lines=2000, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.rows = deque()
+        self._colors = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        ts, msg, color = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{ts} - {msg}"
+        if role == Qt.ForegroundRole:
+            if color not in self._colors:
+                self._colors[color] = QColor(color)
+            return self._colors[color]
+        return None
+
+    def append_batch(self, entries):
+        """One insert (and at most one removal) per call, however many entries arrive."""
+        lines = [(ts, line, color) for ts, msg, color in entries
+                 for line in str(msg).replace("<br>", "\n").split("\n")]
+        if not lines:
+            return
+        lines = lines[-self.max_lines:]
+        overflow = len(self.rows) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.rows.popleft()
+            self.endRemoveRows()
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.rows.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows.clear()
+        self.endResetModel()
+
+# -------------------- JSON Lines Writer --------------------
+class JsonlLogWriter(threading.Thread):
+    """
+    Appends every log entry as one JSON object per line to the current session file.
+    The GUI hands over whole batches; encoding and disk I/O stay on this thread.
+    """
+
+    def __init__(self, path=None, flush_s=1.0):
+        super().__init__(name="session-log", daemon=True)
+        self.queue = Queue()
+        self.flush_s = flush_s
+        self.path = None
+        self._file = None
+        self.running = True
+        if path:
+            self.set_path(path)
+
+    def set_path(self, path):
+        """Switch to a new log file (None closes the current one)."""
+        self.queue.put(("path", path))
+
+    def put_batch(self, entries, logged=None):
+        self.queue.put(("entries", (logged or time.time(), entries)))
+
+    def _open(self, path):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self.path = path
+        if path:
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, logged, entries):
+        if self._file is None:
+            return
+        for ts, msg, color in entries:
+            record = {"logged": round(logged, 3), "time": ts, "level": LEVELS.get(color, "info"),
+                      "color": color, "msg": str(msg).replace("<br>", "\n")}
+            self._file.write(json.dumps(record) + "\n")
+
+    def run(self):
+        last_flush = time.time()
+        while self.running or not self.queue.empty():
+            try:
+                kind, payload = self.queue.get(timeout=self.flush_s)
+                if kind == "path":
+                    self._open(payload)
+                elif kind == "entries":
+                    self._write(*payload)
+            except Empty:
+                pass
+            except Exception as e:
+                print(f"[session log] {e}")
+            if self._file and time.time() - last_flush >= self.flush_s:
+                self._file.flush()
+                last_flush = time.time()
+        self._open(None)
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self.join(timeout)
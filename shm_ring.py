@@ -0,0 +1,393 @@
+import os, time, threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from queue import Empty
+import numpy as np
+
+# -------------------- Shared Frame Ring --------------------
+# Header fields (int64) at the start of the shared block
+H_WRITE_SEQ, H_HEARTBEAT, H_STATE, H_HEIGHT, H_WIDTH, H_SLOTS, H_PID, H_ERROR = range(8)
+HEADER_LEN = 16
+
+STATE_INIT, STATE_RUNNING, STATE_STOPPED, STATE_ERROR = 0, 1, 2, 3
+
+class SharedFrameRing:
+    """
+    Single-producer ring of uint16 frames in one multiprocessing.shared_memory block.
+    Layout: header[16] | slot_seq[n] | slot_ts[n] | frames[n, H, W].
+    Sequence numbers start at 1; slot_seq is set to -1 while a slot is being written,
+    so readers can detect torn or overwritten frames (seqlock style).
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        n, h, w = int(header[H_SLOTS]), int(header[H_HEIGHT]), int(header[H_WIDTH])
+        self.header = header
+        self.n_slots = n
+        self.shape = (h, w)
+        offset = HEADER_LEN * 8
+        self.slot_seq = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += n * 8
+        self.slot_ts = np.ndarray((n,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += n * 8
+        self.frames = np.ndarray((n, h, w), dtype=np.uint16, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, n_slots, shape, name=None):
+        h, w = int(shape[0]), int(shape[1])
+        size = HEADER_LEN * 8 + n_slots * 16 + n_slots * h * w * 2
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[H_HEIGHT], header[H_WIDTH], header[H_SLOTS] = h, w, n_slots
+        ring = cls(shm, owner=True)
+        ring.slot_seq[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # ---- producer ----
+    def write(self, frame, ts_ns=None):
+        seq = int(self.header[H_WRITE_SEQ]) + 1
+        slot = seq % self.n_slots
+        self.slot_seq[slot] = -1
+        self.frames[slot] = frame
+        self.slot_ts[slot] = ts_ns if ts_ns is not None else time.perf_counter_ns()
+        self.slot_seq[slot] = seq
+        self.header[H_WRITE_SEQ] = seq
+        return seq
+
+    def beat(self, state=None):
+        self.header[H_HEARTBEAT] = time.monotonic_ns()
+        if state is not None:
+            self.header[H_STATE] = state
+
+    # ---- consumers ----
+    def latest_seq(self):
+        return int(self.header[H_WRITE_SEQ])
+
+    def state(self):
+        return int(self.header[H_STATE])
+
+    def heartbeat_age_s(self):
+        hb = int(self.header[H_HEARTBEAT])
+        return float("inf") if hb == 0 else (time.monotonic_ns() - hb) / 1e9
+
+    def get(self, seq):
+        """Zero-copy view of frame `seq`, or None if it is not written yet or already overwritten."""
+        slot = seq % self.n_slots
+        if self.slot_seq[slot] != seq:
+            return None, 0
+        return self.frames[slot], int(self.slot_ts[slot])
+
+    def still_valid(self, seq):
+        """Call after using a view from get(): False means the producer lapped the reader meanwhile."""
+        return self.slot_seq[seq % self.n_slots] == seq
+
+    def close(self):
+        # drop numpy views before closing the mapping
+        self.header = self.slot_seq = self.slot_ts = self.frames = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class RingReader:
+    """Per-consumer cursor. policy="lossless" walks every sequence number, "latest" jumps to the newest."""
+
+    def __init__(self, ring, policy="lossless", start_seq=None):
+        if policy not in ("lossless", "latest"):
+            raise ValueError(f"Unknown read policy: {policy}")
+        self.ring = ring
+        self.policy = policy
+        self.next_seq = (ring.latest_seq() + 1) if start_seq is None else int(start_seq)
+        self.dropped = 0
+        self.read = 0
+
+    def poll(self):
+        """Return (seq, ts_ns, view) or None when nothing new is available."""
+        latest = self.ring.latest_seq()
+        if latest < self.next_seq:
+            return None
+        if self.policy == "latest":
+            if latest > self.next_seq:
+                self.dropped += latest - self.next_seq
+            self.next_seq = latest
+        oldest = latest - self.ring.n_slots + 1
+        if self.next_seq < oldest:
+            self.dropped += oldest - self.next_seq
+            self.next_seq = oldest
+        seq = self.next_seq
+        view, ts = self.ring.get(seq)
+        if view is None:
+            # overwritten between the check and the read; skip ahead on the next poll
+            self.dropped += 1
+            self.next_seq += 1
+            return None
+        self.next_seq += 1
+        self.read += 1
+        return seq, ts, view
+
+    def next(self, timeout=1.0, poll_s=0.0005):
+        deadline = time.monotonic() + timeout
+        while True:
+            item = self.poll()
+            if item is not None or time.monotonic() >= deadline:
+                return item
+            time.sleep(poll_s)
+
+# -------------------- Acquisition Process --------------------
+def _apply_command(core, cmd, reply_queue=None):
+    name, args = cmd[0], cmd[1]
+    token = cmd[2] if len(cmd) > 2 else None
+    if token is None:
+        if core is not None:
+            getattr(core, name)(*args)
+        return
+    # call(): the GUI waits for the result, so a failure is returned instead of stopping acquisition
+    try:
+        result = getattr(core, name)(*args) if core is not None else None
+        reply_queue.put((token, True, result))
+    except Exception as e:
+        reply_queue.put((token, False, f"{type(e).__name__}: {e}"))
+
+def _synthetic_source(shape, fps):
+    rng = np.random.default_rng(0)
+    bank = rng.integers(100, 4000, size=(8, *shape), dtype=np.uint16)
+    period = 1.0 / fps
+    t_next = time.perf_counter()
+    i = 0
+    while True:
+        now = time.perf_counter()
+        if now < t_next:
+            yield None
+            continue
+        t_next += period
+        i += 1
+        yield bank[i % len(bank)]
+
+def acquisition_main(ring_name, cfg_path, setup, cmd_queue, stop_event, error_queue=None, reply_queue=None):
+    """
+    Entry point of the acquisition process. Owns the core (or a synthetic source when
+    cfg_path is None), drains every frame into the shared ring and services property
+    commands sent from the GUI process. A failure sets STATE_ERROR and its message goes
+    back through error_queue; results of call() go back through reply_queue.
+    """
+    ring = SharedFrameRing.attach(ring_name)
+    ring.header[H_PID] = os.getpid()
+    core = None
+    try:
+        if cfg_path:
+            from pymmcore_plus import CMMCorePlus
+            core = CMMCorePlus()
+            core.loadSystemConfiguration(cfg_path)
+            cam = core.getCameraDevice()
+            roi = setup.get("roi")
+            if roi:
+                core.setROI(*roi)
+            if setup.get("exposure") is not None:
+                core.setExposure(setup["exposure"])
+            for prop, value in setup.get("properties", {}).items():
+                try:
+                    core.setProperty(cam, prop, value)
+                except Exception:
+                    pass
+            if (core.getImageHeight(), core.getImageWidth()) != ring.shape:
+                raise RuntimeError(f"camera frame {core.getImageHeight()}x{core.getImageWidth()} does not match ring {ring.shape}")
+            core.startContinuousSequenceAcquisition(0)
+            source = None
+        else:
+            source = _synthetic_source(ring.shape, setup.get("fps", 30))
+
+        ring.beat(STATE_RUNNING)
+        while not stop_event.is_set():
+            try:
+                while True:
+                    _apply_command(core, cmd_queue.get_nowait(), reply_queue)
+            except Empty:
+                pass
+
+            got = 0
+            if core is not None:
+                while core.getRemainingImageCount() > 0:
+                    ring.write(core.popNextImage())
+                    got += 1
+            else:
+                frame = next(source)
+                if frame is not None:
+                    ring.write(frame)
+                    got = 1
+            ring.beat()
+            if not got:
+                time.sleep(0.0005)
+        ring.beat(STATE_STOPPED)
+    except Exception as e:
+        ring.header[H_ERROR] = 1
+        if error_queue is not None:
+            error_queue.put(f"{type(e).__name__}: {e}")
+        ring.beat(STATE_ERROR)
+    finally:
+        if core is not None:
+            try:
+                core.stopSequenceAcquisition()
+                core.reset()
+            except Exception:
+                pass
+        ring.close()
+
+class AcquisitionProcess:
+    """
+    GUI-side handle of the acquisition process. Creates the ring, starts the child,
+    forwards core property changes and detects crashes through exit code and heartbeat.
+    """
+
+    def __init__(self, cfg_path=None, shape=(600, 600), n_slots=512, setup=None, heartbeat_timeout_s=2.0):
+        self.cfg_path = cfg_path
+        self.setup = dict(setup or {})
+        self.heartbeat_timeout_s = heartbeat_timeout_s
+        self.ring = SharedFrameRing.create(n_slots, shape)
+        ctx = mp.get_context("spawn")   # same behaviour on Windows and Linux
+        self.cmd_queue = ctx.Queue()
+        self.error_queue = ctx.Queue()
+        self.reply_queue = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.last_error = None
+        self.call_lock = threading.Lock()
+        self.next_token = 0
+        self.process = ctx.Process(target=acquisition_main, name="acquisition",
+                                   args=(self.ring.name, cfg_path, self.setup, self.cmd_queue, self.stop_event,
+                                         self.error_queue, self.reply_queue),
+                                   daemon=True)
+
+    def start(self, timeout=30.0):
+        self.process.start()
+        deadline = time.monotonic() + timeout
+        while self.ring.state() == STATE_INIT:
+            if not self.process.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Acquisition process failed to start: {self.error() or 'no error reported'}")
+            time.sleep(0.01)
+        if self.ring.state() == STATE_ERROR:
+            raise RuntimeError(f"Acquisition process reported an error during setup: {self.error(timeout=1.0)}")
+
+    def reader(self, policy="lossless"):
+        return RingReader(self.ring, policy=policy)
+
+    def send(self, name, *args):
+        """Forward a core call, e.g. send("setProperty", cam, "ClearMode", "Never")."""
+        self.cmd_queue.put((name, args))
+
+    def call(self, name, *args, timeout=5.0):
+        """Like send(), but waits for the core's return value; a core error is raised as RuntimeError."""
+        with self.call_lock:
+            self.next_token += 1
+            token = self.next_token
+            self.cmd_queue.put((name, args, token))
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.process.is_alive():
+                    raise RuntimeError(f"Acquisition process did not answer {name}: {self.error() or 'timed out'}")
+                try:
+                    reply_token, ok, result = self.reply_queue.get(timeout=min(remaining, 0.1))
+                except Empty:
+                    continue
+                if reply_token != token:
+                    continue      # late answer to a call that already timed out
+                if not ok:
+                    raise RuntimeError(result)
+                return result
+
+    def error(self, timeout=0.0):
+        """Message of the failure reported by the acquisition process, None while there is none."""
+        try:
+            self.last_error = self.error_queue.get(timeout=timeout) if timeout else self.error_queue.get_nowait()
+        except Empty:
+            pass
+        return self.last_error
+
+    def crashed(self):
+        if self.ring.state() == STATE_ERROR:
+            return True
+        if not self.process.is_alive():
+            return self.process.exitcode not in (0, None) or self.ring.state() != STATE_STOPPED
+        return self.ring.heartbeat_age_s() > self.heartbeat_timeout_s
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+        self.ring.close()
+
+class ProcessCore:
+    """
+    Stand-in for CMMCorePlus on the GUI side when acquisition runs in AcquisitionProcess.
+    Core calls (setProperty, setExposure, start/stopSequenceAcquisition, ...) are forwarded
+    through the process command queue; frames come out of the shared ring through a
+    lossless RingReader, so the GUI never touches the camera itself.
+    """
+
+    def __init__(self, acq, timeout=5.0):
+        self.acq = acq
+        self.timeout = timeout
+        self.reader = acq.reader("lossless")
+        self.last_ts_ns = 0
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args: self.acq.call(name, *args, timeout=self.timeout)
+
+    # ---- answered locally: the ring shape is fixed for the life of the process ----
+    def getImageHeight(self):
+        return self.acq.ring.shape[0]
+
+    def getImageWidth(self):
+        return self.acq.ring.shape[1]
+
+    def getBytesPerPixel(self):
+        return 2
+
+    def setROI(self, x, y, w, h):
+        if (int(h), int(w)) != self.acq.ring.shape:
+            raise RuntimeError(f"ROI {w}x{h} does not match the acquisition ring {self.acq.ring.shape[1]}x{self.acq.ring.shape[0]}")
+        self.acq.call("setROI", x, y, w, h, timeout=self.timeout)
+
+    def getRemainingImageCount(self):
+        return max(0, self.acq.ring.latest_seq() - self.reader.next_seq + 1)
+
+    def pop_frame(self):
+        """(frame copy, ts_ns) of the next ring frame, or None; frames the producer lapped are counted as dropped."""
+        while True:
+            item = self.reader.poll()
+            if item is None:
+                return None
+            seq, ts_ns, view = item
+            frame = np.array(view, copy=True)
+            if self.acq.ring.still_valid(seq):
+                self.last_ts_ns = ts_ns
+                return frame, ts_ns
+            self.reader.dropped += 1
+
+    def popNextImage(self):
+        item = self.pop_frame()
+        if item is None:
+            raise RuntimeError("Acquisition ring is empty")
+        return item[0]
+
+    def reset(self):
+        self.acq.stop()
@@ -0,0 +1,70 @@
+import os, sys, time, argparse, subprocess
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# -------------------- Startup Benchmark --------------------
+def run_once(script="Calcium_Imaging.py", synthetic=True, timeout=60.0):
+    """
+    Launch the GUI in a fresh interpreter and return seconds from launch to each startup
+    mark it prints ("window", "core_loaded", "first_frame"). The GUI quits after the first frame.
+    """
+    env = dict(os.environ, CALCIUM_STARTUP_BENCH="1")
+    if synthetic:
+        env["CALCIUM_SYNTHETIC_CORE"] = "1"
+    t0 = time.time()
+    proc = subprocess.Popen([sys.executable, script], cwd=HERE, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True)
+    marks = {}
+    try:
+        deadline = t0 + timeout
+        for line in proc.stdout:
+            if line.startswith("STARTUP "):
+                _, name, wall = line.split()
+                marks[name] = float(wall) - t0
+                if name == "first_frame":
+                    break
+            if time.time() > deadline:
+                break
+        proc.wait(timeout=max(deadline - time.time(), 1.0))
+    except subprocess.TimeoutExpired:
+        pass
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return marks
+
+def import_times(module="Calcium_Imaging", top=10):
+    """Slowest imports (cumulative us) reported by python -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=HERE,
+                         stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first window and first live frame of the GUI")
+    parser.add_argument("-n", type=int, default=5, help="launches to average")
+    parser.add_argument("--real-core", action="store_true", help="load the real camera config instead of the synthetic camera")
+    parser.add_argument("--imports", action="store_true", help="also list the slowest module imports")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    runs = [run_once(synthetic=not args.real_core, timeout=args.timeout) for _ in range(args.n)]
+    print(f"{args.n} launches ({'real' if args.real_core else 'synthetic'} core), seconds from process start:")
+    for name in ("window", "core_loaded", "first_frame"):
+        values = np.array([r[name] for r in runs if name in r])
+        if len(values):
+            print(f"  {name:<12} median {np.median(values):.3f}  min {values.min():.3f}  max {values.max():.3f}"
+                  f"  ({len(values)}/{args.n})")
+        else:
+            print(f"  {name:<12} not reached")
+    if args.imports:
+        print("Slowest imports (cumulative ms):")
+        for cum_us, name in import_times():
+            print(f"  {cum_us / 1000:8.1f}  {name}")
@@ -0,0 +1,122 @@
+import os, json, csv
+import numpy as np
+
+# -------------------- Stimulation Protocols --------------------
+# A protocol file (JSON, or YAML when PyYAML is installed) looks like:
+#
+#   {
+#     "name": "frequency_response",
+#     "seed": 42,
+#     "defaults": {"burst_duration_s": 2.0, "wait_interval_s": 8.0, "trigger_time_ms": 1000,
+#                  "ttl_frequency_hz": 40, "ttl_duration_ms": 300, "ttl_mode": "Train"},
+#     "blocks": [
+#       {"repeats": 3, "randomize": true,
+#        "bursts": [{"ttl_frequency_hz": 10}, {"ttl_frequency_hz": 20}, {"ttl_frequency_hz": 40}]},
+#       {"bursts": [{"ttl_mode": "Single Pulse", "repeats": 5}]}
+#     ]
+#   }
+#
+# compile_protocol() expands repeats and seeded shuffles ahead of time into a flat table
+# with one row per burst and its start time on the session clock.
+
+BURST_FIELDS = ("burst_duration_s", "wait_interval_s", "trigger_time_ms", "ttl_frequency_hz", "ttl_duration_ms", "ttl_mode")
+
+SCHEDULE_DTYPE = np.dtype([
+    ("burst", "i4"),
+    ("block", "i4"),
+    ("condition", "i4"),
+    ("t_start_s", "f8"),
+    ("burst_duration_s", "f8"),
+    ("wait_interval_s", "f8"),
+    ("trigger_time_ms", "f8"),
+    ("ttl_frequency_hz", "f8"),
+    ("ttl_duration_ms", "f8"),
+    ("ttl_mode", "U16"),
+])
+
+DEFAULTS = {"burst_duration_s": 2.0, "wait_interval_s": 8.0, "trigger_time_ms": 1000.0,
+            "ttl_frequency_hz": 40.0, "ttl_duration_ms": 300.0, "ttl_mode": "Train"}
+
+def load_protocol(path):
+    with open(path, "r") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def compile_protocol(protocol, base=None):
+    """Expand a protocol dict into a SCHEDULE_DTYPE table. `base` supplies GUI defaults."""
+    defaults = dict(DEFAULTS)
+    defaults.update(base or {})
+    defaults.update(protocol.get("defaults", {}))
+    rng = np.random.default_rng(protocol.get("seed"))
+
+    conditions = {}
+    rows = []
+    for b, block in enumerate(protocol.get("blocks", [])):
+        specs = []
+        for spec in block.get("bursts", []):
+            unknown = set(spec) - set(BURST_FIELDS) - {"repeats"}
+            if unknown:
+                raise ValueError(f"Unknown burst field(s) in block {b}: {sorted(unknown)}")
+            params = {k: spec.get(k, defaults[k]) for k in BURST_FIELDS}
+            specs.extend([params] * int(spec.get("repeats", 1)))
+        for _ in range(int(block.get("repeats", 1))):
+            order = rng.permutation(len(specs)) if block.get("randomize") else range(len(specs))
+            for i in order:
+                params = specs[i]
+                key = tuple(params[k] for k in BURST_FIELDS)
+                rows.append((b, conditions.setdefault(key, len(conditions)), params))
+
+    table = np.zeros(len(rows), dtype=SCHEDULE_DTYPE)
+    t = 0.0
+    for i, (block, cond, params) in enumerate(rows):
+        table[i] = (i + 1, block, cond, t, params["burst_duration_s"], params["wait_interval_s"], params["trigger_time_ms"],
+                    params["ttl_frequency_hz"], params["ttl_duration_ms"], params["ttl_mode"])
+        t += float(params["burst_duration_s"]) + float(params["wait_interval_s"])
+    bad = table[table["trigger_time_ms"] > table["burst_duration_s"] * 1000.0]
+    if len(bad):
+        raise ValueError(f"Burst {int(bad['burst'][0])}: trigger time is after the end of the burst")
+    return table
+
+def uniform_schedule(total_s, **params):
+    """Schedule for the classic single-condition session driven by the GUI spin boxes."""
+    p = dict(DEFAULTS)
+    p.update(params)
+    n = int(total_s / (p["burst_duration_s"] + p["wait_interval_s"]))
+    return compile_protocol({"blocks": [{"repeats": n, "bursts": [{}]}]}, base=p)
+
+def schedule_duration_s(table):
+    if not len(table):
+        return 0.0
+    last = table[-1]
+    return float(last["t_start_s"] + last["burst_duration_s"])
+
+def save_schedule(path, table):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(table.dtype.names)
+        writer.writerows(table.tolist())
+
+def load_schedule(path):
+    with open(path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    table = np.zeros(len(rows), dtype=SCHEDULE_DTYPE)
+    for name in SCHEDULE_DTYPE.names:
+        table[name] = [r[name] for r in rows]
+    return table
+
+# -------------------- Main --------------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a stimulation protocol into a burst schedule")
+    parser.add_argument("protocol")
+    parser.add_argument("-o", "--out", default=None)
+    args = parser.parse_args()
+
+    table = compile_protocol(load_protocol(args.protocol))
+    out = args.out or os.path.splitext(args.protocol)[0] + "_schedule.csv"
+    save_schedule(out, table)
+    print(f"{len(table)} bursts, {len(np.unique(table['condition']))} conditions, "
+          f"{schedule_duration_s(table) / 60:.1f} min -> {out}")
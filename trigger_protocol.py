@@ -0,0 +1,141 @@
+import math
+
+# -------------------- Arduino Frame-Trigger Protocol --------------------
+# Matches arduino/frame_trigger/frame_trigger.ino
+
+def arm_command(fps, n_frames, stim_frame, stim_hz=0, stim_ms=0, pulse_us=100):
+    """One message configuring both the camera triggers and the stimulus placement."""
+    return f"A,{float(fps):g},{int(n_frames)},{int(stim_frame)},{float(stim_hz):g},{float(stim_ms):g},{int(pulse_us)}\n".encode()
+
+ABORT_COMMAND = b"X\n"
+
+def pulse_command(width_us=1000):
+    """Single stimulus pulse of width_us, timed on the board; answered with "Pulse ended"."""
+    return f"P,{int(width_us)}\n".encode()
+
+def train_command(freq_hz, duration_ms, width_us=1000):
+    """Stimulus train timed on the board; "Pulse ended" follows the last pulse."""
+    return f"T,{float(freq_hz):g},{float(duration_ms):g},{int(width_us)}\n".encode()
+
+def burst_trigger_plan(fps, burst_s, ttl_delay_ms, mode="Train", ttl_freq=40, ttl_duration_ms=300, pulse_us=100):
+    """Translate the GUI burst/TTL settings into frame counts and the stimulus frame index."""
+    n_frames = int(math.ceil(burst_s * fps))
+    stim_frame = int(round(ttl_delay_ms / 1000.0 * fps))
+    stim_frame = min(max(stim_frame, 0), max(n_frames - 1, 0))
+    stim_hz = 0 if mode == "Single Pulse" else ttl_freq
+    stim_ms = 0 if mode == "Single Pulse" else ttl_duration_ms
+    return {
+        "n_frames": n_frames,
+        "stim_frame": stim_frame,
+        "command": arm_command(fps, n_frames, stim_frame, stim_hz, stim_ms, pulse_us),
+    }
+
+def parse_line(line):
+    """
+    Parse one reply line into (kind, values):
+      "ARMED 60"      -> ("armed", {"n_frames": 60})
+      "S 30 123456"   -> ("stim", {"frame": 30, "micros": 123456})
+      "D 60 234567"   -> ("done", {"frames": 60, "micros": 234567})
+      "Pulse ended"   -> ("pulse_ended", {})
+    Anything else is returned as ("text", {"text": line}).
+    """
+    line = line.strip()
+    parts = line.split()
+    try:
+        if parts and parts[0] == "ARMED":
+            return "armed", {"n_frames": int(parts[1])}
+        if parts and parts[0] == "S":
+            return "stim", {"frame": int(parts[1]), "micros": int(parts[2])}
+        if parts and parts[0] == "D":
+            return "done", {"frames": int(parts[1]), "micros": int(parts[2])}
+    except (IndexError, ValueError):
+        pass
+    if line == "Pulse ended":
+        return "pulse_ended", {}
+    return "text", {"text": line}
+
+def train_pulses(freq_hz, duration_ms):
+    """Pulses the sketch fires for a T command: one every period while inside the duration."""
+    return max(1, int(math.ceil(duration_ms / 1000.0 * freq_hz - 1e-9))) if freq_hz > 0 else 0
+
+# -------------------- Sketch Emulator --------------------
+class SketchEmulator:
+    """
+    Reply timing of frame_trigger.ino for the fake serial ports (dry_run, serial_bench).
+    feed() takes the written bytes; only complete '\\n'-terminated lines are acted on, like
+    the sketch. due() pops the reply lines whose time has come, next_due() is the time of
+    the next one. Times are seconds on the caller's clock.
+    """
+
+    def __init__(self, now=0.0):
+        self.t0 = now
+        self._buf = b""
+        self._replies = []        # [(due, tag, line)]; tag lets X cancel a burst or train
+        self.armed = None         # (start, fps, n_frames) while a burst runs
+        self.train_end = None
+
+    def _micros(self, t):
+        return int((t - self.t0) * 1e6)
+
+    def _schedule(self, t, line, tag=None):
+        self._replies.append((t, tag, line))
+        self._replies.sort(key=lambda r: r[0])
+
+    def _cancel(self, tag):
+        self._replies = [r for r in self._replies if r[1] != tag]
+
+    def feed(self, data, now):
+        self._buf += data
+        while b"\n" in self._buf:
+            line, self._buf = self._buf.split(b"\n", 1)
+            self.command(line.decode(errors="replace").strip(), now)
+
+    def command(self, line, now):
+        if self.armed is not None and now >= self.armed[0] + self.armed[2] / self.armed[1]:
+            self.armed = None
+        if self.train_end is not None and now >= self.train_end:
+            self.train_end = None
+        try:
+            if line == "H":
+                self._schedule(now + 0.001, "Pulse ended")
+            elif line.startswith("P,"):
+                self._schedule(now + float(line[2:]) / 1e6, "Pulse ended")
+            elif line.startswith("T,"):
+                freq, duration_ms, width_us = (float(x) for x in line.split(",")[1:4])
+                if self.armed is not None or freq <= 0:
+                    return
+                self.train_end = now + (train_pulses(freq, duration_ms) - 1) / freq + width_us / 1e6
+                self._cancel("train")
+                self._schedule(self.train_end, "Pulse ended", "train")
+            elif line == "X":
+                if self.armed is not None:
+                    start, fps, n = self.armed
+                    self._cancel("burst")
+                    self._schedule(now, f"D {min(int((now - start) * fps) + 1, n)} {self._micros(now)}")
+                    self.armed = None
+                elif self.train_end is not None:
+                    self._cancel("train")
+                    self._schedule(now, "Pulse ended")
+                    self.train_end = None
+            elif line.startswith("A,"):
+                fps, n, stim = (float(x) for x in line.split(",")[1:4])
+                self._cancel("train")
+                self.train_end = None
+                self._cancel("burst")
+                self.armed = (now, fps, int(n))
+                self._schedule(now, f"ARMED {int(n)}")
+                t_stim = now + stim / fps
+                self._schedule(t_stim, f"S {int(stim)} {self._micros(t_stim)}", "burst")
+                t_done = now + n / fps
+                self._schedule(t_done, f"D {int(n)} {self._micros(t_done)}", "burst")
+        except (IndexError, ValueError):
+            pass
+
+    def next_due(self):
+        return self._replies[0][0] if self._replies else None
+
+    def due(self, now):
+        out = []
+        while self._replies and self._replies[0][0] <= now:
+            out.append(self._replies.pop(0)[2])
+        return out